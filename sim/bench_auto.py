@@ -0,0 +1,158 @@
+"""
+Run the Red Minus auto in the simulator, the way it used to be written (one step after
+another, with fixed waits and the intake in a bare thread) and as the routine in ROUTINES
+compiled onto the command scheduler.
+
+    python sim/bench_auto.py
+
+The field has a mobile goal where the auto expects one: 36 inches ahead of the start, and
+24 inches behind the robot once it has turned. Reports how long each took to get the goal
+clamped and to finish, and how long the intake ran. Also times compiling the routines, 
+and how long auto takes to get moving once the field enables it.
+"""
+import time
+
+import vex
+from harness import MM_PER_INCH, load_program
+from vex import FORWARD, LEFT, MSEC, PERCENT, REVERSE, SECONDS
+
+# The goal, in mm, from where the robot starts facing +y
+GOAL = (vex.ROBOT_HALF_LENGTH + vex.GOAL_RADIUS + 24 * MM_PER_INCH, 36 * MM_PER_INCH)
+
+
+def old_auto_minus(bot):
+    """
+    auto_minus and auto_min before the command scheduler. threaded_spin(intake, 1500, MSEC)
+    never said which way to spin, so that thread died straight away; this is what it meant.
+    """
+    auto = bot["auto"]
+    intake = bot["intake"]
+    vex.Thread(intake.spin_for, (FORWARD, 1500, MSEC))
+    auto.drive_for_auto(FORWARD, 36, 50)
+    vex.wait(250, MSEC)
+    auto.turn_for_auto(LEFT, 94, 3) # Where the old turn stopped for LEFT 86
+    vex.wait(250, MSEC)
+
+    start = bot["odometry"].distance
+    bot["goal_detector"].arm()
+    bot["drivetrain"].drive(REVERSE, 45, PERCENT)
+    rate = bot["Rate"](bot["Auto"].LOOP_PERIOD)
+
+    while start - bot["odometry"].distance < 48 and not bot["goal_detector"].fired:
+        rate.sleep()
+
+    bot["goal_detector"].disarm()
+    bot["clamp"].set(True)
+    vex.wait(250, MSEC)
+    auto.drive_for_auto(FORWARD, 12, 30)
+    bot["drivetrain"].stop()
+    intake.spin_for(FORWARD, 5, SECONDS)
+
+
+def run_routine(bot, name):
+    """
+    Run one of the routines the selector offers, by name.
+    """
+    for routine, run in bot["auto"].available_autos:
+        if routine == name:
+            return run()
+
+    raise KeyError(name)
+
+
+def new_auto_minus(bot):
+    run_routine(bot, "Red Minus")
+
+
+def bench_compile(repeats=20):
+    """
+    How long it takes to compile the built-in routines when the program starts.
+    """
+    bot = load_program("main.py")
+    started = time.perf_counter()
+
+    for _ in range(repeats):
+        routines = bot["load_routines"]()
+
+    return "{} routines in {:.2f}ms on the host".format(
+        len(routines), (time.perf_counter() - started) / repeats * 1000)
+
+
+def old_run(bot):
+    """
+    Auto.run before the startup pipeline: calibrate the inertial sensor once the field
+    enables auto, and wait for it.
+    """
+    inertial = bot["inertial"]
+    inertial.calibrate()
+
+    while inertial.is_calibrating():
+        vex.wait(5, MSEC)
+
+    auto = bot["auto"]
+    auto.available_autos[auto.selected_auto][1]()
+
+
+def bench_enable(old=False):
+    """
+    How long Red Minus takes to start moving once the field enables auto.
+    """
+    bot = load_program("main.py")
+    auto = bot["auto"]
+    auto.selected_auto = [name for name, _ in auto.available_autos].index("Red Minus")
+    enabled = vex.sim.now
+
+    if old:
+        vex.sim.competition_mode = "autonomous"
+        vex.sim.spawn(old_run, (bot,))
+    else:
+        vex.sim.start_autonomous()
+
+    while vex.sim.plant.speed == 0 and vex.sim.now - enabled < 5:
+        vex.sim.run_for(0.001)
+
+    return "moving {:.0f}ms after the field enabled auto".format((vex.sim.now - enabled) * 1000)
+
+
+def bench(routine):
+    bot = load_program("main.py", goals=[GOAL], time_limit=30)
+    vex.wait(20)
+    clamped = []
+    clamp_set = bot["clamp"].set
+
+    def spy(value):
+        if value and not clamped:
+            clamped.append(vex.sim.now)
+
+        clamp_set(value)
+
+    bot["clamp"].set = spy
+    intake = bot["intake"]
+    spinning = []
+
+    def watch():
+        # Add up how long the intake was spinning, checking every 10ms
+        while True:
+            if abs(intake.velocity(PERCENT)) > 1:
+                spinning.append(0.01)
+
+            vex.wait(10, MSEC)
+
+    vex.sim.spawn(watch)
+    started = vex.sim.now
+    routine(bot)
+    took = vex.sim.now - started
+
+    if not clamped:
+        return "never clamped the goal, took {:.2f}s".format(took)
+
+    return "goal clamped at {:.2f}s, finished at {:.2f}s, intake ran {:.2f}s".format(
+        clamped[0] - started, took, sum(spinning))
+
+
+if __name__ == "__main__":
+    print("Old auto_minus: " + bench(old_auto_minus))
+    print("Routine:        " + bench(new_auto_minus))
+    print("Compiling: " + bench_compile())
+    print("Old Auto.run: " + bench_enable(old=True))
+    print("Startup:      " + bench_enable())
@@ -0,0 +1,202 @@
+"""
+Closest-object queries on main.py's FieldMap, checked against the linear scan from
+auto_algo.txt and timed against it.
+
+    python sim/bench_field.py
+
+Auto plans whole routes with RoutePlanner and never asks for the closest object on its own,
+so FieldMap in main.py only keeps what the planner needs. The queries live here instead,
+working on FieldMap's flat arrays with squared distances and no trig in the loop, so the
+numbers are still around if auto ever needs them. Every query is made from a random spot on
+the field (and a few just off it) and its answer is compared with FIND_CLOSEST done the slow
+way.
+"""
+import math
+import random
+import time
+
+from harness import load_program
+
+
+def find_closest(table, alive, x, y, heading=0.0, half_angle=180.0, max_dist=None):
+    """
+    FIND_CLOSEST from auto_algo.txt, plus the heading cone, looking at every object.
+    """
+    closest = None
+    closest_dist = max_dist if max_dist is not None else float("inf")
+
+    for i, (ox, oy) in enumerate(table):
+        if not alive[i]:
+            continue
+
+        dist = math.hypot(ox - x, oy - y)
+
+        if dist >= closest_dist:
+            continue
+
+        if half_angle < 180 and dist > 0:
+            bearing = math.degrees(math.atan2(ox - x, oy - y))
+
+            if abs((bearing - heading + 180) % 360 - 180) > half_angle:
+                continue
+
+        closest = i
+        closest_dist = dist
+
+    return closest
+
+
+def closest_in_cone(field, x, y, heading, half_angle, max_dist=None):
+    """
+    The index of the closest object left in `field` that we can get to by driving roughly
+    straight from (x, y): no more than `half_angle` degrees either side of `heading` (0 is
+    +y, clockwise, like the GPS and inertial sensor), and no further than `max_dist`. None
+    if there isn't one.
+    """
+    best = None
+    best_sq = max_dist * max_dist if max_dist is not None else float("inf")
+    xs, ys, alive = field.xs, field.ys, field.alive
+
+    # Instead of working out the angle to every object, check that the dot product of the
+    # direction we're facing and the direction to the object is at least cos(half_angle)
+    # times the distance. Both sides are squared (keeping their signs) so there's no trig
+    # or square root in the loop.
+    hx = math.sin(math.radians(heading))
+    hy = math.cos(math.radians(heading))
+    min_cos = math.cos(math.radians(half_angle))
+    min_cos_sq = min_cos * abs(min_cos)
+
+    for i in range(len(xs)):
+        if not alive[i]:
+            continue
+
+        dx = xs[i] - x
+        dy = ys[i] - y
+        dist_sq = dx * dx + dy * dy
+
+        if dist_sq >= best_sq:
+            continue
+
+        if half_angle < 180:
+            along = dx * hx + dy * hy
+
+            if along * abs(along) < min_cos_sq * dist_sq:
+                continue # Outside the cone
+
+        best = i
+        best_sq = dist_sq
+
+    return best
+
+
+def nearest(field, x, y, k=1):
+    """
+    The indexes of the `k` closest objects left in `field` to (x, y), closest first.
+    """
+    found = [] # (distance squared, index), closest first
+    xs, ys, alive = field.xs, field.ys, field.alive
+
+    for i in range(len(xs)):
+        if not alive[i]:
+            continue
+
+        dx = xs[i] - x
+        dy = ys[i] - y
+        dist_sq = dx * dx + dy * dy
+
+        if len(found) == k and dist_sq >= found[-1][0]:
+            continue
+
+        found.append((dist_sq, i))
+        found.sort()
+
+        if len(found) > k:
+            found.pop()
+
+    return [i for dist_sq, i in found]
+
+
+def same_distance(table, x, y, a, b):
+    """
+    Two answers are as good as each other if they're the same distance away (ties between
+    objects can go either way).
+    """
+    if a is None or b is None:
+        return a is b
+
+    return abs(math.hypot(table[a][0] - x, table[a][1] - y) - math.hypot(table[b][0] - x, table[b][1] - y)) < 1e-3
+
+
+def queries(count, seed=1):
+    rng = random.Random(seed)
+    return [(rng.uniform(-1900, 1900), rng.uniform(-1900, 1900), rng.uniform(0, 360),
+             rng.choice((30, 60, 90, 180)), rng.choice((None, 600, 1500))) for _ in range(count)]
+
+
+def check(bot, name, count=2000):
+    """
+    Compare every kind of query with the linear scan, removing objects as we go.
+    """
+    table = bot[name]
+    field = bot["FieldMap"](table)
+    alive = [True] * len(table)
+    rng = random.Random(2)
+
+    for n, (x, y, heading, half_angle, max_dist) in enumerate(queries(count)):
+        want = find_closest(table, alive, x, y, heading, half_angle, max_dist)
+        got = closest_in_cone(field, x, y, heading, half_angle, max_dist)
+        assert same_distance(table, x, y, want, got), (name, x, y, heading, half_angle, max_dist, want, got)
+
+        k = rng.randint(1, 4)
+        order = sorted((math.hypot(ox - x, oy - y), i) for i, (ox, oy) in enumerate(table) if alive[i])[:k]
+        got = nearest(field, x, y, k)
+        assert [round(d, 3) for d, _ in order] == [round(math.hypot(table[i][0] - x, table[i][1] - y), 3) for i in got]
+
+        # Take something every so often, then put everything back once the field is empty
+        if n % 50 == 49:
+            if any(field.alive):
+                index = closest_in_cone(field, x, y, 0, 180)
+                field.remove(index)
+                alive[index] = False
+            else:
+                field = bot["FieldMap"](table)
+                alive = [True] * len(table)
+
+
+def bench(bot, name, count=20000):
+    """
+    Seconds per closest-object query, linear scan vs closest_in_cone(), on the host.
+    """
+    table = bot[name] if isinstance(name, str) else name
+    field = bot["FieldMap"](table)
+    alive = [True] * len(table)
+    points = queries(count, seed=3)
+    results = []
+
+    for fn in (lambda x, y, h, a, d: find_closest(table, alive, x, y, h, a, d),
+               lambda x, y, h, a, d: closest_in_cone(field, x, y, h, a, d)):
+        start = time.perf_counter()
+
+        for point in points:
+            fn(*point)
+
+        results.append((time.perf_counter() - start) / count)
+
+    return "linear={:.1f}us, flat arrays={:.1f}us, {:.1f}x".format(
+        results[0] * 1e6, results[1] * 1e6, results[0] / results[1])
+
+
+if __name__ == "__main__":
+    bot = load_program("main.py")
+
+    for name in ("RED_RINGS", "BLUE_RINGS", "MOBILE_GOALS"):
+        check(bot, name)
+        print("{} ({} objects): answers match, {}".format(name, len(bot[name]), bench(bot, name)))
+
+    # The real tables are small enough that the scan is already cheap. This shows how the
+    # two grow with a fuller field.
+    rng = random.Random(4)
+
+    for count in (50, 200):
+        table = [(rng.randrange(-1800, 1800), rng.randrange(-1800, 1800)) for _ in range(count)]
+        print("{} random objects: {}".format(count, bench(bot, table, 5000)))
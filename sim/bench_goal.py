@@ -0,0 +1,100 @@
+"""
+Back into a mobile goal in the simulator and see how far the bot went between the optical
+sensor first touching it and the clamp finishing closing.
+
+    python sim/bench_goal.py
+
+GoalDetector in src/main.py aims for CLAMP_TRAVEL inches at any speed. The old auto_min
+loop waited a fixed 50ms, so it closed too early going slowly and too late going fast.
+Also reports how many device calls the drive loop (the main thread) made itself.
+"""
+import vex
+from harness import MM_PER_INCH, load_program
+from vex import MSEC, PERCENT, REVERSE
+
+
+def old_auto_min_loop(bot, velocity_percent):
+    """
+    The drive loop auto_min used to have, polling the sensor every 5ms.
+    """
+    optical = bot["optical"]
+    optical.set_light(100)
+    optical.object_detect_threshold(254)
+    timer = False
+
+    while -bot["odometry"].distance < 48:
+        bot["drivetrain"].drive(REVERSE, velocity_percent, PERCENT)
+
+        if timer and timer.time() >= 50:
+            bot["clamp"].set(True)
+            break
+
+        if optical.is_near_object() and not timer:
+            timer = vex.Timer()
+
+        vex.wait(5, MSEC)
+
+
+def new_auto_min_loop(bot, velocity_percent):
+    """
+    The same drive with GoalDetector watching the sensor instead.
+    """
+    detector = bot["goal_detector"]
+    detector.arm()
+    bot["drivetrain"].drive(REVERSE, velocity_percent, PERCENT)
+    rate = bot["Rate"](bot["Auto"].LOOP_PERIOD)
+
+    while -bot["odometry"].distance < 48 and not detector.fired:
+        rate.sleep()
+
+    detector.disarm()
+
+
+def bench_grab(loop, velocity_percent):
+    # A goal 24 inches straight behind the rear bumper
+    behind = vex.ROBOT_HALF_LENGTH + vex.GOAL_RADIUS + 24 * MM_PER_INCH
+    bot = load_program("main.py", goals=[(0, -behind)])
+    vex.wait(20)
+
+    # Watch the sensor from outside the program to see when it really touched
+    touched = []
+    fired = []
+
+    def watch():
+        while not fired:
+            if not touched and bot["optical"]._gap() <= 1.5:
+                touched.append(vex.sim.plant.distance)
+
+            vex.wait(1, MSEC)
+
+    clamp_set = bot["clamp"].set
+
+    def spy(value):
+        if value and not fired:
+            fired.append(vex.sim.now)
+
+        clamp_set(value)
+
+    bot["clamp"].set = spy
+    vex.sim.spawn(watch)
+    cpu = vex.sim.main_task.cpu
+    started = vex.sim.now
+    loop(bot, velocity_percent)
+    io = sum(count for (device, _), count in vex.sim.io_counts.items() if "Optical" in device)
+    cpu = (vex.sim.main_task.cpu - cpu) / (vex.sim.now - started)
+
+    if not fired or not touched:
+        return "never clamped"
+
+    # Where the bot is once the clamp has had time to close
+    vex.sim.run_for(max(0.0, fired[0] + bot["GoalDetector"].CLAMP_DELAY / 1000 - vex.sim.now))
+    travel = abs(vex.sim.plant.distance - touched[0]) / MM_PER_INCH
+    bot["drivetrain"].stop()
+    return "went {:.2f}in after touching before the clamp closed, optical reads={}, drive loop cpu={:.3f}".format(
+        travel, io, cpu)
+
+
+if __name__ == "__main__":
+    for velocity in (30, 45, 70):
+        print("{}% old polling loop: {}".format(velocity, bench_grab(old_auto_min_loop, velocity)))
+        print("{}% GoalDetector:     {}".format(velocity, bench_grab(new_auto_min_loop, velocity)))
@@ -0,0 +1,297 @@
+"""
+Time the control loops in src/ against the simulated robot.
+
+    python sim/bench_loops.py
+
+For each motion this prints how long it took, how long until the bot settled,
+how far it overshot, the loop period, and how many device calls it made.
+"""
+import math
+import os
+
+from decode_telemetry import decode
+from harness import MM_PER_INCH, load_program, measure
+
+import vex
+from vex import BRAKE, FORWARD, PERCENT, RIGHT
+
+
+def bench_pid_drive():
+    bot = load_program("pid.py")
+    pid = bot["PIDwithRot"]()
+    return measure(lambda: pid.drive_for(48), target=48)
+
+
+def bench_pid_turn():
+    bot = load_program("pid.py")
+    pid = bot["PIDwithHeading"]()
+    return measure(lambda: pid.turn_for(90), target=90, kind="heading")
+
+
+def bench_gps_drive(raw: bool = False):
+    """
+    PIDwithGPS from (-1200, -1200) facing 45 degrees to the middle of the field. Reports how
+    far off the filtered position was from the real one during the drive, and how close the
+    bot ended up. With raw=True the position is just the latest GPS fix, the way the old
+    commented-out PIDwithGPS worked.
+    """
+    bot = load_program("pid.py", pose=(-1200, -1200, 45))
+    pid = bot["PIDwithGPS"]()
+    position = pid.position
+    update = position.update
+    errors = []
+
+    def tracked_update():
+        if raw:
+            position.x = bot["gps"].x_position()
+            position.y = bot["gps"].y_position()
+            position.heading = bot["gps"].heading()
+        else:
+            update()
+
+        x, y, _ = vex.sim.pose()
+        errors.append(math.hypot(position.x - x, position.y - y))
+
+    position.update = tracked_update
+    started = vex.sim.now
+    pid.drive_to(bot["Vector"](0, 0))
+    duration = vex.sim.now - started
+    vex.wait(500)
+    x, y, _ = vex.sim.pose()
+    return "duration={:.3f}, position rms error={:.1f}mm, ended {:.1f}mm from the target".format(
+        duration, math.sqrt(sum(e * e for e in errors) / len(errors)), math.hypot(x, y))
+
+
+def bench_auto_drive():
+    bot = load_program("main.py")
+    return measure(lambda: bot["Auto"].drive_for_auto(FORWARD, 24, 50), target=24)
+
+
+def bench_auto_drive_fast(shape: str = "TRAPEZOID", old: bool = False):
+    """
+    A full speed 48 inch drive, where the old drive-then-brake approach slid furthest past
+    the target. old=True runs busy_drive_for_auto instead of the motion profile.
+    """
+    bot = load_program("main.py")
+
+    if old:
+        return measure(lambda: busy_drive_for_auto(bot, FORWARD, 48, 100), target=48)
+
+    return measure(lambda: bot["Auto"].drive_for_auto(FORWARD, 48, 100, shape=bot[shape]), target=48)
+
+
+def bench_auto_turn():
+    bot = load_program("main.py")
+    return measure(lambda: bot["Auto"].turn_for_auto(RIGHT, 90, 20), target=90, kind="heading", band=5)
+
+
+def bench_odometry():
+    """
+    Drive a 36 inch square with the auto motions and compare where odometry thinks the
+    bot is with where the simulator put it.
+    """
+    bot = load_program("main.py")
+    auto = bot["Auto"]
+
+    for _ in range(4):
+        auto.drive_for_auto(FORWARD, 36, 70)
+        auto.turn_for_auto(RIGHT, 90, 30)
+
+    vex.wait(100)
+    x, y, heading = bot["odometry"].pose
+    true_x, true_y, true_heading = vex.sim.pose()
+    error = math.hypot(x - true_x / MM_PER_INCH, y - true_y / MM_PER_INCH)
+    heading_error = (heading - true_heading + 180) % 360 - 180
+    return "position error={:.3f}in, heading error={:.2f}deg, odometry ticks={}".format(
+        error, heading_error, bot["odometry_loop"].ticks)
+
+
+def busy_drive_for_auto(bot, direction, distance_in, velocity_percent):
+    """
+    drive_for_auto the way it used to be, with no wait in the loop, for comparison.
+    """
+    sensors = bot["sensors"]
+    to_inches = bot["GEAR_RATIO"] * bot["WHEEL_CIRC"] / 360
+    vex.wait(25)
+    sensors.read_drivetrain()
+    zero = list(sensors.positions)
+
+    def driven():
+        # The average of how far each motor has turned, like motor_rot_avg() did
+        return sum(abs(p - z) for p, z in zip(sensors.positions, zero)) / len(zero) * to_inches
+
+    while driven() < distance_in:
+        bot["drivetrain"].drive(direction, velocity_percent, PERCENT)
+        sensors.read_drivetrain()
+
+    bot["drivetrain"].stop(BRAKE)
+
+
+def bench_auto_cpu(busy: bool = False):
+    """
+    How much of the CPU a 48 inch drive leaves for everything else, judged by how many
+    passes remote_control_loop manages while it runs.
+    """
+    bot = load_program("main.py")
+    loop = bot["driver_loop"]
+    ticks = loop.ticks
+
+    if busy:
+        result = measure(lambda: busy_drive_for_auto(bot, FORWARD, 48, 50), target=48, tail=0)
+    else:
+        result = measure(lambda: bot["Auto"].drive_for_auto(FORWARD, 48, 50), target=48, tail=0)
+
+    ticks = loop.ticks - ticks
+    return "cpu={:.3f}, driver ticks={}/{}, io={}, error={:.2f}in".format(
+        result.cpu, ticks, int(result.duration / 0.02), result.io, result.error)
+
+
+def bench_driver_loop(hog: bool = False):
+    """
+    Hold the left stick forward for 10 seconds of driver control and check how well
+    remote_control_loop keeps its period. With hog=True another thread grabs the CPU
+    for 30ms every 100ms, the way a busy auto helper or screen redraw would.
+    """
+    bot = load_program("main.py")
+    loop = bot["driver_loop"]
+    vex.sim.controller().axis3.set(100)
+
+    def cpu_hog():
+        while True:
+            for _ in range(150):
+                bot["sensors"].read_drivetrain()  # 4 device reads, 200us
+
+            vex.wait(70)
+
+    if hog:
+        vex.sim.spawn(cpu_hog)
+
+    ticks = loop.ticks
+    vex.sim.run_for(10)
+    ticks = loop.ticks - ticks
+    return "ticks={}, period={:.4f}, overruns={}, skipped={}, max_late={:.1f}ms".format(
+        ticks, 10 / ticks, loop.overruns, loop.skipped, loop.max_late)
+
+
+def bench_telemetry(prints: bool = False):
+    """
+    Auto.turn_to_heading(90) with telemetry going to the SD card. prints=True prints the
+    heading and error every tick instead, the way pid.py's turn_for used to. Reports the 
+    loop period and how many samples made it into the log.
+    """
+    bot = load_program("main.py")
+    telemetry = bot["telemetry"]
+    telemetry.start()
+
+    if prints:
+        def record(source, setpoint, error, output):
+            vex.sim.console_print(setpoint - error)
+            vex.sim.console_print(error)
+            vex.sim.console_print("---")
+
+        telemetry.record = record
+
+    result = measure(lambda: bot["Auto"].turn_to_heading(90), target=90, kind="heading")
+
+    with open(os.path.join(vex.sim.sd_root, bot["TELEMETRY_FILE"]), "rb") as f:
+        _, _, samples = decode(f.read())
+
+    return "{}, logged={}".format(result, len(samples))
+
+
+def bench_profiles():
+    """
+    Drive 24 inches with the left stick held forward, then print what every loop's
+    LoopProfile saw: where each tick's time goes and how evenly the ticks come.
+    """
+    bot = load_program("main.py")
+    vex.sim.controller().axis3.set(100)
+    bot["Auto"].drive_for_auto(FORWARD, 24, 50)
+    vex.sim.run_for(2)
+    return "\n    ".join(line for loop in bot["scheduler"].loops for line in loop.profile.report())
+
+
+def bench_driver_release(mode: str = "DRIVE_ARCADE"):
+    """
+    Drive forward while turning for 2 seconds, then let go of the turning stick and see how
+    far the robot keeps turning. What's left after letting go is the motors slowing down,
+    since the commands even out straight away. (The old remote_control_loop set both sides
+    to the faster one whenever they went the same way, so it didn't turn at all.)
+    """
+    bot = load_program("main.py")
+    bot["shaper"].mode = bot[mode]
+    controller = vex.sim.controller()
+    controller.axis3.set(100)
+    controller.axis1.set(60)
+    vex.sim.run_for(2)
+    holding = bot["odometry"].pose[2] # Odometry's heading doesn't wrap around at 360
+    controller.axis1.set(0)
+    vex.sim.run_for(1)
+    return "turned {:.1f} degrees holding the stick, then {:.1f} in the second after letting go".format(
+        holding, bot["odometry"].pose[2] - holding)
+
+
+def bench_health(derate: bool = True, seconds: float = 90):
+    """
+    Drive back and forth as hard as possible, starting with the drive motors already warm
+    from the rest of a match, and see how long they spend halved by the firmware's 55C
+    limit. derate=False turns MotorHealth's derating off, which is how the robot used to be.
+    """
+    bot = load_program("main.py")
+
+    if not derate:
+        bot["health"].DERATE_START = bot["health"].DERATE_END = 1000
+
+    for motor in bot["motors"]:
+        motor._temp = 48.0
+
+    bot["driver_control"]()
+    controller = vex.sim.controller()
+    throttled = 0.0
+    peak = 0.0
+    travelled = 0.0
+    last = vex.sim.plant.distance
+    step = 0.1
+
+    for i in range(int(seconds / step)):
+        controller.axis3.set(100 if i // 5 % 2 == 0 else -100) # Flip every half second
+        vex.sim.run_for(step)
+        hottest = max(motor._temp for motor in bot["motors"])
+        peak = max(peak, hottest)
+        throttled += step if hottest >= bot["THROTTLE_TEMP"] else 0
+        travelled += abs(vex.sim.plant.distance - last) / MM_PER_INCH
+        last = vex.sim.plant.distance
+
+    screen = sum(count for (device, _), count in vex.sim.io_counts.items() if device.startswith("Controller") and ".screen" in device)
+    return "throttled for {:.1f}s of {}s, hottest {:.1f}C, drove {:.0f}in, drive limit {}%, screen writes={}".format(
+        throttled, seconds, peak, travelled, bot["health"].limits[0], screen)
+
+
+BENCHMARKS = [
+    ("PIDwithRot.drive_for(48)", bench_pid_drive),
+    ("PIDwithHeading.turn_for(90)", bench_pid_turn),
+    ("PIDwithGPS.drive_to, raw GPS fixes", lambda: bench_gps_drive(raw=True)),
+    ("PIDwithGPS.drive_to, GPS + odometry", bench_gps_drive),
+    ("Auto.drive_for_auto(FORWARD, 24, 50)", bench_auto_drive),
+    ("48in at 100%, old constant speed", lambda: bench_auto_drive_fast(old=True)),
+    ("48in at 100%, TRAPEZOID profile", bench_auto_drive_fast),
+    ("48in at 100%, S_CURVE profile", lambda: bench_auto_drive_fast("S_CURVE")),
+    ("Auto.turn_for_auto(RIGHT, 90, 20)", bench_auto_turn),
+    ("Odometry after a 36in square", bench_odometry),
+    ("CPU left over during a 48in drive, old busy loop", lambda: bench_auto_cpu(busy=True)),
+    ("CPU left over during a 48in drive, drive_for_auto", bench_auto_cpu),
+    ("remote_control_loop, idle", bench_driver_loop),
+    ("remote_control_loop, with a CPU hog", lambda: bench_driver_loop(hog=True)),
+    ("Letting go of the turn stick, arcade", bench_driver_release),
+    ("Letting go of the turn stick, curvature", lambda: bench_driver_release("DRIVE_CURVATURE")),
+    ("Pushing hard on warm motors, no derating", lambda: bench_health(derate=False)),
+    ("Pushing hard on warm motors, MotorHealth", bench_health),
+    ("Auto.turn_to_heading(90), printing every tick", lambda: bench_telemetry(prints=True)),
+    ("Auto.turn_to_heading(90), telemetry", bench_telemetry),
+    ("Loop profiles", bench_profiles),
+]
+
+
+if __name__ == "__main__":
+    for name, bench in BENCHMARKS:
+        print("{}\n    {}".format(name, bench()))
@@ -0,0 +1,107 @@
+"""
+Time RoutePlanner in src/main.py and see how much 2-opt gains over the greedy route.
+
+    python sim/bench_plan.py
+
+Planning time here is on the host, which is a lot faster than the brain. The number of
+passes through the inner loops is printed too, since that's what the brain pays for.
+"""
+import math
+import random
+import time
+
+import vex
+from harness import MM_PER_INCH, load_program
+
+
+def route_time(bot, order, times, n):
+    return sum(times[a * n + b] for a, b in zip(order, order[1:]))
+
+
+def bench_planner(bot, maps, starts, repeats=20):
+    """
+    Plan from every start in `starts`, returning the average planning time, and the
+    average total drive time of the greedy route and of the route after 2-opt.
+    """
+    planner = bot["RoutePlanner"]()
+    greedy = planner._greedy
+    two_opt = planner._two_opt
+    saved = []
+    totals = [0.0, 0.0]
+
+    # Wrap the steps to see the route before and after 2-opt
+    def spy_greedy(times, n):
+        order = greedy(times, n)
+        saved[:] = [list(order), times, n]
+        return order
+
+    def spy_two_opt(order, times, n):
+        two_opt(order, times, n)
+        totals[0] += route_time(bot, saved[0], times, n)
+        totals[1] += route_time(bot, order, times, n)
+
+    planner._greedy = spy_greedy
+    planner._two_opt = spy_two_opt
+
+    for x, y, heading in starts:
+        planner.plan(x, y, heading, maps, float("inf"))
+
+    planner._greedy = greedy
+    planner._two_opt = two_opt
+    started = time.perf_counter()
+
+    for _ in range(repeats):
+        for x, y, heading in starts:
+            planner.plan(x, y, heading, maps)
+
+    elapsed = (time.perf_counter() - started) / repeats / len(starts)
+    return elapsed, totals[0] / len(starts), totals[1] / len(starts)
+
+
+RINGS = ((-600, -600), (0, 0), (-600, 600), (600, -600), (600, 600))
+
+
+def bench_route(smooth: bool = True):
+    """
+    Drive a planned route through five rings near the middle of the field in the simulator.
+    smooth=True uses Auto.run_route (one PurePursuit path through all of them), otherwise
+    the same stops are driven one at a time with drive_to_point. Reports how long it took
+    and how close the bot came to the ring it passed furthest from.
+    """
+    bot = load_program("main.py", pose=(-1200, -600, 90))
+    bot["odometry"].set_pose(-1200 / MM_PER_INCH, -600 / MM_PER_INCH, 90)
+    vex.wait(20)
+    rings = bot["FieldMap"](RINGS)
+    started = vex.sim.now
+    vex.sim.start_trace()
+
+    if smooth:
+        bot["auto"].run_route([rings])
+    else:
+        x, y, heading = bot["odometry"].pose
+
+        for stop_x, stop_y, _, _ in bot["planner"].plan(x * MM_PER_INCH, y * MM_PER_INCH, heading, [rings]):
+            bot["Auto"].drive_to_point(stop_x, stop_y, 70)
+
+    trace = vex.sim.stop_trace()
+    miss = max(min(math.hypot(x - rx, y - ry) for _, x, y, *_ in trace) for rx, ry in RINGS)
+    return "took {:.1f}s, passed every ring within {:.1f}in".format(vex.sim.now - started, miss / MM_PER_INCH)
+
+
+if __name__ == "__main__":
+    bot = load_program("main.py")
+    rng = random.Random(1)
+    starts = [(rng.uniform(-1500, 1500), rng.uniform(-1500, 1500), rng.uniform(0, 360)) for _ in range(10)]
+
+    for label, names in (("Mobile goals", ["mobile_goals"]),
+                         ("Blue rings", ["blue_rings"]),
+                         ("Red rings", ["red_rings"]),
+                         ("Red rings + mobile goals", ["red_rings", "mobile_goals"])):
+        maps = [bot[name] for name in names]
+        count = sum(sum(m.alive) for m in maps)
+        elapsed, greedy, improved = bench_planner(bot, maps, starts)
+        print("{} ({} objects): plan={:.2f}ms, greedy route={:.1f}s, after 2-opt={:.1f}s ({:.0f}% faster)".format(
+            label, count, elapsed * 1000, greedy, improved, 100 * (1 - improved / greedy)))
+
+    print("Planned route in the simulator, stopping at each ring:", bench_route(smooth=False))
+    print("Planned route in the simulator, one smooth path:", bench_route())
@@ -0,0 +1,110 @@
+"""
+Click through the autonomous selector on the simulated brain screen and see how much 
+drawing it does and how long a touch takes to show up.
+
+    python sim/bench_screen.py
+
+The old selector cleared and redrew the whole screen for every change, and only looked
+for changes every 250ms. The new one redraws only the widgets that changed, straight from
+the touch event.
+"""
+import vex
+from harness import load_program
+from vex import MSEC, Color, FontType
+
+SWITCHES = 5
+TAP_EVERY = 0.6 # Seconds
+
+
+def old_selector(auto, competition):
+    """
+    Auto.selector as it used to be, with its globals turned into a dict so it can run here.
+    """
+    scr = auto_screen()
+    state = {"refresh": True, "confirmed": False}
+    scr.set_font(FontType.MONO20)
+
+    def print_selected():
+        scr.clear_screen()
+        scr.set_cursor(1, 0)
+        scr.print("> " + auto.available_autos[auto.selected_auto][0])
+        scr.new_line()
+        scr.print("(GREEN) to confirm")
+        scr.new_line()
+        scr.print("(RED) to switch")
+        scr.draw_rectangle(10, 120, 225, 110, color=Color.RED)
+        scr.draw_rectangle(250, 120, 225, 110, color=Color.GREEN)
+
+    def screen_press():
+        x, y = scr.x_position(), scr.y_position()
+
+        if y < 110:
+            return
+
+        if x < 225:
+            auto.selected_auto = (auto.selected_auto + 1) % len(auto.available_autos)
+            state["refresh"] = True
+        elif x > 250:
+            scr.clear_screen()
+            scr.set_cursor(3, 0)
+            scr.print("Selected auto: " + auto.available_autos[auto.selected_auto][0])
+            scr.new_line()
+            scr.print("Ready to go! GHLF :)")
+            state["confirmed"] = True
+
+    scr.pressed(screen_press)
+
+    while not state["confirmed"] and (not competition.is_competition_switch() or competition.is_driver_control()):
+        if state["refresh"]:
+            print_selected()
+            state["refresh"] = False
+
+        vex.wait(250, MSEC)
+
+
+def auto_screen():
+    return vex.sim.screens[0]
+
+
+def bench_selector(old=False):
+    bot = load_program("main.py")
+    scr = auto_screen()
+    vex.sim.field_connected = False # Off the field, so the selector waits for us
+    ops, pixels, clears = scr.ops, scr.pixels, scr.clears
+
+    if old:
+        scr._on_pressed = type(scr._on_pressed)() # Take the UI's touch handler back off
+
+    # Note when the screen was drawn on, to see how long each touch took to show up
+    drawn = []
+    draw = scr._draw
+
+    def spy(method, area):
+        drawn.append(vex.sim.now)
+        draw(method, area)
+
+    scr._draw = spy
+    now = vex.sim.now
+    touches = [now + 0.5 + i * TAP_EVERY for i in range(SWITCHES)]
+
+    for at in touches:
+        vex.sim.at(at, lambda: vex.sim.touch(100, 180))
+
+    vex.sim.at(touches[-1] + TAP_EVERY, lambda: vex.sim.touch(400, 180))
+    vex.sim.at(now + 0.2, lambda: vex.sim.touch(240, 180)) # In the gap between the buttons
+    started = vex.sim.main_task.cpu
+
+    if old:
+        old_selector(bot["auto"], bot["competition"])
+    else:
+        bot["auto"].selector(bot["competition"])
+
+    lags = [min([t for t in drawn if t >= at] or [float("inf")]) - at for at in touches]
+    return "selected {}, {} draws, {} pixels, {} clears, touch to screen {:.0f}ms average, {:.0f}ms worst, cpu {:.4f}s".format(
+        bot["auto"].available_autos[bot["auto"].selected_auto][0], scr.ops - ops, scr.pixels - pixels,
+        scr.clears - clears, sum(lags) / len(lags) * 1000, max(lags) * 1000, vex.sim.main_task.cpu - started)
+
+
+if __name__ == "__main__":
+    print("Old selector: " + bench_selector(old=True))
+    print("UI selector:  " + bench_selector())
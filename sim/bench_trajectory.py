@@ -0,0 +1,101 @@
+"""
+Drive trajectories made by make_trajectory.py through the Trajectory routine in the
+simulator, and time loading them.
+
+    python sim/bench_trajectory.py
+
+Tracking error is how far the bot got from the path at worst, and the final error is how
+far it stopped from the last sample. Loading is timed on the host against unpacking one
+record at a time with struct, which is what the brain would be stuck with otherwise.
+"""
+import math
+import os
+import struct
+import tempfile
+import time
+
+import vex
+from harness import MM_PER_INCH, load_program
+from make_trajectory import build, encode
+
+ROUTES = (
+    ("S-curve", [(0, 0), (0, 24), (24, 48), (24, 72)], 100, False),
+    ("Square corner", [(0, 0), (0, 36), (36, 36)], 70, False),
+    ("Backing up", [(0, 0), (0, -30), (-30, -48)], 50, True),
+)
+
+
+def bench_follow(waypoints, velocity_percent, reverse, mirror=False):
+    """
+    Drive one trajectory in the simulator, starting exactly on its first sample. With
+    `mirror`, drive the other alliance's copy of it, the way MIRROR makes one.
+    """
+    bot = load_program("main.py")
+    samples = build(bot, waypoints, velocity_percent, reverse)
+    sd_root = tempfile.mkdtemp(prefix="vex_sd_")
+
+    # The file has to be on the SD card when the program starts, for the routine to load it
+    with open(os.path.join(sd_root, "auto.traj"), "wb") as f:
+        f.write(encode(bot, samples))
+
+    if mirror:
+        with open(os.path.join(sd_root, "routines.txt"), "w") as f:
+            f.write("MIRROR Trajectory AS Mirrored\n")
+
+        samples = [[-s[0], s[1], -s[2] % 360, s[3], -s[4]] for s in samples]
+
+    x, y, heading = samples[0][:3]
+    bot = load_program("main.py", pose=(x * MM_PER_INCH, y * MM_PER_INCH, heading), sd_root=sd_root)
+    run = dict(bot["auto"].available_autos)["Mirrored" if mirror else "Trajectory"]
+    started = vex.sim.now
+    vex.sim.start_trace()
+    run()
+    trace = vex.sim.stop_trace()
+
+    worst = max(min(math.hypot(tx / MM_PER_INCH - s[0], ty / MM_PER_INCH - s[1]) for s in samples)
+                for _, tx, ty, *_ in trace)
+    fx, fy, _ = vex.sim.pose()
+    final = math.hypot(fx / MM_PER_INCH - samples[-1][0], fy / MM_PER_INCH - samples[-1][1])
+    return "planned {:.2f}s, took {:.2f}s, worst tracking error {:.2f}in, final error {:.2f}in".format(
+        (len(samples) - 1) * 0.01, vex.sim.now - started, worst, final)
+
+
+def parse_records(data):
+    """
+    The slow way: unpack every record on its own into a list of tuples.
+    """
+    count = int.from_bytes(data[4:8], "little")
+    return [struct.unpack_from("<5f", data, 16 + i * 20) for i in range(count)]
+
+
+def bench_load(bot, seconds, repeats=50):
+    """
+    Seconds to load a trajectory `seconds` long, the Trajectory way and record by record.
+    """
+    samples = [[0.0, i * 0.5, 0.0, 50.0, 0.0] for i in range(int(seconds * 100) + 1)]
+    data = bytearray(encode(bot, samples))
+    results = []
+
+    for fn in (bot["Trajectory"], parse_records):
+        started = time.perf_counter()
+
+        for _ in range(repeats):
+            fn(data)
+
+        results.append((time.perf_counter() - started) / repeats)
+
+    return "{} samples: Trajectory={:.1f}us, per record={:.1f}us, {:.0f}x".format(
+        len(samples), results[0] * 1e6, results[1] * 1e6, results[1] / results[0])
+
+
+if __name__ == "__main__":
+    for label, waypoints, velocity, reverse in ROUTES:
+        print("{} at {}%: {}".format(label, velocity, bench_follow(waypoints, velocity, reverse)))
+
+    label, waypoints, velocity, reverse = ROUTES[0]
+    print("{} mirrored: {}".format(label, bench_follow(waypoints, velocity, reverse, mirror=True)))
+
+    bot = load_program("main.py")
+
+    for seconds in (1, 5, 15):
+        print("Loading {}s: {}".format(seconds, bench_load(bot, seconds)))
@@ -0,0 +1,46 @@
+"""
+Check that the classes pid.py copies from main.py are still exactly the same in both.
+
+    python sim/check_copies.py
+
+pid.py is a program of its own on the brain, so it can't import main.py and keeps copies
+of the classes it needs. The list is COPIED below, the same as the note at the top of
+pid.py. Prints every class that's different and exits with an error if there are any.
+"""
+import ast
+import difflib
+import os
+import sys
+
+from harness import SRC_DIR
+
+COPIED = ("PID", "LoopProfile")
+
+
+def classes(name):
+    """
+    The source of every top-level class in one of the programs in src/, by class name.
+    """
+    with open(os.path.join(SRC_DIR, name)) as f:
+        text = f.read()
+
+    return {node.name: ast.get_source_segment(text, node)
+            for node in ast.parse(text).body if isinstance(node, ast.ClassDef)}
+
+
+if __name__ == "__main__":
+    main = classes("main.py")
+    pid = classes("pid.py")
+    different = 0
+
+    for name in COPIED:
+        if main.get(name) == pid.get(name):
+            print("{}: same".format(name))
+            continue
+
+        different += 1
+        print("{}: different".format(name))
+        sys.stdout.writelines(difflib.unified_diff(
+            (main.get(name) or "").splitlines(True), (pid.get(name) or "").splitlines(True), "main.py", "pid.py"))
+
+    sys.exit(1 if different else 0)
@@ -0,0 +1,97 @@
+"""
+Turn a telemetry log from the robot into a CSV, one row per sample.
+
+    python sim/decode_telemetry.py telemetry.bin > run.csv
+    python sim/decode_telemetry.py serial.txt -o run.csv
+
+The log is either the file Telemetry writes to the SD card (telemetry.bin from main.py),
+or a copy of the serial output, in which case every line that isn't telemetry is 
+skipped. The field and source names come from the log itself.
+"""
+import argparse
+import csv
+import struct
+import sys
+
+MAGIC = b"TLM1"
+
+
+def parse_names(text):
+    fields, sources = text.split(";")
+    return fields.split(","), sources.split(",")
+
+
+def decode_file(data):
+    """
+    Read an SD card log. Returns (field names, source names, samples).
+    """
+    if data[:4] != MAGIC:
+        raise ValueError("not a telemetry log")
+
+    length = int.from_bytes(data[4:6], "little")
+    fields, sources = parse_names(data[6:6 + length].decode())
+    width = len(fields)
+    body = data[6 + length:]
+    count = len(body) // (width * 4) # A log cut off in the middle of a write loses the partial sample
+    samples = list(struct.iter_unpack("<" + "f" * width, body[:count * width * 4]))
+    return fields, sources, samples
+
+
+def decode_serial(text):
+    """
+    Read a copy of the serial output. Returns (field names, source names, samples).
+    """
+    fields = sources = None
+    samples = []
+
+    for line in text.splitlines():
+        line = line.strip()
+
+        if line.startswith("TLM#"):
+            fields, sources = parse_names(line[4:])
+        elif line.startswith("TLM,"):
+            samples.append(tuple(float(value) for value in line[4:].split(",")))
+
+    if fields is None:
+        raise ValueError("no telemetry header in the serial output")
+
+    return fields, sources, samples
+
+
+def decode(data):
+    if data[:4] == MAGIC:
+        return decode_file(data)
+
+    return decode_serial(data.decode(errors="replace"))
+
+
+def write_csv(out, fields, sources, samples):
+    writer = csv.writer(out)
+    writer.writerow(fields)
+    source = fields.index("source")
+
+    for sample in samples:
+        row = ["{:g}".format(value) for value in sample]
+        index = int(sample[source])
+        row[source] = sources[index] if 0 <= index < len(sources) else row[source]
+        writer.writerow(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("log", help="telemetry file from the SD card, or saved serial output")
+    parser.add_argument("-o", "--output", help="CSV file to write (default: print it)")
+    args = parser.parse_args()
+
+    with open(args.log, "rb") as f:
+        fields, sources, samples = decode(f.read())
+
+    if args.output:
+        with open(args.output, "w", newline="") as out:
+            write_csv(out, fields, sources, samples)
+    else:
+        write_csv(sys.stdout, fields, sources, samples)
+
+
+if __name__ == "__main__":
+    main()
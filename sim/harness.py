@@ -0,0 +1,151 @@
+"""
+Helpers for running the robot programs in src/ on top of the simulated `vex`
+module and measuring how their control loops behave.
+
+    from harness import load_program, measure
+
+    bot = load_program("main.py")
+    result = measure(lambda: bot["Auto"].drive_for_auto(FORWARD, 24, 50), target=24)
+    print(result)
+"""
+import math
+import os
+import runpy
+import sys
+import time
+
+SIM_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(os.path.dirname(SIM_DIR), "src")
+
+# Our simulated vex module has to win over anything else called `vex`
+if SIM_DIR not in sys.path:
+    sys.path.insert(0, SIM_DIR)
+
+import vex  # noqa: E402
+
+MM_PER_INCH = 25.4
+
+# Both drivetrains are geared so the wheels make 2 turns for every 3 turns of the
+# motors (GEAR_RATIO = 2 / 3 in src/main.py), even though DriveTrain is built with a
+# ratio of 1. The plant has to use the real gearing or every distance is off by 1.5x.
+ROBOT_GEAR_RATIO = 1.5
+
+
+def load_program(name: str, **options) -> dict:
+    """
+    Reset the simulator and run one of the programs in src/ (by file name) up to
+    the end of its top-level code. Returns the program's globals so its classes
+    and functions can be called directly.
+
+    Keyword arguments are handed to vex.sim.reset(). By default the bot believes
+    it is plugged into a field switch that is disabled, so main.py's selector
+    falls straight through instead of waiting for someone to tap the screen.
+
+    If the program has a startup pipeline (main.py's `startup`), this also lets it finish,
+    the way it would while the robot sits on the field before a match.
+    """
+    options.setdefault("gear_ratio", ROBOT_GEAR_RATIO)
+    vex.sim.reset(**options)
+    path = name if os.path.isabs(name) else os.path.join(SRC_DIR, name)
+
+    if SRC_DIR not in sys.path:
+        sys.path.insert(1, SRC_DIR)
+
+    program = runpy.run_path(path, init_globals={"print": vex.sim.console_print}, run_name="__sim__")
+    startup = program.get("startup")
+
+    while startup is not None and not startup.ready:
+        vex.sim.run_for(0.01)
+
+    return program
+
+
+class Result:
+    """
+    What measure() found out about one motion.
+    """
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+    def __str__(self) -> str:
+        return ", ".join("{}={}".format(k, _fmt(v)) for k, v in self.__dict__.items())
+
+
+def _fmt(value) -> str:
+    return "{:.3f}".format(value) if isinstance(value, float) else str(value)
+
+
+def measure(motion, target: float, kind: str = "distance", band: float = None, tail: float = 1.0) -> Result:
+    """
+    Run `motion()` in the simulated main thread and report how it went.
+
+    kind is "distance" (target in inches along the starting heading) or "heading"
+    (target in degrees clockwise from the starting heading). The bot keeps being
+    watched for `tail` seconds after motion() returns so coasting past the
+    target counts too.
+
+    Returned fields:
+        duration   simulated seconds motion() took
+        settle     seconds until the bot stayed within `band` of the target for good,
+                   or None if it never got there
+        overshoot  how far past the target the bot went (inches or degrees)
+        error      where it ended up relative to the target
+        period     mean seconds between wait() calls in the main thread (None for busy loops)
+        jitter     largest minus smallest period
+        io         device calls made during the motion
+        cpu        share of the motion the main thread held the CPU
+        speedup    simulated seconds per real second
+    """
+    sim = vex.sim
+    band = band if band is not None else (0.5 if kind == "distance" else 1.0)
+    start_x, start_y, _ = sim.pose()
+    start_heading = math.degrees(sim.plant.theta)
+    start_io = sim.io_total()
+    start_cpu = sim.main_task.cpu
+    started = sim.now
+
+    sim.start_trace()
+    wall = time.perf_counter()
+    motion()
+    wall = time.perf_counter() - wall
+    duration = sim.now - started
+    cpu = sim.main_task.cpu + (sim.now - sim.main_task.resumed_at) - start_cpu
+    io = sim.io_total() - start_io
+    yields = list(sim.main_task.yields)
+    sim.run_for(tail)
+    trace = sim.stop_trace()
+
+    values = []
+
+    for t, x, y, heading, *_ in trace:
+        if kind == "distance":
+            along = (x - start_x) * math.sin(math.radians(start_heading)) \
+                + (y - start_y) * math.cos(math.radians(start_heading))
+            values.append((t - started, abs(along) / MM_PER_INCH))
+        else:
+            values.append((t - started, heading - start_heading))
+
+    final = values[-1][1] if values else 0.0
+    settle = 0.0
+
+    for t, value in values:
+        if abs(value - target) > band:
+            settle = t
+
+    if abs(final - target) > band:
+        settle = None  # Never settled
+    direction = 1 if target >= 0 else -1
+    overshoot = max([0.0] + [(v - target) * direction for _, v in values])
+    periods = [b - a for a, b in zip(yields, yields[1:])]
+
+    return Result(
+        duration=duration,
+        settle=settle,
+        overshoot=overshoot,
+        error=final - target,
+        period=sum(periods) / len(periods) if periods else None,
+        jitter=(max(periods) - min(periods)) if periods else None,
+        io=io,
+        cpu=cpu / duration if duration else 1.0,
+        speedup=(duration + tail) / wall if wall else float("inf"),
+    )
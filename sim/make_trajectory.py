@@ -0,0 +1,142 @@
+"""
+Turn a list of waypoints into a trajectory file for the Trajectory routine in src/main.py.
+
+    python sim/make_trajectory.py auto.traj 0,0 0,24 24,48 48,48
+    python sim/make_trajectory.py auto.traj 0,0 0,-30 -30,-30 --reverse --velocity 50
+
+Waypoints are x,y in inches, in the same coordinates odometry uses (the robot starts at the
+first one). The path through them is the same Catmull-Rom spline src/main.py's Path uses.
+Copy the file to the SD card, and pick "Trajectory" in the selector.
+
+Everything slow happens here instead of on the brain: sampling the spline, working out
+the heading and curvature, and the fastest speed at every point that respects the robot's
+acceleration, the grip it has in turns, and stopping at the end.
+"""
+import argparse
+import math
+import struct
+
+from harness import load_program
+
+SPACING = 0.25  # Inches between spline samples before timing them
+
+
+def build(bot, waypoints, velocity_percent=100, reverse=False, dt=0.01):
+    """
+    Make the samples for a trajectory: a list of (x, y, heading, velocity, curvature), one
+    every `dt` seconds, in the units the file uses.
+    """
+    class DensePath(bot["Path"]):
+        SPACING = globals()["SPACING"]
+
+    path = DensePath(waypoints)
+    xs, ys, lengths = list(path.xs), list(path.ys), list(path.lengths)
+    n = len(xs)
+
+    # Heading at every point, from the direction to the next one
+    headings = []
+
+    for i in range(n):
+        a, b = (i, i + 1) if i + 1 < n else (i - 1, i)
+        headings.append(math.degrees(math.atan2(xs[b] - xs[a], ys[b] - ys[a])))
+
+    # Curvature is how fast the heading changes per inch, positive turning right
+    curvatures = [0.0] * n
+
+    for i in range(1, n - 1):
+        turn = (headings[i + 1] - headings[i - 1] + 180) % 360 - 180
+        curvatures[i] = math.radians(turn) / max(lengths[i + 1] - lengths[i - 1], 1e-6)
+
+    # Fastest allowed speed at every point: the outside wheel can't go faster than the cruise
+    # speed, and the wheels can only grip so hard in a turn. Then make sure we can speed up
+    # to it and slow down from it in time.
+    cruise = bot["MAX_DRIVE_SPEED"] * velocity_percent / 100
+    accel = bot["MAX_DRIVE_SPEED"] * bot["AUTO_ACCELERATION"] / 100
+    lateral = bot["PurePursuit"].MAX_LATERAL_ACCEL
+    half_width = bot["WHEEL_BASE"] / 2
+    speeds = [min(cruise / (1 + abs(c) * half_width), math.sqrt(lateral / abs(c)) if c else cruise)
+              for c in curvatures]
+    speeds[0] = speeds[-1] = 0.0
+
+    for i in range(1, n):
+        speeds[i] = min(speeds[i], math.sqrt(speeds[i - 1] ** 2 + 2 * accel * (lengths[i] - lengths[i - 1])))
+
+    for i in range(n - 2, -1, -1):
+        speeds[i] = min(speeds[i], math.sqrt(speeds[i + 1] ** 2 + 2 * accel * (lengths[i + 1] - lengths[i])))
+
+    # When we get to each point
+    times = [0.0]
+
+    for i in range(1, n):
+        average = (speeds[i - 1] + speeds[i]) / 2
+        times.append(times[-1] + (lengths[i] - lengths[i - 1]) / max(average, 1e-3))
+
+    # Sample everything every dt seconds
+    samples = []
+    i = 0
+    t = 0.0
+
+    while True:
+        while i + 1 < n - 1 and times[i + 1] <= t:
+            i += 1
+
+        span = times[i + 1] - times[i]
+        f = min(1.0, max(0.0, (t - times[i]) / span)) if span > 0 else 1.0
+        turn = (headings[i + 1] - headings[i] + 180) % 360 - 180
+        sample = [
+            xs[i] + (xs[i + 1] - xs[i]) * f,
+            ys[i] + (ys[i + 1] - ys[i]) * f,
+            headings[i] + turn * f,
+            speeds[i] + (speeds[i + 1] - speeds[i]) * f,
+            curvatures[i] + (curvatures[i + 1] - curvatures[i]) * f,
+        ]
+
+        if reverse:
+            # Backing along the path: the robot faces the other way, goes backwards, and
+            # turning right along the path means turning left for the robot
+            sample[2] += 180
+            sample[3] = -sample[3]
+            sample[4] = -sample[4]
+
+        sample[2] %= 360
+        samples.append(sample)
+
+        if t >= times[-1]:
+            break
+
+        t += dt
+
+    return samples
+
+
+def encode(bot, samples, dt=0.01):
+    """
+    The bytes of a trajectory file. See the format notes above Trajectory in src/main.py.
+    """
+    fields = bot["TRAJECTORY_FIELDS"]
+    header = bot["TRAJECTORY_MAGIC"] + struct.pack("<IfI", len(samples), dt, 0)
+    assert len(header) == bot["TRAJECTORY_HEADER"]
+    return header + b"".join(struct.pack("<" + "f" * fields, *sample) for sample in samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("output", help="trajectory file to write")
+    parser.add_argument("waypoints", nargs="+", help="x,y in inches")
+    parser.add_argument("--velocity", type=float, default=100, help="top speed, percent")
+    parser.add_argument("--reverse", action="store_true", help="back along the path")
+    args = parser.parse_args()
+
+    bot = load_program("main.py")
+    waypoints = [tuple(float(v) for v in point.split(",")) for point in args.waypoints]
+    samples = build(bot, waypoints, args.velocity, args.reverse)
+    data = encode(bot, samples)
+
+    with open(args.output, "wb") as f:
+        f.write(data)
+
+    print("{}: {} samples, {:.2f}s, {} bytes".format(args.output, len(samples), (len(samples) - 1) * 0.01, len(data)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Find PID gains for src/pid.py's controllers in the simulator and write them to a gains file.
+
+    python sim/tune.py                      # PIDwithRot and PIDwithHeading, into gains.txt
+    python sim/tune.py PIDwithHeading --size 12 --workers 8 --output /media/sd/gains.txt
+
+For each controller this:
+1. Runs RelayTuner's relay test in the simulator for a Ziegler-Nichols starting point.
+2. Tries a grid of kP and kD around it, from a quarter to four times each, and keeps the
+   pair that settles fastest (ties go to whichever overshoots less).
+3. Tries a finer grid around the best pair.
+Every trial is its own fresh simulator, so they're spread over every core with
+multiprocessing. Copy the gains file to the SD card and PIDwithRot and PIDwithHeading load
+it at startup.
+"""
+import argparse
+import math
+import multiprocessing
+import os
+import tempfile
+import time
+
+import vex
+from harness import load_program, measure
+
+# What each controller is tuned on: how to run one move, and the target for measure()
+TESTS = {
+    "PIDwithRot": (lambda loop: loop.drive_for(48), 48, "distance"),
+    "PIDwithHeading": (lambda loop: loop.turn_for(90), 90, "heading"),
+}
+
+TIME_LIMIT = 20  # Simulated seconds before a trial that never finishes counts as a failure
+
+_sd_root = None
+
+
+def _load(**options):
+    # Each worker gets one empty SD card for all of its trials, so there's never a gains
+    # file from an earlier run in the way
+    global _sd_root
+
+    if _sd_root is None:
+        _sd_root = tempfile.mkdtemp(prefix="vex_tune_")
+
+    return load_program("pid.py", sd_root=_sd_root, **options)
+
+
+def trial(args):
+    """
+    One simulated move with the given gains. Returns (settle, overshoot, kP, kI, kD), where
+    settle is infinite if the bot never settled.
+    """
+    name, kP, kI, kD = args
+    bot = _load(time_limit=TIME_LIMIT)
+    cls = bot[name]
+    cls.kP, cls.kI, cls.kD = kP, kI, kD
+    motion, target, kind = TESTS[name]
+
+    try:
+        loop = cls()
+        result = measure(lambda: motion(loop), target, kind)
+    except vex.SimulationTimeout:
+        return math.inf, math.inf, kP, kI, kD
+
+    settle = result.settle if result.settle is not None else math.inf
+    return settle, result.overshoot, kP, kI, kD
+
+
+def relay(name, power=30):
+    """
+    Ziegler-Nichols gains from a relay test in the simulator, with kI left at 0.
+    """
+    bot = _load()
+    loop = bot[name]()
+    setpoint = TESTS[name][1] if name == "PIDwithHeading" else loop.measure(0)
+    tuner = bot["RelayTuner"]()
+    result = tuner.measure(loop, setpoint, power)
+
+    if result is None:
+        raise RuntimeError("relay test for {} didn't oscillate".format(name))
+
+    kP, _, kD = tuner.gains(*result)
+    return kP, 0.0, kD
+
+
+def grid(center, low, high, size):
+    """
+    `size` values spaced evenly on a log scale from center * low to center * high.
+    """
+    if size == 1:
+        return [center]
+
+    return [center * low * (high / low) ** (i / (size - 1)) for i in range(size)]
+
+
+def sweep(pool, workers, name, kP, kI, kD, low, high, size):
+    """
+    Try every pair on a grid around kP and kD (and kD = 0) in parallel. Returns the best
+    trial and how many there were.
+    """
+    trials = [(name, p, kI, d) for p in grid(kP, low, high, size) for d in [0.0] + grid(kD, low, high, size - 1)]
+    results = pool.map(trial, trials, chunksize=max(1, len(trials) // (4 * workers)))
+    return min(results), len(trials)
+
+
+def tune(pool, workers, name, size):
+    started = time.perf_counter()
+    kP, kI, kD = relay(name)
+    baseline = trial((name, kP, kI, kD))
+    print("{}: relay test gives kP={:.4g} kD={:.4g}, settles in {:.2f}s".format(name, kP, kD, baseline[0]))
+
+    coarse, count = sweep(pool, workers, name, kP, kI, kD, 0.25, 4, size)
+    fine, more = sweep(pool, workers, name, coarse[2], kI, coarse[4] or kD, 0.7, 1.4, size)
+    best = min(baseline, coarse, fine)
+    print("{}: best of {} trials kP={:.4g} kD={:.4g}, settles in {:.2f}s, overshoot {:.3f} ({:.0f}s)".format(
+        name, count + more + 1, best[2], best[4], best[0], best[1], time.perf_counter() - started))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("controllers", nargs="*", default=list(TESTS), help="classes in pid.py to tune")
+    parser.add_argument("--size", type=int, default=8, help="grid points per gain")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes to run trials in")
+    parser.add_argument("--output", default="gains.txt", help="gains file to write (existing lines are kept)")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+
+    with multiprocessing.Pool(args.workers) as pool:
+        results = {name: tune(pool, args.workers, name, args.size) for name in args.controllers}
+
+    # Write the file with pid.py's own save_gains(), so the format can't drift
+    bot = load_program("pid.py", sd_root=os.path.dirname(output))
+
+    for name, (settle, _, kP, kI, kD) in results.items():
+        if math.isinf(settle):
+            print("{}: nothing settled, not saving".format(name))
+        else:
+            bot["save_gains"](name, kP, kI, kD, os.path.basename(output))
+
+    print("Wrote " + output)
+
+
+if __name__ == "__main__":
+    main()
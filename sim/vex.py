@@ -0,0 +1,1870 @@
+"""
+A pure-Python stand-in for the VEX V5 `vex` module, so the robot programs in src/
+can be run and timed on a normal computer without a brain.
+
+Nothing here talks to real hardware. Instead there is a simulated clock, a
+cooperative thread scheduler that behaves like the one on the brain (a thread
+only gives up the CPU when it calls wait()), a differential-drive model of the
+drivetrain, and fake sensors that read from that model.
+
+Time only moves forward when a thread waits or when it talks to a device. Every
+device call is charged a small amount of time, the same way every call on the
+brain has to go across the smart port bus. That means a loop that never waits
+still finishes (the robot keeps moving while it burns time on device calls),
+but it also never lets the other threads run, just like on the real brain.
+
+To use it, put this folder ahead of everything else on sys.path so
+`from vex import *` finds this file, then drive the simulation through the
+`sim` object:
+
+    import vex
+    vex.sim.reset(pose=(0, 0, 0))
+    ...
+    vex.sim.run_for(2)  # let 2 simulated seconds pass
+
+sim/harness.py wraps all of this up for loading src/main.py or src/pid.py.
+"""
+import heapq
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import traceback
+
+__all__ = [
+    "Brain", "Controller", "Motor", "MotorGroup", "DriveTrain", "Inertial", "Optical",
+    "Gps", "DigitalOut", "DigitalIn", "Timer", "Thread", "Event", "Competition",
+    "Color", "Ports", "GearSetting", "DirectionType", "TurnType", "BrakeType",
+    "VelocityUnits", "VoltageUnits", "PercentUnits", "TimeUnits", "RotationUnits",
+    "DistanceUnits", "TemperatureUnits", "CurrentUnits", "PowerUnits", "TorqueUnits",
+    "AxisType", "OrientationType", "FontType", "ControllerType",
+    "FORWARD", "REVERSE", "LEFT", "RIGHT", "BRAKE", "COAST", "HOLD",
+    "PERCENT", "RPM", "DPS", "VOLT", "MV", "MSEC", "SECONDS", "DEGREES", "TURNS",
+    "MM", "INCHES", "PRIMARY", "PARTNER",
+    "wait", "sleep",
+]
+
+
+# ---------------------------------------------------------------------------
+# Constants and units
+# ---------------------------------------------------------------------------
+
+class _Const:
+    """
+    A named constant, like vex.FORWARD or vex.MSEC. They only ever get compared
+    to each other, so all we need is a name to print.
+    """
+    def __init__(self, name: str, value=None):
+        self.name = name
+        self.value = value
+
+    def __repr__(self) -> str:
+        return self.name
+
+
+class DirectionType:
+    FORWARD = _Const("FORWARD", 1)
+    REVERSE = _Const("REVERSE", -1)
+
+
+class TurnType:
+    LEFT = _Const("LEFT", -1)
+    RIGHT = _Const("RIGHT", 1)
+
+
+class BrakeType:
+    COAST = _Const("COAST")
+    BRAKE = _Const("BRAKE")
+    HOLD = _Const("HOLD")
+
+
+class PercentUnits:
+    PERCENT = _Const("PERCENT")
+
+
+class VelocityUnits:
+    PERCENT = PercentUnits.PERCENT
+    RPM = _Const("RPM")
+    DPS = _Const("DPS")
+
+
+class VoltageUnits:
+    VOLT = _Const("VOLT")
+    MV = _Const("MV")
+
+
+class TimeUnits:
+    SECONDS = _Const("SECONDS", 1.0)
+    MSEC = _Const("MSEC", 0.001)
+    SEC = SECONDS
+
+
+class RotationUnits:
+    DEG = _Const("DEGREES", 1.0)
+    REV = _Const("TURNS", 360.0)
+    RAW = _Const("RAW", 360.0 / 1800)
+
+
+class DistanceUnits:
+    MM = _Const("MM", 1.0)
+    CM = _Const("CM", 10.0)
+    IN = _Const("INCHES", 25.4)
+
+
+class TemperatureUnits:
+    CELSIUS = _Const("CELSIUS")
+    FAHRENHEIT = _Const("FAHRENHEIT")
+
+
+class CurrentUnits:
+    AMP = _Const("AMP")
+
+
+class PowerUnits:
+    WATT = _Const("WATT")
+
+
+class TorqueUnits:
+    NM = _Const("NM")
+    INLB = _Const("INLB")
+
+
+class AxisType:
+    XAXIS = _Const("XAXIS")
+    YAXIS = _Const("YAXIS")
+    ZAXIS = _Const("ZAXIS")
+
+
+class OrientationType:
+    ROLL = _Const("ROLL")
+    PITCH = _Const("PITCH")
+    YAW = _Const("YAW")
+
+
+class FontType:
+    MONO12 = _Const("MONO12")
+    MONO15 = _Const("MONO15")
+    MONO20 = _Const("MONO20")
+    MONO30 = _Const("MONO30")
+    MONO40 = _Const("MONO40")
+    MONO60 = _Const("MONO60")
+    PROP20 = _Const("PROP20")
+    PROP30 = _Const("PROP30")
+    PROP40 = _Const("PROP40")
+    PROP60 = _Const("PROP60")
+
+
+class ControllerType:
+    PRIMARY = _Const("PRIMARY")
+    PARTNER = _Const("PARTNER")
+
+
+class GearSetting:
+    RATIO_36_1 = _Const("RATIO_36_1", 100)
+    RATIO_18_1 = _Const("RATIO_18_1", 200)
+    RATIO_6_1 = _Const("RATIO_6_1", 600)
+
+
+class Ports:
+    pass
+
+
+for _i in range(1, 22):
+    setattr(Ports, "PORT{}".format(_i), _i - 1)
+
+
+class Color:
+    """
+    A 24 bit RGB color. The named colors are filled in below the class.
+    """
+    def __init__(self, *args):
+        if len(args) == 3:
+            args = ((args[0] << 16) | (args[1] << 8) | args[2],)
+        self.value = args[0] if args else 0
+
+    def __eq__(self, other):
+        return isinstance(other, Color) and other.value == self.value
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __repr__(self) -> str:
+        return "Color(0x{:06X})".format(self.value)
+
+
+Color.BLACK = Color(0x000000)
+Color.WHITE = Color(0xFFFFFF)
+Color.RED = Color(0xFF0000)
+Color.GREEN = Color(0x00FF00)
+Color.BLUE = Color(0x001871)
+Color.YELLOW = Color(0xFFFF00)
+Color.ORANGE = Color(0xFF8500)
+Color.PURPLE = Color(0xFF00FF)
+Color.CYAN = Color(0x00FFFF)
+Color.TRANSPARENT = Color(0x000000)
+
+FORWARD = DirectionType.FORWARD
+REVERSE = DirectionType.REVERSE
+LEFT = TurnType.LEFT
+RIGHT = TurnType.RIGHT
+BRAKE = BrakeType.BRAKE
+COAST = BrakeType.COAST
+HOLD = BrakeType.HOLD
+PERCENT = PercentUnits.PERCENT
+RPM = VelocityUnits.RPM
+DPS = VelocityUnits.DPS
+VOLT = VoltageUnits.VOLT
+MV = VoltageUnits.MV
+MSEC = TimeUnits.MSEC
+SECONDS = TimeUnits.SECONDS
+DEGREES = RotationUnits.DEG
+TURNS = RotationUnits.REV
+MM = DistanceUnits.MM
+INCHES = DistanceUnits.IN
+PRIMARY = ControllerType.PRIMARY
+PARTNER = ControllerType.PARTNER
+
+
+def _seconds(value, units) -> float:
+    return value * (units.value if isinstance(units, _Const) and units.value else 0.001)
+
+
+# ---------------------------------------------------------------------------
+# Simulation core: clock, cooperative scheduler and plant model
+# ---------------------------------------------------------------------------
+
+class SimulationTimeout(Exception):
+    """
+    Raised inside whichever thread is running once the simulated clock passes
+    the limit given to Simulation.reset(). Stops runaway loops from hanging the host.
+    """
+
+
+class _TaskKilled(BaseException):
+    """
+    Raised inside a simulated thread to unwind it when it is stopped or the
+    simulation is reset. Derived from BaseException so `except Exception` in
+    robot code does not swallow it.
+    """
+
+
+class _Task:
+    """
+    One simulated thread. Each one is backed by a real host thread, but only one
+    of them is ever allowed to run at a time.
+    """
+    def __init__(self, name: str, fn=None, args=()):
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.resume = threading.Event()
+        self.thread = None
+        self.wake = 0.0
+        self.resumed_at = 0.0
+        self.cpu = 0.0  # Simulated seconds spent holding the CPU
+        self.yields = []  # Times wait() was called, only kept while tracing
+        self.killed = False
+        self.done = False
+
+
+# How long a single device call takes, in seconds. These are rough guesses for
+# a smart port round trip; they only need to be in the right ballpark so loops
+# that hammer the devices cost more than loops that don't.
+DEVICE_READ_COST = 50e-6
+DEVICE_WRITE_COST = 50e-6
+SYSTEM_CALL_COST = 2e-6
+CONSOLE_CHAR_COST = 87e-6  # 115200 baud serial
+
+PHYSICS_STEP = 0.001  # Seconds per step of the plant model
+DEVICE_REFRESH = 0.010  # Smart port devices report new readings every 10 ms
+
+ROBOT_HALF_LENGTH = 230  # mm from the center of the bot to the rear bumper
+GOAL_RADIUS = 120  # mm, a mobile goal is roughly a 10 in hexagon
+TRACTION_LIMIT = 0.8 * 9810  # mm/s^2 before the wheels start to slip
+
+# Mobile goal locations from auto_algo.txt, in mm from the center of the field
+FIELD_GOALS = [(-1200, 600), (-1200, -600), (1200, 0), (1500, 600), (1500, -600)]
+
+
+class _Shaft:
+    """
+    A rotating shaft driven by one or more motors. Every motor gets its own shaft
+    unless a DriveTrain links the motors of one side together.
+
+    `angle` and `rpm` are measured at the motor, before any external gearing.
+    """
+    def __init__(self, motors):
+        self.motors = list(motors)
+        self.angle = 0.0
+        self.rpm = 0.0
+        self.sample_angle = 0.0
+        self.sample_rpm = 0.0
+        self.tau = 0.05  # Seconds for an unloaded motor to close most of a speed error
+
+    def step(self, dt: float, now: float):
+        accel = 0.0
+
+        for motor in self.motors:
+            accel += motor._accel(self, now)
+
+        accel /= len(self.motors)
+        new_rpm = self.rpm + accel * dt
+        self.angle += (self.rpm + new_rpm) / 2 / 60 * 360 * dt
+        self.rpm = new_rpm
+
+        for motor in self.motors:
+            motor._heat(dt)
+
+    def sample(self):
+        self.sample_angle = self.angle
+        self.sample_rpm = self.rpm
+
+
+class _DrivePlant:
+    """
+    Differential drive model. Each side is a shaft; the wheels turn
+    `1 / gear_ratio` times for each turn of the motors and travel `wheel_travel`
+    mm per turn. The body can't accelerate faster than the wheels have traction
+    for, so hard launches make the encoders run ahead of the real position.
+
+    Field frame: mm from the center of the field, heading 0 is +y and increases
+    clockwise, the same convention the inertial sensor and GPS use.
+    """
+    def __init__(self, left: _Shaft, right: _Shaft, wheel_travel: float, track_width: float,
+                 gear_ratio: float, pose):
+        self.left = left
+        self.right = right
+        self.wheel_travel = wheel_travel
+        self.track_width = track_width
+        self.gear_ratio = gear_ratio
+        self.x, self.y, heading = pose
+        self.theta = math.radians(heading)  # Clockwise, unbounded
+        self.ground_l = 0.0
+        self.ground_r = 0.0
+        self.speed = 0.0  # mm/s along the heading
+        self.turn_rate = 0.0  # rad/s clockwise
+        self.accel = 0.0  # mm/s^2 along the heading
+        self.distance = 0.0  # Signed mm travelled along the heading
+        self.sample_theta = self.theta
+        self.sample_turn_rate = 0.0
+        self.sample_accel = 0.0
+        self.sample_lateral = 0.0
+
+        left.tau = right.tau = 0.2  # The weight of the bot slows the motors down
+
+    def wheel_speed(self, shaft: _Shaft) -> float:
+        return shaft.rpm / 60 / self.gear_ratio * self.wheel_travel
+
+    def step(self, dt: float):
+        limit = TRACTION_LIMIT * dt
+        self.ground_l += max(-limit, min(limit, self.wheel_speed(self.left) - self.ground_l))
+        self.ground_r += max(-limit, min(limit, self.wheel_speed(self.right) - self.ground_r))
+
+        speed = (self.ground_l + self.ground_r) / 2
+        self.turn_rate = (self.ground_l - self.ground_r) / self.track_width
+        self.accel = (speed - self.speed) / dt
+        self.speed = speed
+
+        self.theta += self.turn_rate * dt
+        self.x += speed * math.sin(self.theta) * dt
+        self.y += speed * math.cos(self.theta) * dt
+        self.distance += speed * dt
+
+    def sample(self):
+        self.sample_theta = self.theta
+        self.sample_turn_rate = self.turn_rate
+        self.sample_accel = self.accel
+        self.sample_lateral = self.speed * self.turn_rate
+
+    @property
+    def heading(self) -> float:
+        return math.degrees(self.theta) % 360
+
+
+class Simulation:
+    """
+    Owns the clock, the threads, the devices and the plant. There is exactly one of
+    these, `vex.sim`, and reset() puts it back to a fresh power-on state.
+    """
+    def __init__(self):
+        self.tasks = []
+        self._current = None
+        self._resetting = False
+        self.reset()
+
+    # -- Setup -------------------------------------------------------------
+
+    def reset(self, seed: int = 0, pose=(0.0, 0.0, 0.0), gear_ratio=None, goals=None,
+              time_limit=None, competition=("disabled", True), gps_period: float = 0.1,
+              gps_noise: float = 15.0, imu_drift: float = 0.0, sd_root=None, sd_card: bool = True,
+              echo: bool = False):
+        """
+        Throw away every thread and device and start over at time 0.
+
+        pose is the (x mm, y mm, heading deg) the bot starts at. gear_ratio is motor
+        turns per wheel turn and overrides the ratio handed to DriveTrain. competition
+        is (mode, connected) where mode is "disabled", "autonomous" or "driver".
+        sd_card=False runs the program as if there's no SD card in the brain.
+        """
+        self._kill_all()
+
+        self.now = 0.0
+        self.time_limit = time_limit
+        self.random = random.Random(seed)
+        self.start_pose = pose
+        self.gear_ratio = gear_ratio
+        self.goals = [list(g) for g in (FIELD_GOALS if goals is None else goals)]
+        self.competition_mode, self.field_connected = competition
+        self.competition = None
+        self.gps_period = gps_period
+        self.gps_noise = gps_noise
+        self.imu_drift = imu_drift
+        self.sd_root = sd_root or tempfile.mkdtemp(prefix="vex_sd_")
+        self.sd_card = sd_card
+        self.echo = echo
+
+        self.devices = []
+        self.shafts = []
+        self.plant = None
+        self.controllers = []
+        self.screens = []
+        self.console = []
+        self.io_counts = {}
+        self.errors = []
+        self.trace = None
+        self.trace_every = 0
+
+        self._physics_time = 0.0
+        self._steps = 0
+        self._seq = 0
+        self._ready = []
+        self._events = []
+
+        main = _Task("main")
+        main.thread = threading.current_thread()
+        self.main_task = main
+        self.tasks = [main]
+        self._current = main
+
+    def _kill_all(self):
+        self._resetting = True
+
+        for task in self.tasks:
+            if task is self.main_task or task.done:
+                continue
+
+            task.killed = True
+            task.resume.set()
+            task.thread.join(timeout=5)
+
+        self._resetting = False
+
+    def start_trace(self, every_ms: int = 5):
+        """
+        Record (time, x, y, heading, distance, left deg, right deg) from the plant
+        every `every_ms` milliseconds, and every wait() call of every thread.
+        """
+        self.trace = []
+        self.trace_every = max(1, int(round(every_ms / 1000 / PHYSICS_STEP)))
+
+        for task in self.tasks:
+            task.yields = []
+
+    def stop_trace(self):
+        trace, self.trace = self.trace, None
+        return trace
+
+    # -- Scheduling ----------------------------------------------------------
+
+    def spawn(self, fn, args=(), name=None) -> _Task:
+        """
+        Create a simulated thread. Like on the brain, it doesn't start running until
+        the current thread waits.
+        """
+        task = _Task(name or getattr(fn, "__name__", "thread"), fn, tuple(args))
+        task.wake = self.now
+        task.yields = [] if self.trace is not None else task.yields
+        task.thread = threading.Thread(target=self._run_task, args=(task,), daemon=True)
+        self.tasks.append(task)
+        self._push(task)
+        task.thread.start()
+        return task
+
+    def at(self, t: float, fn):
+        """
+        Call fn() (from the host, not a simulated thread) once the clock reaches t
+        seconds. Handy for scripting stick movements and button presses.
+        """
+        self._seq += 1
+        heapq.heappush(self._events, (t, self._seq, fn))
+
+    def sleep(self, seconds: float):
+        me = self._current
+
+        if me.killed:
+            raise _TaskKilled
+
+        if self.trace is not None:
+            me.yields.append(self.now)
+
+        me.cpu += self.now - me.resumed_at
+        me.wake = self.now + max(0.0, seconds)
+        self._push(me)
+        self._switch(me)
+        self._check_limit()
+
+    def run_for(self, seconds: float):
+        """
+        Let simulated time pass from the host, giving every thread a chance to run.
+        """
+        self.sleep(seconds)
+
+    def _push(self, task: _Task):
+        self._seq += 1
+        heapq.heappush(self._ready, (task.wake, self._seq, task))
+
+    def _switch(self, me):
+        # Handle any scripted events that are due before the next thread wakes up
+        while self._events and self._events[0][0] <= self._ready[0][0]:
+            t, _, fn = heapq.heappop(self._events)
+            self._advance(t)
+            fn()
+
+        wake, _, nxt = heapq.heappop(self._ready)
+        self._advance(wake)
+        self._current = nxt
+        nxt.resumed_at = self.now
+
+        if nxt is me:
+            return
+
+        nxt.resume.set()
+
+        if me is None:
+            return  # The calling thread is finished and doesn't need to come back
+
+        me.resume.wait()
+        me.resume.clear()
+
+        if me.killed:
+            raise _TaskKilled
+
+    def _run_task(self, task: _Task):
+        task.resume.wait()
+        task.resume.clear()
+
+        try:
+            if task.killed:
+                raise _TaskKilled
+
+            task.fn(*task.args)
+        except _TaskKilled:
+            if self._resetting:
+                return
+        except BaseException as e:
+            if self._resetting:
+                return
+
+            self.errors.append((task.name, e))
+            print("[sim] thread '{}' crashed at {:.3f}s:".format(task.name, self.now), file=sys.stderr)
+            traceback.print_exc()
+
+        task.done = True
+        task.cpu += self.now - task.resumed_at
+        self._switch(None)
+
+    def _kill(self, task: _Task):
+        if task.done:
+            return
+
+        task.killed = True
+
+        if task is self._current:
+            raise _TaskKilled
+
+    def _check_limit(self):
+        if self.time_limit is not None and self.now > self.time_limit:
+            raise SimulationTimeout("simulated clock passed {}s".format(self.time_limit))
+
+    # -- Time and physics ------------------------------------------------------
+
+    def io(self, device, method: str, cost: float):
+        """
+        Charge the running thread for one device call and keep count of it.
+        """
+        key = (device._label, method)
+        self.io_counts[key] = self.io_counts.get(key, 0) + 1
+        self.now += cost
+        self._advance(self.now)
+        self._check_limit()
+
+    def console_print(self, *args, sep=" ", end="\n", **_):
+        """
+        Replacement for print() inside simulated programs. Serial output isn't free
+        on the brain, so neither is it here.
+        """
+        text = sep.join(str(a) for a in args) + end
+        self.console.append((self.now, text))
+        self.now += len(text) * CONSOLE_CHAR_COST
+        self._advance(self.now)
+
+        if self.echo:
+            sys.stdout.write(text)
+
+        self._check_limit()
+
+    def _advance(self, t: float):
+        refresh = int(round(DEVICE_REFRESH / PHYSICS_STEP))
+
+        while self._physics_time + PHYSICS_STEP <= t + 1e-12:
+            self._physics_time += PHYSICS_STEP
+            self._steps += 1
+
+            for shaft in self.shafts:
+                shaft.step(PHYSICS_STEP, self._physics_time)
+
+            if self.plant is not None:
+                self.plant.step(PHYSICS_STEP)
+
+            if self._steps % refresh == 0:
+                for shaft in self.shafts:
+                    shaft.sample()
+
+                if self.plant is not None:
+                    self.plant.sample()
+
+                for device in self.devices:
+                    device._refresh()
+
+            if self.trace is not None and self._steps % self.trace_every == 0:
+                self._record()
+
+        self.now = max(self.now, t)
+
+    def _record(self):
+        plant = self.plant
+
+        if plant is None:
+            return
+
+        self.trace.append((self._physics_time, plant.x, plant.y, math.degrees(plant.theta),
+                           plant.distance, plant.left.angle, plant.right.angle))
+
+    # -- Things a test script can poke --------------------------------------------
+
+    def controller(self, index: int = 0) -> "Controller":
+        return self.controllers[index]
+
+    def press(self, button: "_Button", hold: float = 0.1):
+        """
+        Press a controller button and let go of it `hold` seconds later.
+        """
+        button._set(True)
+        self.at(self.now + hold, lambda: button._set(False))
+
+    def touch(self, x: int, y: int, screen_index: int = 0, hold: float = 0.1):
+        """
+        Touch the brain screen at (x, y) and let go `hold` seconds later.
+        """
+        scr = self.screens[screen_index]
+        scr._touch(x, y, True)
+        self.at(self.now + hold, lambda: scr._touch(x, y, False))
+
+    def start_autonomous(self):
+        self.competition_mode = "autonomous"
+        self.spawn(self.competition._auto, name="autonomous")
+
+    def start_driver_control(self):
+        self.competition_mode = "driver"
+        self.spawn(self.competition._driver, name="driver_control")
+
+    def pose(self):
+        """
+        The true pose of the bot: (x mm, y mm, heading deg).
+        """
+        return self.plant.x, self.plant.y, self.plant.heading
+
+    def cpu_share(self):
+        """
+        Fraction of the elapsed simulated time each thread spent holding the CPU.
+        """
+        elapsed = self.now or 1.0
+        share = {}
+
+        for task in self.tasks:
+            busy = task.cpu + (self.now - task.resumed_at if task is self._current else 0.0)
+            share[task.name] = share.get(task.name, 0.0) + busy / elapsed
+
+        return share
+
+    def io_total(self) -> int:
+        return sum(self.io_counts.values())
+
+    # -- Device plumbing -------------------------------------------------------
+
+    def _register(self, device):
+        self.devices.append(device)
+
+    def _link_drive(self, left_motors, right_motors, wheel_travel, track_width, gear_ratio):
+        shafts = []
+
+        for motors in (left_motors, right_motors):
+            shaft = _Shaft(motors)
+
+            for motor in motors:
+                if motor._shaft in self.shafts:
+                    self.shafts.remove(motor._shaft)
+
+                motor._shaft = shaft
+
+            self.shafts.append(shaft)
+            shafts.append(shaft)
+
+        ratio = self.gear_ratio if self.gear_ratio is not None else gear_ratio
+        self.plant = _DrivePlant(shafts[0], shafts[1], wheel_travel, track_width, ratio, self.start_pose)
+
+
+sim = Simulation()
+
+
+def wait(time, units=MSEC):
+    """
+    Block the current thread, letting the others run.
+    """
+    sim.sleep(_seconds(time, units))
+
+
+sleep = wait
+
+
+# ---------------------------------------------------------------------------
+# Threads, timers and events
+# ---------------------------------------------------------------------------
+
+class Thread:
+    def __init__(self, callback, args=()):
+        self._task = sim.spawn(callback, args)
+
+    def stop(self):
+        sim._kill(self._task)
+
+    @staticmethod
+    def sleep_for(duration, units=MSEC):
+        wait(duration, units)
+
+
+class Timer:
+    def __init__(self):
+        self._start = sim.now
+
+    def time(self, units=MSEC):
+        sim.now += SYSTEM_CALL_COST
+        elapsed = sim.now - self._start
+        return elapsed if units is SECONDS else elapsed * 1000
+
+    def value(self):
+        return self.time(SECONDS)
+
+    def clear(self):
+        self._start = sim.now
+
+    reset = clear
+
+    def system(self):
+        return int(sim.now * 1000)
+
+    def system_high_res(self):
+        return int(sim.now * 1e6)
+
+    def event(self, callback, delay, args=()):
+        sim.at(sim.now + delay / 1000, lambda: sim.spawn(callback, args))
+
+
+class Event:
+    def __init__(self, callback=None, args=()):
+        self._handlers = []
+
+        if callback is not None:
+            self._handlers.append((callback, tuple(args)))
+
+    def __call__(self, callback, args=()):
+        self._handlers.append((callback, tuple(args)))
+
+    def broadcast(self):
+        for callback, args in self._handlers:
+            sim.spawn(callback, args)
+
+    def broadcast_and_wait(self):
+        tasks = [sim.spawn(callback, args) for callback, args in self._handlers]
+
+        while not all(t.done for t in tasks):
+            wait(5, MSEC)
+
+
+class Competition:
+    def __init__(self, driver_control, autonomous):
+        self._driver = driver_control
+        self._auto = autonomous
+        sim.competition = self
+
+    @staticmethod
+    def is_enabled():
+        return sim.competition_mode != "disabled"
+
+    @staticmethod
+    def is_driver_control():
+        return sim.competition_mode == "driver"
+
+    @staticmethod
+    def is_autonomous():
+        return sim.competition_mode == "autonomous"
+
+    @staticmethod
+    def is_competition_switch():
+        return sim.field_connected
+
+    @staticmethod
+    def is_field_control():
+        return sim.field_connected
+
+
+# ---------------------------------------------------------------------------
+# Devices
+# ---------------------------------------------------------------------------
+
+class _Device:
+    """
+    Base class for anything that lives on a port and costs bus time to talk to.
+    """
+    def __init__(self, label: str):
+        self._label = label
+        sim._register(self)
+
+    def _read(self, method: str):
+        sim.io(self, method, DEVICE_READ_COST)
+
+    def _write(self, method: str):
+        sim.io(self, method, DEVICE_WRITE_COST)
+
+    def _refresh(self):
+        pass
+
+    def installed(self):
+        self._read("installed")
+        return True
+
+
+def _velocity_rpm(value, units, max_rpm) -> float:
+    if units is PERCENT:
+        return value / 100 * max_rpm
+    if units is DPS:
+        return value / 6
+
+    return value
+
+
+def _rpm_in(value, units, max_rpm) -> float:
+    if units is PERCENT:
+        return value / max_rpm * 100
+    if units is DPS:
+        return value * 6
+
+    return value
+
+
+# Motor electrical/thermal model. Numbers are picked so a motor that is stalled
+# hard reaches 55C in a couple of minutes and a cruising drive stays near 40C.
+MAX_CURRENT = 2.5  # Amps
+AMBIENT_TEMP = 25.0  # C
+THERMAL_TAU = 120.0  # Seconds for the motor to shed most of its extra heat
+HEAT_PER_AMP2 = 0.08  # C per second per amp squared
+THROTTLE_TEMP = 55.0  # C, the firmware halves the current limit from here
+STALL_TORQUE = {100: 2.1, 200: 1.05, 600: 0.35}  # Nm per cartridge
+
+
+class Motor(_Device):
+    def __init__(self, port, *args):
+        gears = GearSetting.RATIO_18_1
+        reverse = False
+
+        for arg in args:
+            if isinstance(arg, _Const):
+                gears = arg
+            elif isinstance(arg, bool):
+                reverse = arg
+
+        super().__init__("Motor[PORT{}]".format(port + 1))
+        self._port = port
+        self._max_rpm = gears.value
+        self._reverse = reverse
+        self._shaft = _Shaft([self])
+        sim.shafts.append(self._shaft)
+
+        self._mode = "stop"
+        self._rpm_cmd = 0.0
+        self._volts = 0.0
+        self._target = 0.0
+        self._until = 0.0
+        self._brake = COAST
+        self._hold_at = 0.0
+        self._vel_setting = self._max_rpm / 2
+        self._zero = 0.0
+        self._temp = AMBIENT_TEMP
+        self._amps = 0.0
+        self._max_torque = 1.0  # Fraction of the normal current limit
+        self._timeout = None
+
+    # -- Plant side --------------------------------------------------------------
+
+    def _pos(self, shaft_angle: float) -> float:
+        return shaft_angle - self._zero
+
+    def _accel(self, shaft: _Shaft, now: float) -> float:
+        """
+        How hard this motor is trying to change the shaft speed, in rpm/s.
+        """
+        pos = self._pos(shaft.angle)
+        tau = shaft.tau
+
+        if self._mode == "timed" and now >= self._until:
+            self._stop_now(shaft.angle)
+        elif self._mode == "pos" and abs(self._target - pos) < 1:
+            self._stop_now(shaft.angle)
+
+        if self._mode == "vel" or self._mode == "timed":
+            target = self._rpm_cmd
+        elif self._mode == "volt":
+            target = self._volts / 12 * self._max_rpm
+            tau *= 1.5  # No velocity loop helping it along
+        elif self._mode == "pos":
+            target = max(-abs(self._rpm_cmd), min(abs(self._rpm_cmd), (self._target - pos) * 10))
+        elif self._brake is HOLD:
+            target = max(-self._max_rpm, min(self._max_rpm, (self._hold_at - shaft.angle) * 10))
+            tau *= 0.5
+        elif self._brake is BRAKE:
+            target = 0.0
+            tau *= 0.5
+        else:
+            self._amps = 0.0
+            return -shaft.rpm / (tau * 8)  # Coasting, only friction slows it down
+
+        limit = MAX_CURRENT * self._max_torque
+
+        if self._temp >= THROTTLE_TEMP:
+            limit /= 2
+            tau *= 2
+
+        error = target - shaft.rpm
+        self._amps = min(limit, 0.1 + MAX_CURRENT * abs(error) / (0.3 * self._max_rpm) + 0.4 * abs(shaft.rpm) / self._max_rpm)
+        return error / tau * (limit / MAX_CURRENT)
+
+    def _heat(self, dt: float):
+        self._temp += (HEAT_PER_AMP2 * self._amps ** 2 - (self._temp - AMBIENT_TEMP) / THERMAL_TAU) * dt
+
+    def _stop_now(self, shaft_angle: float):
+        self._mode = "stop"
+        self._hold_at = shaft_angle
+
+    # -- Commands -----------------------------------------------------------------
+
+    def _direction(self, direction) -> int:
+        if not isinstance(direction, _Const) or direction not in (FORWARD, REVERSE):
+            raise TypeError("expected a DirectionType, got {!r}".format(direction))
+
+        return direction.value
+
+    def spin(self, direction, velocity=None, units=RPM):
+        self._write("spin")
+        sign = self._direction(direction)
+
+        if units is VOLT or units is MV:
+            self._mode = "volt"
+            self._volts = sign * (velocity / 1000 if units is MV else velocity)
+            return
+
+        rpm = self._vel_setting if velocity is None else _velocity_rpm(velocity, units, self._max_rpm)
+        self._mode = "vel"
+        self._rpm_cmd = sign * max(-self._max_rpm, min(self._max_rpm, rpm))
+
+    def spin_for(self, direction, value, units=DEGREES, velocity=None, units_v=RPM, wait=True):
+        self._write("spin_for")
+        sign = self._direction(direction)
+        rpm = self._vel_setting if velocity is None else _velocity_rpm(velocity, units_v, self._max_rpm)
+        rpm = max(-self._max_rpm, min(self._max_rpm, rpm))
+
+        if units is MSEC or units is SECONDS:
+            self._mode = "timed"
+            self._rpm_cmd = sign * rpm
+            self._until = sim.now + _seconds(value, units)
+        else:
+            self._mode = "pos"
+            self._rpm_cmd = rpm
+            self._target = self._pos(self._shaft.angle) + sign * value * units.value
+
+        if wait:
+            self._wait_done()
+
+        return True
+
+    def spin_to_position(self, rotation, units=DEGREES, velocity=None, units_v=RPM, wait=True):
+        self._write("spin_to_position")
+        rpm = self._vel_setting if velocity is None else _velocity_rpm(velocity, units_v, self._max_rpm)
+        self._mode = "pos"
+        self._rpm_cmd = max(-self._max_rpm, min(self._max_rpm, rpm))
+        self._target = rotation * units.value
+
+        if wait:
+            self._wait_done()
+
+        return True
+
+    def _wait_done(self):
+        started = sim.now
+
+        while self._mode in ("pos", "timed"):
+            if self._timeout is not None and sim.now - started > self._timeout:
+                self._stop_now(self._shaft.angle)
+                break
+
+            wait(10, MSEC)
+
+    def stop(self, mode=None):
+        self._write("stop")
+
+        if mode is not None:
+            self._brake = mode
+
+        self._stop_now(self._shaft.angle)
+
+    def set_velocity(self, value, units=RPM):
+        self._write("set_velocity")
+        self._vel_setting = _velocity_rpm(value, units, self._max_rpm)
+
+    def set_stopping(self, mode):
+        self._write("set_stopping")
+        self._brake = mode
+
+    def set_max_torque(self, value, units=PERCENT):
+        self._write("set_max_torque")
+        self._max_torque = value / 100 if units is PERCENT else value / STALL_TORQUE[self._max_rpm]
+
+    def set_timeout(self, value, units=MSEC):
+        self._write("set_timeout")
+        self._timeout = _seconds(value, units)
+
+    def reset_position(self):
+        self._write("reset_position")
+        self._zero = self._shaft.sample_angle
+
+    def set_position(self, value, units=DEGREES):
+        self._write("set_position")
+        self._zero = self._shaft.sample_angle - value * units.value
+
+    # -- Readings ------------------------------------------------------------------
+
+    def position(self, units=DEGREES):
+        self._read("position")
+        return (self._shaft.sample_angle - self._zero) / units.value
+
+    def velocity(self, units=RPM):
+        self._read("velocity")
+        return _rpm_in(self._shaft.sample_rpm, units, self._max_rpm)
+
+    def current(self, units=CurrentUnits.AMP):
+        self._read("current")
+        return self._amps
+
+    def temperature(self, units=TemperatureUnits.CELSIUS):
+        self._read("temperature")
+
+        if units is PERCENT:
+            return (self._temp - AMBIENT_TEMP) / (70 - AMBIENT_TEMP) * 100
+        if units is TemperatureUnits.FAHRENHEIT:
+            return self._temp * 9 / 5 + 32
+
+        return self._temp
+
+    def power(self, units=PowerUnits.WATT):
+        self._read("power")
+        return 12 * self._amps * min(1.0, abs(self._shaft.rpm) / self._max_rpm + 0.1)
+
+    def torque(self, units=TorqueUnits.NM):
+        self._read("torque")
+        return self._amps / MAX_CURRENT * STALL_TORQUE[self._max_rpm]
+
+    def efficiency(self, units=PERCENT):
+        self._read("efficiency")
+
+        if self._amps < 0.05:
+            return 0.0
+
+        return max(0.0, min(100.0, 100 * abs(self._shaft.rpm) / self._max_rpm * (1 - self._amps / (2 * MAX_CURRENT))))
+
+    def is_spinning(self):
+        self._read("is_spinning")
+        return self._mode != "stop"
+
+    def is_done(self):
+        self._read("is_done")
+        return self._mode not in ("pos", "timed")
+
+    def command(self, units=RPM):
+        self._read("command")
+        return _rpm_in(self._rpm_cmd, units, self._max_rpm)
+
+
+class MotorGroup:
+    def __init__(self, *motors):
+        self._motors = list(motors)
+
+    def count(self):
+        return len(self._motors)
+
+    def spin(self, direction, velocity=None, units=RPM):
+        for motor in self._motors:
+            motor.spin(direction, velocity, units)
+
+    def spin_for(self, direction, value, units=DEGREES, velocity=None, units_v=RPM, wait=True):
+        for motor in self._motors:
+            motor.spin_for(direction, value, units, velocity, units_v, False)
+
+        if wait:
+            for motor in self._motors:
+                motor._wait_done()
+
+        return True
+
+    def spin_to_position(self, rotation, units=DEGREES, velocity=None, units_v=RPM, wait=True):
+        for motor in self._motors:
+            motor.spin_to_position(rotation, units, velocity, units_v, False)
+
+        if wait:
+            for motor in self._motors:
+                motor._wait_done()
+
+        return True
+
+    def stop(self, mode=None):
+        for motor in self._motors:
+            motor.stop(mode)
+
+    def set_velocity(self, value, units=RPM):
+        for motor in self._motors:
+            motor.set_velocity(value, units)
+
+    def set_stopping(self, mode):
+        for motor in self._motors:
+            motor.set_stopping(mode)
+
+    def set_max_torque(self, value, units=PERCENT):
+        for motor in self._motors:
+            motor.set_max_torque(value, units)
+
+    def set_timeout(self, value, units=MSEC):
+        for motor in self._motors:
+            motor.set_timeout(value, units)
+
+    def reset_position(self):
+        for motor in self._motors:
+            motor.reset_position()
+
+    def set_position(self, value, units=DEGREES):
+        for motor in self._motors:
+            motor.set_position(value, units)
+
+    def position(self, units=DEGREES):
+        return self._motors[0].position(units)
+
+    def velocity(self, units=RPM):
+        return self._motors[0].velocity(units)
+
+    def current(self, units=CurrentUnits.AMP):
+        return sum(m.current(units) for m in self._motors)
+
+    def temperature(self, units=TemperatureUnits.CELSIUS):
+        return sum(m.temperature(units) for m in self._motors) / len(self._motors)
+
+    def power(self, units=PowerUnits.WATT):
+        return sum(m.power(units) for m in self._motors)
+
+    def torque(self, units=TorqueUnits.NM):
+        return sum(m.torque(units) for m in self._motors)
+
+    def efficiency(self, units=PERCENT):
+        return sum(m.efficiency(units) for m in self._motors) / len(self._motors)
+
+    def is_spinning(self):
+        return any(m.is_spinning() for m in self._motors)
+
+    def is_done(self):
+        return all(m.is_done() for m in self._motors)
+
+
+class DriveTrain:
+    def __init__(self, lm: MotorGroup, rm: MotorGroup, wheel_travel=300, track_width=320,
+                 wheel_base=320, units=MM, external_gear_ratio=1.0):
+        self._left = lm
+        self._right = rm
+        self._wheel_travel = wheel_travel * units.value
+        self._track_width = track_width * units.value
+        self._gear_ratio = external_gear_ratio
+        self._drive_velocity = 50.0  # Percent
+        self._turn_velocity = 50.0
+        self._timeout = None
+
+        sim._link_drive(lm._motors, rm._motors, self._wheel_travel, self._track_width, external_gear_ratio)
+
+        if sim.gear_ratio is not None:
+            self._gear_ratio = sim.gear_ratio
+
+    def drive(self, direction, velocity=None, units=PERCENT):
+        velocity = self._drive_velocity if velocity is None else velocity
+        self._left.spin(direction, velocity, units)
+        self._right.spin(direction, velocity, units)
+
+    def turn(self, direction, velocity=None, units=PERCENT):
+        velocity = self._turn_velocity if velocity is None else velocity
+        self._left.spin(FORWARD, direction.value * velocity, units)
+        self._right.spin(FORWARD, -direction.value * velocity, units)
+
+    def drive_for(self, direction, distance, units=INCHES, velocity=None, units_v=PERCENT, wait=True):
+        velocity = self._drive_velocity if velocity is None else velocity
+        degrees = distance * units.value / self._wheel_travel * 360 * self._gear_ratio
+        self._left.spin_for(direction, degrees, DEGREES, velocity, units_v, False)
+        self._right.spin_for(direction, degrees, DEGREES, velocity, units_v, False)
+
+        if wait:
+            self._wait_done()
+
+        return True
+
+    def turn_for(self, direction, angle, units=DEGREES, velocity=None, units_v=PERCENT, wait=True):
+        velocity = self._turn_velocity if velocity is None else velocity
+        arc = angle * units.value / 360 * math.pi * self._track_width
+        degrees = arc / self._wheel_travel * 360 * self._gear_ratio
+        left = FORWARD if direction is RIGHT else REVERSE
+        right = REVERSE if direction is RIGHT else FORWARD
+        self._left.spin_for(left, degrees, DEGREES, velocity, units_v, False)
+        self._right.spin_for(right, degrees, DEGREES, velocity, units_v, False)
+
+        if wait:
+            self._wait_done()
+
+        return True
+
+    def _wait_done(self):
+        for motor in self._left._motors + self._right._motors:
+            motor._wait_done()
+
+    def stop(self, mode=None):
+        self._left.stop(mode)
+        self._right.stop(mode)
+
+    def set_drive_velocity(self, velocity, units=PERCENT):
+        self._drive_velocity = velocity
+
+    def set_turn_velocity(self, velocity, units=PERCENT):
+        self._turn_velocity = velocity
+
+    def set_stopping(self, mode):
+        self._left.set_stopping(mode)
+        self._right.set_stopping(mode)
+
+    def set_timeout(self, value, units=MSEC):
+        self._left.set_timeout(value, units)
+        self._right.set_timeout(value, units)
+
+    def set_gear_ratio(self, ratio):
+        self._gear_ratio = ratio
+
+    def is_done(self):
+        return self._left.is_done() and self._right.is_done()
+
+    def is_moving(self):
+        return not self.is_done()
+
+    def velocity(self, units=PERCENT):
+        return (self._left.velocity(units) + self._right.velocity(units)) / 2
+
+    def current(self, units=CurrentUnits.AMP):
+        return self._left.current(units) + self._right.current(units)
+
+    def power(self, units=PowerUnits.WATT):
+        return self._left.power(units) + self._right.power(units)
+
+    def torque(self, units=TorqueUnits.NM):
+        return self._left.torque(units) + self._right.torque(units)
+
+    def efficiency(self, units=PERCENT):
+        return (self._left.efficiency(units) + self._right.efficiency(units)) / 2
+
+    def temperature(self, units=TemperatureUnits.CELSIUS):
+        return (self._left.temperature(units) + self._right.temperature(units)) / 2
+
+
+class Inertial(_Device):
+    CALIBRATION_TIME = 2.0  # Seconds, about what a real V5 IMU takes
+
+    def __init__(self, port):
+        super().__init__("Inertial[PORT{}]".format(port + 1))
+        self._calibrated_at = 0.0
+        self._rezero = False
+        self._zero = sim.start_pose[2]  # Plant rotation (deg) that reads as 0
+        self._drift = 0.0
+
+    def _refresh(self):
+        self._drift += sim.imu_drift * DEVICE_REFRESH
+
+    def _raw(self) -> float:
+        plant = sim.plant
+        theta = math.degrees(plant.sample_theta) if plant is not None else sim.start_pose[2]
+        return theta + self._drift
+
+    def _rotation(self) -> float:
+        # A real sensor reads 0 while it calibrates and starts counting from
+        # wherever the bot was pointing once it's done.
+        if sim.now < self._calibrated_at:
+            return 0.0
+
+        if self._rezero:
+            self._zero = self._raw()
+            self._rezero = False
+
+        return self._raw() - self._zero
+
+    def calibrate(self):
+        self._write("calibrate")
+        self._calibrated_at = sim.now + self.CALIBRATION_TIME
+        self._rezero = True
+
+    def is_calibrating(self):
+        self._read("is_calibrating")
+        return sim.now < self._calibrated_at
+
+    def heading(self, units=DEGREES):
+        self._read("heading")
+        return self._rotation() % 360
+
+    def rotation(self, units=DEGREES):
+        self._read("rotation")
+        return self._rotation()
+
+    def set_heading(self, value, units=DEGREES):
+        self._write("set_heading")
+        self._rotation()
+        self._zero = self._raw() - value
+
+    def set_rotation(self, value, units=DEGREES):
+        self.set_heading(value, units)
+
+    def reset_heading(self):
+        self.set_heading(0)
+
+    def reset_rotation(self):
+        self.set_heading(0)
+
+    def orientation(self, axis, units=DEGREES):
+        self._read("orientation")
+
+        if axis is OrientationType.YAW:
+            yaw = self._rotation() % 360
+            return yaw - 360 if yaw > 180 else yaw
+
+        return sim.random.gauss(0, 0.05)
+
+    def gyro_rate(self, axis, units=DPS):
+        self._read("gyro_rate")
+        plant = sim.plant
+
+        if axis is AxisType.ZAXIS and plant is not None:
+            return math.degrees(plant.sample_turn_rate)
+
+        return sim.random.gauss(0, 0.2)
+
+    def acceleration(self, axis):
+        self._read("acceleration")
+        plant = sim.plant
+
+        if axis is AxisType.ZAXIS or plant is None:
+            return 1.0 if axis is AxisType.ZAXIS else 0.0
+        if axis is AxisType.YAXIS:
+            return plant.sample_accel / 9810 + sim.random.gauss(0, 0.005)
+
+        return plant.sample_lateral / 9810 + sim.random.gauss(0, 0.005)
+
+    def changed(self, callback, args=()):
+        pass
+
+    def collision(self, callback, args=()):
+        pass
+
+
+class Optical(_Device):
+    def __init__(self, port):
+        super().__init__("Optical[PORT{}]".format(port + 1))
+        self._light = 0
+        self._threshold = 100
+
+    def _gap(self) -> float:
+        """
+        How far (mm) the nearest mobile goal is from the rear bumper, if it is
+        roughly behind the bot. The sensor is mounted on the back facing backward.
+        """
+        plant = sim.plant
+
+        if plant is None:
+            return math.inf
+
+        rear_x = plant.x - math.sin(plant.theta) * ROBOT_HALF_LENGTH
+        rear_y = plant.y - math.cos(plant.theta) * ROBOT_HALF_LENGTH
+        best = math.inf
+
+        for gx, gy in sim.goals:
+            dx, dy = gx - rear_x, gy - rear_y
+            dist = math.hypot(dx, dy)
+            # Angle between "straight out the back" and the goal
+            off = math.degrees(math.atan2(dx, dy) - plant.theta - math.pi)
+            off = (off + 180) % 360 - 180
+
+            if abs(off) < 35 or dist < GOAL_RADIUS:
+                best = min(best, dist - GOAL_RADIUS)
+
+        return best
+
+    def is_near_object(self):
+        self._read("is_near_object")
+        # Higher thresholds need the object closer. 255 never detects anything.
+        return self._threshold < 255 and self._gap() <= (255 - self._threshold) * 1.5
+
+    def object_detect_threshold(self, value):
+        self._write("object_detect_threshold")
+        self._threshold = value
+
+    def set_light(self, value, units=PERCENT):
+        self._write("set_light")
+        self._light = value if not isinstance(value, _Const) else (100 if value.name == "ON" else 0)
+
+    def set_light_power(self, value, units=PERCENT):
+        self.set_light(value)
+
+    def hue(self):
+        self._read("hue")
+        return 55 + sim.random.gauss(0, 2) if self._gap() < 100 else sim.random.uniform(0, 360)
+
+    def brightness(self, readraw=False):
+        self._read("brightness")
+        return max(0.0, min(100.0, 100 - self._gap() / 5))
+
+    def color(self):
+        self._read("color")
+        return Color.YELLOW if self._gap() < 100 else Color.BLACK
+
+    def object_detected(self, callback, args=()):
+        pass
+
+    def object_lost(self, callback, args=()):
+        pass
+
+
+class Gps(_Device):
+    """
+    The GPS reports where the center of the bot is (origin offsets are assumed to
+    be set up correctly), but only gets a new fix every `sim.gps_period` seconds
+    and each fix is off by some gaussian noise.
+    """
+    def __init__(self, port, origin_x=0, origin_y=0, units=MM, heading_offset=0):
+        super().__init__("Gps[PORT{}]".format(port + 1))
+        self._fix = tuple(sim.start_pose)
+        self._next_fix = 0.0
+        self._calibrated_at = 0.0
+
+    def _refresh(self):
+        if sim.now < self._next_fix or sim.plant is None:
+            return
+
+        self._next_fix = sim.now + sim.gps_period
+        noise = sim.gps_noise
+        plant = sim.plant
+        self._fix = (plant.x + sim.random.gauss(0, noise), plant.y + sim.random.gauss(0, noise),
+                     (plant.heading + sim.random.gauss(0, noise / 15)) % 360)
+
+    def x_position(self, units=MM):
+        self._read("x_position")
+        return self._fix[0] / units.value
+
+    def y_position(self, units=MM):
+        self._read("y_position")
+        return self._fix[1] / units.value
+
+    def heading(self):
+        self._read("heading")
+        return self._fix[2]
+
+    def quality(self):
+        self._read("quality")
+        return 100
+
+    def calibrate(self):
+        self._write("calibrate")
+        self._calibrated_at = sim.now + 0.5
+
+    def is_calibrating(self):
+        self._read("is_calibrating")
+        return sim.now < self._calibrated_at
+
+    def set_origin(self, x=0, y=0, units=MM):
+        self._write("set_origin")
+
+    def set_location(self, x, y, units=MM, angle=0, units_r=DEGREES):
+        self._write("set_location")
+
+    def changed(self, callback, args=()):
+        pass
+
+
+class _TriPort:
+    def __init__(self, brain_label: str, letter: str):
+        self._label = "{}.{}".format(brain_label, letter)
+        self._value = 0
+
+
+class DigitalOut(_Device):
+    def __init__(self, port: _TriPort):
+        super().__init__("DigitalOut[{}]".format(port._label))
+        self._port = port
+
+    def set(self, value):
+        self._write("set")
+        self._port._value = 1 if value else 0
+
+    def value(self):
+        self._read("value")
+        return self._port._value
+
+
+class DigitalIn(_Device):
+    def __init__(self, port: _TriPort):
+        super().__init__("DigitalIn[{}]".format(port._label))
+        self._port = port
+
+    def value(self):
+        self._read("value")
+        return self._port._value
+
+
+class _ThreeWirePort:
+    def __init__(self, label: str):
+        for letter in "abcdefgh":
+            setattr(self, letter, _TriPort(label, letter))
+
+
+class _Callbacks:
+    """
+    A list of event handlers that each get their own thread when fired, the same
+    way the brain runs event callbacks.
+    """
+    def __init__(self):
+        self._handlers = []
+
+    def add(self, callback, args=()):
+        self._handlers.append((callback, tuple(args)))
+
+    def fire(self):
+        for callback, args in self._handlers:
+            sim.spawn(callback, args)
+
+
+class _Button(_Device):
+    def __init__(self, label: str):
+        super().__init__(label)
+        self._pressing = False
+        self._on_pressed = _Callbacks()
+        self._on_released = _Callbacks()
+
+    def pressing(self):
+        self._read("pressing")
+        return self._pressing
+
+    def pressed(self, callback, args=()):
+        self._on_pressed.add(callback, args)
+
+    def released(self, callback, args=()):
+        self._on_released.add(callback, args)
+
+    def _set(self, value: bool):
+        if value == self._pressing:
+            return
+
+        self._pressing = value
+        (self._on_pressed if value else self._on_released).fire()
+
+
+class _Axis(_Device):
+    def __init__(self, label: str):
+        super().__init__(label)
+        self._value = 0
+        self._on_changed = _Callbacks()
+
+    def position(self):
+        self._read("position")
+        return self._value
+
+    def value(self):
+        return self.position()
+
+    def changed(self, callback, args=()):
+        self._on_changed.add(callback, args)
+
+    def set(self, value: int):
+        """
+        Simulation only: move the stick.
+        """
+        value = int(max(-100, min(100, value)))
+
+        if value != self._value:
+            self._value = value
+            self._on_changed.fire()
+
+
+class _ControllerScreen(_Device):
+    def __init__(self, label: str):
+        super().__init__(label)
+        self.rows = ["", "", ""]
+        self._row = 1
+        self._col = 1
+        self.ops = 0
+
+    def print(self, *args, sep=" "):
+        self._write("print")
+        self.ops += 1
+        text = sep.join(str(a) for a in args)
+        row = self.rows[self._row - 1]
+        row = row[:self._col - 1].ljust(self._col - 1) + text
+        self.rows[self._row - 1] = row
+        self._col += len(text)
+
+    def set_cursor(self, row, col):
+        self._write("set_cursor")
+        self._row = max(1, min(3, row))
+        self._col = max(1, col)
+
+    def next_row(self):
+        self._write("next_row")
+        self._row = min(3, self._row + 1)
+        self._col = 1
+
+    new_line = next_row
+
+    def clear_screen(self):
+        self._write("clear_screen")
+        self.ops += 1
+        self.rows = ["", "", ""]
+        self._row = self._col = 1
+
+    def clear_row(self, row=None):
+        self._write("clear_row")
+        self.ops += 1
+        self.rows[(row or self._row) - 1] = ""
+
+    def row(self):
+        return self._row
+
+    def column(self):
+        return self._col
+
+
+class Controller:
+    def __init__(self, kind=PRIMARY):
+        label = "Controller[{}]".format(kind)
+
+        for name in ("axis1", "axis2", "axis3", "axis4"):
+            setattr(self, name, _Axis("{}.{}".format(label, name)))
+
+        for name in ("L1", "L2", "R1", "R2", "Up", "Down", "Left", "Right", "X", "B", "Y", "A"):
+            setattr(self, "button" + name, _Button("{}.button{}".format(label, name)))
+
+        self.screen = _ControllerScreen(label + ".screen")
+        sim.controllers.append(self)
+
+    def rumble(self, pattern: str):
+        pass
+
+
+class _BrainScreen(_Device):
+    """
+    The 480 x 272 brain screen. Nothing is drawn anywhere; we just keep count of
+    how much drawing a program does (`ops`, `pixels`, `clears`) so it can be compared.
+    """
+    WIDTH = 480
+    HEIGHT = 240
+
+    def __init__(self, label: str):
+        super().__init__(label)
+        self.ops = 0
+        self.pixels = 0
+        self.clears = 0
+        self.text = []
+        self._x = 0
+        self._y = 0
+        self._pressing = False
+        self._on_pressed = _Callbacks()
+        self._on_released = _Callbacks()
+        sim.screens.append(self)
+
+    def _draw(self, method: str, area: int):
+        self._write(method)
+        self.ops += 1
+        self.pixels += int(area)
+
+    def _touch(self, x: int, y: int, down: bool):
+        self._x, self._y = x, y
+        self._pressing = down
+        (self._on_pressed if down else self._on_released).fire()
+
+    def clear_screen(self, color=None):
+        self._draw("clear_screen", self.WIDTH * self.HEIGHT)
+        self.clears += 1
+        self.text = []
+
+    def clear_row(self, row=None, color=None):
+        self._draw("clear_row", self.WIDTH * 20)
+
+    def set_font(self, font):
+        self._write("set_font")
+
+    def set_pen_color(self, color):
+        self._write("set_pen_color")
+
+    def set_pen_width(self, width):
+        self._write("set_pen_width")
+
+    def set_fill_color(self, color):
+        self._write("set_fill_color")
+
+    def set_cursor(self, row, col):
+        self._write("set_cursor")
+
+    def set_origin(self, x, y):
+        self._write("set_origin")
+
+    def set_clip_region(self, x, y, width, height):
+        self._write("set_clip_region")
+
+    def print(self, *args, sep=" ", **_):
+        text = sep.join(str(a) for a in args)
+        self._draw("print", len(text) * 10 * 20)
+        self.text.append(text)
+
+    def print_at(self, *args, x=0, y=0, sep=" ", opaque=True, **_):
+        text = sep.join(str(a) for a in args)
+        self._draw("print_at", len(text) * 10 * 20)
+        self.text.append(text)
+
+    def new_line(self):
+        self._write("new_line")
+
+    next_row = new_line
+
+    def draw_pixel(self, x, y):
+        self._draw("draw_pixel", 1)
+
+    def draw_line(self, x1, y1, x2, y2):
+        self._draw("draw_line", max(abs(x2 - x1), abs(y2 - y1)))
+
+    def draw_rectangle(self, x, y, width, height, color=None):
+        self._draw("draw_rectangle", width * height)
+
+    def draw_circle(self, x, y, radius, color=None):
+        self._draw("draw_circle", math.pi * radius * radius)
+
+    def render(self):
+        self._write("render")
+        return True
+
+    def x_position(self):
+        self._read("x_position")
+        return self._x
+
+    def y_position(self):
+        self._read("y_position")
+        return self._y
+
+    def pressing(self):
+        self._read("pressing")
+        return self._pressing
+
+    def pressed(self, callback, args=()):
+        self._on_pressed.add(callback, args)
+
+    def released(self, callback, args=()):
+        self._on_released.add(callback, args)
+
+
+class _Battery:
+    def capacity(self):
+        return 100
+
+    def voltage(self, units=MV):
+        return 12800
+
+    def current(self, units=CurrentUnits.AMP):
+        return 0.0
+
+    def temperature(self, units=PERCENT):
+        return 30
+
+
+class _SdCard:
+    """
+    SD card backed by a folder on the host (`sim.sd_root`).
+    """
+    BYTE_COST = 1e-6
+
+    def _path(self, name: str) -> str:
+        return os.path.join(sim.sd_root, name)
+
+    def is_inserted(self):
+        return sim.sd_card
+
+    def exists(self, name: str):
+        return os.path.exists(self._path(name))
+
+    def filesize(self, name: str):
+        return os.path.getsize(self._path(name)) if self.exists(name) else 0
+
+    def loadfile(self, name: str, *args):
+        if not self.exists(name):
+            return bytearray()
+
+        with open(self._path(name), "rb") as f:
+            data = bytearray(f.read())
+
+        sim.now += len(data) * self.BYTE_COST
+        return data
+
+    def savefile(self, name: str, data):
+        return self._store(name, data, "wb")
+
+    def appendfile(self, name: str, data):
+        return self._store(name, data, "ab")
+
+    def _store(self, name: str, data, mode: str):
+        with open(self._path(name), mode) as f:
+            f.write(bytes(data))
+
+        sim.now += len(data) * self.BYTE_COST
+        return len(data)
+
+
+class Brain:
+    def __init__(self):
+        self.screen = _BrainScreen("Brain.screen")
+        self.timer = Timer()
+        self.battery = _Battery()
+        self.sdcard = _SdCard()
+        self.three_wire_port = _ThreeWirePort("Brain")
+
+    def program_stop(self):
+        raise _TaskKilled
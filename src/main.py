@@ -1,4 +1,5 @@
 from vex import *
+from array import array
 import math
 
 # Brain should be defined by default
@@ -30,244 +31,3345 @@ wait(200, MSEC)
 print("\033[2J")
 
 # define variables used for controlling motors based on controller inputs
-intake_stopped = True
-intake_toggled = False
-drive_l_must_stop = False
-drive_r_must_stop = False
+drive_must_stop = False
 
-def toggle_clamp():
+class Mechanism:
     """
-    An event to be called when the Down button is pressed
-    to toggle the pneumatic clamp.
+    A part of the robot that's always in one of a few states, like the clamp being up or 
+    down, or the intake going forward.
+
+    The mechanism remembers its own state and only talks to its devices when the state 
+    actually changes. Everything that moves it (the controller buttons, the autos, 
+    goal_detector) goes through set(), so it can't get out of sync with what it thinks it's 
+    doing, and setting the state it's already in costs nothing.
+
+    To make a new mechanism, override apply() to send the new state to the devices.
+    """
+    def __init__(self, state):
+        self.state = state
+
+    def set(self, state):
+        """
+        Go to `state`. Returns True if that changed anything.
+        """
+        if state == self.state:
+            return False
+
+        self.state = state
+        self.apply(state)
+        return True
+
+    def apply(self, state):
+        """
+        Send a new state to the devices.
+        """
+
+class Pneumatic(Mechanism):
+    """
+    Pistons that are either out (True) or in (False), all moved together. 
+    """
+    def __init__(self, *outputs: DigitalOut):
+        super().__init__(False)
+        self.outputs = outputs
+
+    def toggle(self):
+        self.set(not self.state)
+
+    def apply(self, state: bool):
+        for output in self.outputs:
+            output.set(state)
+
+# What the intake can be doing
+INTAKE_STOPPED = 0
+INTAKE_FORWARD = 1
+INTAKE_REVERSE = 2
+
+class Intake(Mechanism):
+    """
+    The intake goes forward while Y is held and backward while B is held. Otherwise it 
+    goes forward if it's been toggled on with Right, and stops if it hasn't. Holding Y or 
+    B turns the toggle off, switching back to manual mode.
+
+    The buttons tell us when they're pressed and released, so instead of the driver loop 
+    checking them every pass, each press or release just works out the state again.
+    """
+    def __init__(self):
+        super().__init__(INTAKE_STOPPED)
+        self.forward_held = False
+        self.reverse_held = False
+        self.toggled = False
+
+    def apply(self, state: int):
+        if state == INTAKE_FORWARD:
+            intake.spin(FORWARD)
+        elif state == INTAKE_REVERSE:
+            intake.spin(REVERSE)
+        else:
+            intake.stop()
+
+    def update(self):
+        if self.forward_held or self.reverse_held:
+            self.toggled = False
+
+        if self.forward_held:
+            self.set(INTAKE_FORWARD)
+        elif self.reverse_held:
+            self.set(INTAKE_REVERSE)
+        elif self.toggled:
+            self.set(INTAKE_FORWARD)
+        else:
+            self.set(INTAKE_STOPPED)
+
+    def toggle(self):
+        self.toggled = not self.toggled
+        self.update()
+
+    # One for each button event
+    def forward_pressed(self):
+        self.forward_held = True
+        self.update()
+
+    def forward_released(self):
+        self.forward_held = False
+        self.update()
+
+    def reverse_pressed(self):
+        self.reverse_held = True
+        self.update()
+
+    def reverse_released(self):
+        self.reverse_held = False
+        self.update()
+
+intake_mechanism = Intake()
+clamp_mechanism = Pneumatic(clamp)
+# Both hang pistons are one mechanism, so they're always set to the same thing and can't
+# end up with one out and one in
+hang_mechanism = Pneumatic(pneum_lift_1, pneum_lift_2)
+
+def show_loop_stats():
+    """
+    An event to be called when the Left button is pressed. Prints how long every loop's
+    ticks have been taking to the console, and puts a summary on the brain screen. Also 
+    prints how every motor is holding up.
+    """
+    scheduler.report()
+    health.report()
+    scheduler.show()
+
+
+# Register the events to be pressed
+controller.buttonDown.pressed(clamp_mechanism.toggle) 
+controller.buttonRight.pressed(intake_mechanism.toggle)
+controller.buttonR2.pressed(hang_mechanism.toggle)
+controller.buttonLeft.pressed(show_loop_stats)
+controller.buttonY.pressed(intake_mechanism.forward_pressed)
+controller.buttonY.released(intake_mechanism.forward_released)
+controller.buttonB.pressed(intake_mechanism.reverse_pressed)
+controller.buttonB.released(intake_mechanism.reverse_released)
+
+# Configure the lift
+intake.set_velocity(100, PERCENT)
+intake.set_stopping(COAST) # I'm not sure if this actually changes anything
+
+# Constants are a type of variable that don't change, or are always constant
+# It's easier to know what's going on when there are words rather than the same
+# numbre all over the place.
+WHEEL_BASE = 13.5 # Inches
+WHEEL_DIAMETER = 4 # Inches
+
+MAX_TURN_SPEED = 55 # Percent
+MAX_SPEED = 100 # Percent
+ACCELERATION = 85 # Percent per second 
+GEAR_RATIO = 2 / 3 # Gear Ratio of the drivetrain
+WHEEL_CIRC = WHEEL_DIAMETER * math.pi # Circumference of the omni wheels
+
+# How fast the robot moves at 100% velocity. The drive motors spin at 600 RPM.
+MAX_DRIVE_SPEED = 600 / 60 * GEAR_RATIO * WHEEL_CIRC # Inches per second
+MAX_TURN_RATE = MAX_DRIVE_SPEED / (math.pi * WHEEL_BASE) * 360 # Degrees per second
+
+# ACCELERATION is gentle on purpose so the robot is easy to handle. In auto nobody has to
+# steer, so motion profiles are allowed to speed up and slow down a lot harder.
+AUTO_ACCELERATION = 250 # Percent per second
+
+# Catch-up policies for a PeriodicLoop that falls behind schedule. See PeriodicLoop.run()
+SKIP_MISSED = 0 # Drop the ticks we missed and line back up with the schedule
+RUN_MISSED = 1 # Run the missed ticks back to back until we've caught up
+
+class LoopProfile:
+    """
+    How long a loop's ticks take and how evenly they come, so we can see where the time goes
+    before tuning gains or making a loop run faster.
+
+    There are two histograms, each with BUCKETS fixed-size buckets, where the last bucket
+    also counts everything longer:
+    - run_times: how long the work in each tick took, from 0 to one period
+    - periods: from the start of one tick to the start of the next, from 0 to two periods
+    On top of those we keep the longest tick, the worst jitter (how far a period was from
+    what it should have been), and long_ticks, the ticks whose work took longer than a whole
+    period.
+
+    A tick can be split into sections, like reading the motors and doing the math. Add
+    them with section() when setting up, then call lap() after each part and the time since
+    the last lap is added to that section's total. Whatever comes after the last lap counts
+    as "rest".
+
+    Everything is counted into arrays made up front, so timing a tick only costs a few reads
+    of the microsecond timer and some adding.
+    """
+    BUCKETS = 20
+
+    def __init__(self, name: str, period_ms: int):
+        self.name = name
+        self.period = period_ms * 1000 # Microseconds
+        self.run_bucket = max(1, self.period // self.BUCKETS) # Microseconds per bucket
+        self.period_bucket = max(1, 2 * self.period // self.BUCKETS)
+        self.sections = ["rest"]
+        self.section_times = array("L", [0]) # Microseconds, in the same order as sections
+        self.run_times = array("L", [0] * self.BUCKETS)
+        self.periods = array("L", [0] * self.BUCKETS)
+        self.reset()
+
+    def reset(self):
+        """
+        Forget everything counted so far.
+        """
+        for i in range(self.BUCKETS):
+            self.run_times[i] = 0
+            self.periods[i] = 0
+
+        for i in range(len(self.sections)):
+            self.section_times[i] = 0
+
+        self.ticks = 0
+        self.total = 0 # Microseconds of work in every tick added up
+        self.max_run = 0
+        self.max_jitter = 0
+        self.long_ticks = 0
+        self.started = None
+        self.lap_at = 0
+
+    def section(self, name: str):
+        """
+        Add a section and return the number to lap() it with.
+        """
+        self.sections.append(name)
+        self.section_times.append(0)
+        return len(self.sections) - 1
+
+    def begin(self):
+        """
+        Call at the start of every tick.
+        """
+        now = brain.timer.system_high_res()
+
+        if self.started is not None:
+            period = now - self.started
+            self.periods[min(period // self.period_bucket, self.BUCKETS - 1)] += 1
+            self.max_jitter = max(self.max_jitter, abs(period - self.period))
+
+        self.started = now
+        self.lap_at = now
+
+    def lap(self, section: int):
+        """
+        The part of the tick since the last lap (or the start) was `section`.
+        """
+        now = brain.timer.system_high_res()
+        self.section_times[section] += now - self.lap_at
+        self.lap_at = now
+
+    def end(self):
+        """
+        Call at the end of every tick's work, before waiting for the next one.
+        """
+        now = brain.timer.system_high_res()
+        self.section_times[0] += now - self.lap_at
+        run = now - self.started
+        self.run_times[min(run // self.run_bucket, self.BUCKETS - 1)] += 1
+        self.ticks += 1
+        self.total += run
+        self.max_run = max(self.max_run, run)
+
+        if run > self.period:
+            self.long_ticks += 1
+
+    def summary(self):
+        """
+        One short line, small enough for the brain screen.
+        """
+        average = self.total / self.ticks / 1000 if self.ticks else 0
+
+        return "{} avg {:.2f} max {:.2f} jit {:.1f}ms long {}".format(
+            self.name, average, self.max_run / 1000, self.max_jitter / 1000, self.long_ticks)
+
+    def report(self):
+        """
+        Everything, as a list of lines to print.
+        """
+        lines = [self.summary() + " ({} ticks)".format(self.ticks)]
+
+        for label, histogram, width in (("  run", self.run_times, self.run_bucket),
+                                        ("  period", self.periods, self.period_bucket)):
+            buckets = []
+
+            for i in range(self.BUCKETS):
+                if histogram[i]:
+                    low = i * width / 1000
+                    high = "+" if i == self.BUCKETS - 1 else "-{:g}".format(low + width / 1000)
+                    buckets.append("{:g}{}ms:{}".format(low, high, histogram[i]))
+
+            lines.append(label + " " + " ".join(buckets))
+
+        if len(self.sections) > 1 and self.total:
+            # Where the time went, with "rest" last
+            order = list(range(1, len(self.sections))) + [0]
+            lines.append("  " + " ".join(["{} {:.0f}%".format(self.sections[i], 100 * self.section_times[i] / self.total)
+                                          for i in order]))
+
+        return lines
+
+class PeriodicLoop:
+    """
+    Runs a function over and over at a fixed rate. 
+
+    The simple way to do this is `while True: do_work(); wait(20, MSEC)`, but then the
+    real period is 20ms *plus* however long the work took, and it changes every time the
+    work takes a different amount of time. Instead, we keep a deadline for the next tick,
+    and each time we add exactly one period to it (next deadline = last deadline + period)
+    and only wait for whatever time is left. That way the loop never drifts.
+
+    If a tick starts so late that the next deadline has already passed, that's an overrun.
+    What happens then depends on `catch_up`:
+    - SKIP_MISSED throws away the ticks we completely missed and carries on from the next
+      deadline that's still coming up. The callback is told how much time really passed.
+    - RUN_MISSED runs the missed ticks right away, back to back, so nothing is lost. If we've
+      fallen more than MAX_CATCH_UP ticks behind we give up and skip the rest anyway.
+
+    The callback gets one argument, the time in seconds since its last tick. This is always
+    a whole number of periods, so anything that uses it (like the acceleration ramp in
+    remote_control_loop) behaves exactly the same every tick.
+    """
+    MAX_CATCH_UP = 5
+
+    def __init__(self, name: str, callback, period_ms: int, catch_up = SKIP_MISSED):
+        self.name = name
+        self.callback = callback
+        self.period = period_ms
+        self.catch_up = catch_up
+        self.running = True
+
+        # Statistics, so we can check how well the loop is keeping up
+        self.ticks = 0 # How many times the callback has run
+        self.overruns = 0 # How many times a tick started after the next one was already due
+        self.skipped = 0 # How many ticks were thrown away to catch up
+        self.max_late = 0 # The latest (ms) a tick has ever started after its deadline
+        self.profile = LoopProfile(name, period_ms) # How long the ticks take
+
+    def run(self):
+        """
+        The loop itself. Run this in a thread, or let a Scheduler do it.
+        """
+        deadline = brain.timer.time(MSEC)
+
+        while self.running:
+            # How late this tick is starting. A little late is normal, since another thread
+            # may have had the CPU when we should have woken up.
+            late = brain.timer.time(MSEC) - deadline
+            periods = 1 # How many periods this tick is covering
+
+            if late >= self.period:
+                # We completely missed at least one tick
+                self.overruns += 1
+                missed = int(late // self.period)
+
+                if self.catch_up == SKIP_MISSED or missed > self.MAX_CATCH_UP:
+                    # Jump the deadline ahead past the ticks we missed. This tick
+                    # covers all the time since the last one.
+                    deadline += missed * self.period
+                    late -= missed * self.period
+                    periods += missed
+                    self.skipped += missed
+
+            self.max_late = max(self.max_late, late)
+
+            self.profile.begin()
+            self.callback(self.period * periods / 1000)
+            self.profile.end()
+            self.ticks += 1
+
+            # Only wait for what's left of the period. Always wait, even for 0ms, so
+            # other threads still get a turn when we're behind.
+            deadline += self.period
+            wait(max(0, deadline - brain.timer.time(MSEC)), MSEC)
+
+    def start(self):
+        """
+        Start running the loop in its own thread.
+        """
+        Thread(self.run)
+
+    def stop(self):
+        self.running = False
+
+class Scheduler:
+    """
+    Keeps track of every fixed-rate loop running on the robot. Each loop gets its own 
+    thread, so a slow loop can't hold up the others, but they all keep time the same way
+    and their statistics can all be found in one place.
+    """
+    def __init__(self):
+        self.loops = []
+
+    def every(self, period_ms: int, callback, name = None, catch_up = SKIP_MISSED):
+        """
+        Start calling callback(delta_seconds) every `period_ms` milliseconds. Returns
+        the PeriodicLoop so it can be stopped or inspected later.
+        """
+        loop = self.add(period_ms, callback, name, catch_up)
+        loop.start()
+        return loop
+
+    def add(self, period_ms: int, callback, name = None, catch_up = SKIP_MISSED):
+        """
+        Like every(), but doesn't start the loop yet. Use this when the callback needs
+        something from the loop itself (like its profile sections): set that up first,
+        then call loop.start(). Otherwise the first tick could run before it exists.
+        """
+        loop = PeriodicLoop(name or callback.__name__, callback, period_ms, catch_up)
+        self.loops.append(loop)
+        return loop
+
+    def find(self, name: str):
+        """
+        Get a registered loop by its name, or None if there isn't one.
+        """
+        for loop in self.loops:
+            if loop.name == name:
+                return loop
+
+        return None
+
+    def report(self):
+        """
+        Print every loop's statistics and timing histograms to the console.
+        """
+        for loop in self.loops:
+            for line in loop.profile.report():
+                print(line)
+
+            print("  late starts {}, skipped {}, latest {:.1f}ms".format(loop.overruns, loop.skipped, loop.max_late))
+
+    def show(self):
+        """
+        Put one line per loop on the brain screen, over whatever page is there (like the 
+        selector) until the screen is touched.
+        """
+        # Touching anywhere on the page goes back, so it starts with a widget as big as the 
+        # screen. It doesn't draw anything, and the labels go on top of it.
+        page = [
+            Widget(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT, ui.back),
+            Label(0, 0, SCREEN_WIDTH, "Loops (touch to go back)", Color.YELLOW, font = FontType.MONO15),
+        ]
+
+        for i, loop in enumerate(self.loops):
+            # MONO15 is small enough for a whole summary on one line
+            page.append(Label(0, 25 * (i + 1), SCREEN_WIDTH, loop.profile.summary(), font = FontType.MONO15))
+
+        ui.show_over(page)
+
+scheduler = Scheduler()
+
+class Snapshot:
+    """
+    One reading of every sensor the control loops care about, all taken at (nearly) the
+    same instant.
+
+    Every time we ask a device for a value, the brain has to go talk to it over the smart
+    port, which takes time. The driver loop used to ask the controller for axis3 and axis1
+    twice each per pass, and every auto loop asked all four drive motors for their position.
+    Instead, a loop calls one of the read_ methods once at the start of its tick, and 
+    everything else reads the saved values from here. Besides being faster, everyone sees
+    the same numbers for the whole tick instead of values that changed halfway through.
+
+    The drivetrain and heading are read by the odometry loop (see Odometry), so they're
+    always at most one odometry tick old. Nothing else needs to read them itself.
+
+    The values are updated in place so no new objects get made every tick.
+    """
+    def __init__(self):
+        self.time = 0 # Brain time (ms) of the last drivetrain read
+
+        # Controller
+        self.axis1 = 0
+        self.axis3 = 0
+
+        # Drivetrain, in the same order as `motors`
+        self.positions = [0.0] * len(motors) # Degrees
+        self.heading = 0.0 # 0 to 360
+        self.rotation = 0.0 # Like heading, but doesn't wrap around
+
+    def read_controller(self):
+        """
+        Read the joystick axes. The buttons tell the mechanisms when they change by 
+        themselves, so they aren't read here.
+        """
+        self.axis1 = controller.axis1.position()
+        self.axis3 = controller.axis3.position()
+
+    def read_drivetrain(self):
+        """
+        Read the position of every drive motor.
+        """
+        positions = self.positions
+
+        for i in range(len(motors)):
+            positions[i] = motors[i].position()
+
+        self.time = brain.timer.time(MSEC)
+
+    def read_heading(self):
+        """
+        Read the heading from the inertial sensor. We ask for rotation, since heading is
+        just rotation wrapped to 0-360 and we can work that out ourselves.
+        """
+        self.rotation = inertial.rotation()
+        self.heading = self.rotation % 360
+
+sensors = Snapshot()
+
+ODOMETRY_PERIOD = 10 # Milliseconds. The motors and inertial sensor only update every 10ms.
+
+class Odometry:
+    """
+    Keeps track of where the robot is on the field: x and y in inches from where it started,
+    and its heading in degrees. Like the inertial sensor's rotation(), the heading goes
+    clockwise and doesn't wrap around at 360. Heading 0 points along +y.
+
+    Every tick, we see how far each side's wheels went since the last tick. The average of
+    the two sides is how far the middle of the robot went, and we move the pose that far
+    along the average of the old and new heading. The heading comes from the inertial
+    sensor, since wheels slip when turning. While the inertial sensor is calibrating it 
+    can't be trusted, so we work the heading out from the difference between the sides
+    instead, and line the two back up once it's done.
+
+    This runs in its own loop and never resets the motors, so nothing drifts from 
+    resetting over and over, and the autos don't have to wait for a reset to take effect.
+    Anything that wants to know how far it has gone saves `distance` at the start and 
+    subtracts it.
+
+    Reading the pose doesn't need a lock. Each tick builds a brand new (x, y, heading) tuple
+    and swaps it in with one assignment, so a reader always gets a whole pose from a single
+    tick, never x from one tick and y from the next: `x, y, heading = odometry.pose`
+    """
+    def __init__(self):
+        self.pose = (0.0, 0.0, 0.0)
+        self.distance = 0.0 # Inches driven forward (minus backward) since the program started
+        self.speed = 0.0 # Inches per second over the last tick, negative going backward
+        self.left = 0.0 # Inches the left wheels have gone
+        self.right = 0.0 # Inches the right wheels have gone
+        self.left_speed = 0.0 # Inches per second, for DriveMotors
+        self.right_speed = 0.0
+
+        self.imu_offset = None # What to add to inertial rotation to get our heading
+        self.new_pose = None # Set by set_pose(), picked up on the next tick
+        self.last_left = 0.0
+        self.last_right = 0.0
+
+    def set_pose(self, x: float, y: float, heading: float):
+        """
+        Tell odometry where the robot is, like at the start of an auto. This takes effect
+        on the next tick so the odometry loop is the only thing that ever changes the pose.
+        """
+        self.new_pose = (x, y, heading)
+
+    def update(self, delta: float):
+        """
+        One tick. The scheduler runs this every ODOMETRY_PERIOD milliseconds.
+        """
+        sensors.read_drivetrain()
+        odometry_loop.profile.lap(ODOMETRY_MOTORS)
+        positions = sensors.positions
+        to_inches = GEAR_RATIO * WHEEL_CIRC / 360
+
+        # motors is [left, left, right, right]
+        left = (positions[0] + positions[1]) / 2 * to_inches
+        right = (positions[2] + positions[3]) / 2 * to_inches
+        d_left = left - self.last_left
+        d_right = right - self.last_right
+        self.last_left = left
+        self.last_right = right
+
+        x, y, heading = self.pose
+
+        if self.new_pose is not None:
+            x, y, heading = self.new_pose
+            self.new_pose = None
+            self.imu_offset = None
+
+        if inertial.is_calibrating():
+            self.imu_offset = None
+            new_heading = heading + math.degrees((d_left - d_right) / WHEEL_BASE)
+        else:
+            sensors.read_heading()
+            odometry_loop.profile.lap(ODOMETRY_INERTIAL)
+
+            if self.imu_offset is None:
+                self.imu_offset = heading - sensors.rotation
+
+            new_heading = sensors.rotation + self.imu_offset
+
+        moved = (d_left + d_right) / 2
+        middle = math.radians((heading + new_heading) / 2)
+
+        self.left += d_left
+        self.right += d_right
+        self.distance += moved
+        self.speed = moved / delta
+        self.left_speed = d_left / delta
+        self.right_speed = d_right / delta
+        self.pose = (x + moved * math.sin(middle), y + moved * math.cos(middle), new_heading)
+
+odometry = Odometry()
+odometry_loop = scheduler.add(ODOMETRY_PERIOD, odometry.update, "odometry")
+ODOMETRY_MOTORS = odometry_loop.profile.section("motors")
+ODOMETRY_INERTIAL = odometry_loop.profile.section("inertial")
+odometry_loop.start()
+
+class DriveMotors:
+    """
+    Drives each side of the drivetrain at a speed by working out the voltage for it 
+    ourselves, instead of asking the motors for a velocity in PERCENT.
+
+    The velocity control inside the motors is tuned for a motor on its own, not one pushing 
+    a whole robot around, so it's slow to get up to speed and gives up a lot when something
+    pushes back. Here the voltage for each side comes from a model of the drivetrain, plus a
+    correction from how fast odometry says the wheels are really going:
+
+        volts = kS * sign(speed) + kV * speed + kA * acceleration + kP * (speed - measured)
+
+    kS is what it takes to get the robot moving at all (friction), kV is what it takes to 
+    hold a speed, and kA is the extra it takes to speed up. kP fixes whatever the model gets
+    wrong, like a robot pushing back or a low battery.
+
+    Two more things happen on the way to the motors:
+    - Traction limiting: each side's speed can't change by more than MAX_ACCEL inches per
+      second every second. Past that the wheels just spin on the tiles, which wastes the push
+      and makes odometry think we went further than we did.
+    - Write skipping: if a side's voltage is within WRITE_TOLERANCE of what it was last sent,
+      it isn't sent again. Every command is a trip over the smart port to two motors, and 
+      holding the sticks still (or cruising in auto) would send the same thing every pass.
+
+    Everything that drives the robot goes through set() and stop(), so this always knows 
+    what the motors were last told.
+    """
+    kS = 0.2 # Volts
+    kV = 12 / MAX_DRIVE_SPEED # Volts per inch per second
+    kA = 0.3 * kV # Volts per inch per second squared, found in the simulator
+    kP = 6 * kV # Volts per inch per second the wheels are behind, found in the simulator
+
+    # Inches per second squared. Auto plans for AUTO_ACCELERATION, but its PID needs room on
+    # top of that to catch up. If the wheels slip on real tiles, this is the one to lower.
+    MAX_ACCEL = MAX_DRIVE_SPEED * 8
+    WRITE_TOLERANCE = 0.05 # Volts
+    MAX_DT = 0.05 # Seconds. Longer than this since the last set() and we start from a stop.
+
+    def __init__(self):
+        self.speeds = [0.0, 0.0] # What each side is aiming for right now, inches per second
+        self.volts = [None, None] # What each side was last sent, None if it's stopped
+        self.last_time = 0
+        self.writes = 0
+
+    def set(self, left_percent: float, right_percent: float, left_accel = None, right_accel = None):
+        """
+        Drive each side at a percent of MAX_DRIVE_SPEED. Negative goes backward.
+
+        A follower that already knows how fast each side should be speeding up (percent per
+        second, from its profile) passes it in for kA. Otherwise it comes from how much the
+        speed changed since last time, which is fine for sticks but jumps around when the
+        speed comes out of a PID.
+        """
+        now = brain.timer.time(MSEC)
+        dt = (now - self.last_time) / 1000
+        self.last_time = now
+
+        if dt <= 0 or dt > self.MAX_DT:
+            dt = ODOMETRY_PERIOD / 1000
+
+        step = self.MAX_ACCEL * dt
+        left = self._volts(0, left_percent, left_accel, odometry.left_speed, step, dt)
+        right = self._volts(1, right_percent, right_accel, odometry.right_speed, step, dt)
+
+        # If a side would need more than the battery has, turn both down together so we 
+        # still turn as sharply as we should
+        highest = max(abs(left), abs(right))
+
+        if highest > 12:
+            left = left * 12 / highest
+            right = right * 12 / highest
+
+        self._write(0, mgL, left)
+        self._write(1, mgR, right)
+
+    def _volts(self, side: int, percent: float, accel, measured: float, step: float, dt: float) -> float:
+        previous = self.speeds[side]
+        target = percent * MAX_DRIVE_SPEED / 100
+        speed = max(previous - step, min(previous + step, target))
+        self.speeds[side] = speed
+
+        if accel is None:
+            accel = (speed - previous) / dt
+        else:
+            accel = max(-self.MAX_ACCEL, min(self.MAX_ACCEL, accel * MAX_DRIVE_SPEED / 100))
+
+        volts = self.kV * speed + self.kA * accel + self.kP * (speed - measured)
+
+        if speed > 0:
+            volts += self.kS
+        elif speed < 0:
+            volts -= self.kS
+
+        return volts
+
+    def _write(self, side: int, group: MotorGroup, volts: float):
+        last = self.volts[side]
+
+        if last is not None and -self.WRITE_TOLERANCE < volts - last < self.WRITE_TOLERANCE:
+            return
+
+        self.volts[side] = volts
+        self.writes += 1
+        group.spin(FORWARD, volts, VOLT)
+
+    def drive(self, direction, percent: float, accel = None):
+        """
+        Both sides the same way, like drivetrain.drive().
+        """
+        if direction == REVERSE:
+            percent = -percent
+            accel = None if accel is None else -accel
+
+        self.set(percent, percent, accel, accel)
+
+    def turn(self, direction, percent: float, accel = None):
+        """
+        Turn in place, like drivetrain.turn().
+        """
+        if direction == LEFT:
+            percent = -percent
+            accel = None if accel is None else -accel
+
+        self.set(percent, -percent, accel, None if accel is None else -accel)
+
+    def stop(self, mode = None):
+        if mode is None:
+            mgL.stop()
+            mgR.stop()
+        else:
+            mgL.stop(mode)
+            mgR.stop(mode)
+
+        self.speeds[0] = self.speeds[1] = 0.0
+        self.volts[0] = self.volts[1] = None
+
+drive_motors = DriveMotors()
+
+HEALTH_PERIOD = 250 # Milliseconds. Temperatures take seconds to change, current a lot less.
+THROTTLE_TEMP = 55 # Degrees C. The motors halve their own current limit from here.
+
+# What the controller screen is showing
+HEALTH_OK = 0
+HEALTH_DERATED = 1
+HEALTH_THROTTLED = 2
+
+class MotorHealth:
+    """
+    Keeps an eye on how hot every motor is and how hard it's working, and turns a group of 
+    motors down a bit at a time before the motors do it for us.
+
+    A user from the VEX forum states motor current is cut in half at 55C, or about 131F. 
+    https://www.vexforum.com/t/v5-motor-temp-in-percent/52433/4
+    That happens all at once, in the middle of a push, and the driver doesn't find out until
+    the robot suddenly can't win it. Instead, every HEALTH_PERIOD this reads the temperature,
+    current and efficiency of every motor, and keeps rolling averages of the current, the 
+    efficiency and how fast the temperature is going up. From DERATE_START the group the 
+    motor is in gets less and less of its full torque (set_max_torque()), down to 
+    MIN_OUTPUT at DERATE_END, which is still under 55C. Less current means less heat, so 
+    the motors can keep going at most of their power instead of dropping to half. 
+
+    The limit only moves in STEP percent steps, and has to drop HYSTERESIS degrees further
+    before it goes back up, so it isn't sent to the motors every tick while the temperature
+    wobbles. The heating rate is only for report(): real motors report the temperature in 
+    big steps, so a rate worked out from it jumps around too much to derate by.
+
+    Every motor in a group gets the same limit, so the left side of the drivetrain can't 
+    end up weaker than the right.
+
+    Having too much information available to the driver can be overwhelming, which is why a
+    second or third teammate is necessary on the field. So once `display` is on, the 
+    controller screen only says whether everything's fine, which group is turned down and 
+    by how much, or which group is overheating, and it's only redrawn when one of those 
+    changes. report() prints everything else to the console.
+    """
+    CURRENT_SMOOTHING = 0.2 # How much each new reading counts in the rolling averages
+    HEATING_SMOOTHING = 0.05 # Slower, since the temperature only changes in steps
+    DERATE_START = 45 # Degrees C
+    DERATE_END = 53 # Degrees C
+    MIN_OUTPUT = 50 # Percent of full torque at DERATE_END and above
+    STEP = 5 # Percent
+    HYSTERESIS = 1 # Degrees C
+
+    def __init__(self, groups):
+        self.groups = groups # (name, motors) pairs
+        self.motors = [motor for _, group in groups for motor in group]
+        count = len(self.motors)
+
+        self.temperatures = array("f", [0.0] * count) # Degrees C
+        self.heating = array("f", [0.0] * count) # Degrees C per second, rolling average
+        self.currents = array("f", [0.0] * count) # Amps, rolling average
+        self.peak_currents = array("f", [0.0] * count) # Amps
+        self.efficiencies = array("f", [0.0] * count) # Percent, rolling average
+        self.samples = 0
+
+        self.limits = [100] * len(groups) # Percent of full torque each group is allowed
+        self.state = HEALTH_OK
+        self.display = False
+        self.shown = None # What's on the controller screen, so we only redraw when it changes
+
+    def update(self, delta: float):
+        """
+        One tick. The scheduler runs this every HEALTH_PERIOD milliseconds.
+        """
+        smoothing = self.CURRENT_SMOOTHING
+        hottest = 0
+
+        for i in range(len(self.motors)):
+            motor = self.motors[i]
+            temperature = motor.temperature()
+            current = motor.current()
+            efficiency = motor.efficiency()
+
+            if self.samples == 0:
+                self.currents[i] = current
+                self.efficiencies[i] = efficiency
+            else:
+                rate = (temperature - self.temperatures[i]) / delta
+                self.heating[i] += self.HEATING_SMOOTHING * (rate - self.heating[i])
+                self.currents[i] += smoothing * (current - self.currents[i])
+                self.efficiencies[i] += smoothing * (efficiency - self.efficiencies[i])
+
+            self.temperatures[i] = temperature
+            self.peak_currents[i] = max(self.peak_currents[i], current)
+            hottest = max(hottest, temperature)
+
+        self.samples += 1
+        self.derate()
+
+        # Stay overheating until it's cooled off a bit, so a motor sitting right at 
+        # THROTTLE_TEMP doesn't flip the screen back and forth
+        if hottest >= THROTTLE_TEMP or (self.state == HEALTH_THROTTLED and hottest > THROTTLE_TEMP - self.HYSTERESIS):
+            self.state = HEALTH_THROTTLED
+        elif min(self.limits) < 100:
+            self.state = HEALTH_DERATED
+        else:
+            self.state = HEALTH_OK
+
+        if self.display:
+            self.show()
+
+    def derate(self):
+        """
+        Work out each group's limit from its hottest motor, and send it if it changed.
+        """
+        i = 0
+
+        for g in range(len(self.groups)):
+            group = self.groups[g][1]
+            hottest = 0
+
+            for motor in group:
+                hottest = max(hottest, self.temperatures[i])
+                i += 1
+
+            limit = self.limit_for(hottest)
+
+            if limit > self.limits[g]:
+                limit = max(self.limits[g], self.limit_for(hottest + self.HYSTERESIS))
+
+            if limit != self.limits[g]:
+                self.limits[g] = limit
+
+                for motor in group:
+                    motor.set_max_torque(limit, PERCENT)
+
+    def limit_for(self, temperature: float) -> int:
+        """
+        How much of its full torque (percent, a multiple of STEP) a motor this hot gets.
+        """
+        if temperature <= self.DERATE_START:
+            return 100
+
+        fraction = min(1, (temperature - self.DERATE_START) / (self.DERATE_END - self.DERATE_START))
+        limit = 100 - (100 - self.MIN_OUTPUT) * fraction
+        return int(limit // self.STEP) * self.STEP
+
+    def show(self):
+        """
+        Put the state on the controller screen, if it's different from what's there.
+        """
+        if self.state == HEALTH_THROTTLED:
+            group = self.hottest_group()
+        else:
+            group = self.limits.index(min(self.limits))
+
+        showing = (self.state, group, self.limits[group])
+
+        if showing == self.shown:
+            return
+
+        self.shown = showing
+        scr = controller.screen
+        scr.clear_screen()
+        scr.set_cursor(1, 1)
+
+        if self.state == HEALTH_THROTTLED:
+            scr.print("!!! Warning !!!")
+            scr.next_row()
+            scr.print(self.groups[group][0] + " Overheating")
+        elif self.state == HEALTH_DERATED:
+            scr.print("Running warm")
+            scr.next_row()
+            scr.print("{} at {}%".format(self.groups[group][0], self.limits[group]))
+        else:
+            scr.set_cursor(2, 1)
+            scr.print("All good :)")
+
+    def hottest_group(self) -> int:
+        i = 0
+        hottest = 0
+        which = 0
+
+        for g in range(len(self.groups)):
+            for motor in self.groups[g][1]:
+                if self.temperatures[i] > hottest:
+                    hottest = self.temperatures[i]
+                    which = g
+
+                i += 1
+
+        return which
+
+    def start_display(self):
+        """
+        Start showing the state on the controller screen, drawing it now whatever was there.
+        """
+        self.shown = None
+        self.display = True
+
+    def report(self):
+        """
+        Print every motor's numbers and every group's limit to the console.
+        """
+        i = 0
+
+        for g in range(len(self.groups)):
+            name, group = self.groups[g]
+            print("{} at {}%".format(name, self.limits[g]))
+
+            for n in range(len(group)):
+                print("  {} {}: {:.0f}C {:+.2f}C/s, {:.2f}A average, {:.2f}A peak, {:.0f}% efficient".format(
+                    name, n + 1, self.temperatures[i], self.heating[i], self.currents[i],
+                    self.peak_currents[i], self.efficiencies[i]))
+                i += 1
+
+health = MotorHealth((("Drive", motors), ("Intake", [lift, roller])))
+health_loop = scheduler.every(HEALTH_PERIOD, health.update, "health")
+
+# What goes in every telemetry sample, in order. What setpoint, error and output mean 
+# depends on which loop recorded it:
+#     DRIVE_SAMPLE       where the profile says we should be, how far behind we are, power
+#     TURN_SAMPLE        the same, in degrees
+#     PURSUIT_SAMPLE     speed we're aiming for, how far right the lookahead point is, curvature
+#     TRAJECTORY_SAMPLE  speed the trajectory wants, how far behind we are, how far off to the side
+# left, right and heading are odometry's, in inches and degrees.
+TELEMETRY_FIELDS = ("time", "source", "setpoint", "error", "output", "left", "right", "heading")
+TELEMETRY_SOURCES = ("drive", "turn", "pursuit", "trajectory")
+DRIVE_SAMPLE = 0
+TURN_SAMPLE = 1
+PURSUIT_SAMPLE = 2
+TRAJECTORY_SAMPLE = 3
+
+TELEMETRY_MAGIC = b"TLM1"
+TELEMETRY_FILE = "telemetry.bin"
+TELEMETRY_PERIOD = 100 # Milliseconds between flushes
+# Without an SD card, send the samples over the serial link instead of throwing them away.
+# Only for a run with the brain plugged into a computer: printing is slow, and the flush 
+# holds up the other threads while it prints.
+TELEMETRY_SERIAL = False
+
+class Telemetry:
+    """
+    Records what the control loops are doing so we can look at it after a run.
+
+    Printing from inside a control loop is slow: every print waits on the serial link, and
+    the loop is late for its next tick while it does. So record() just copies a few numbers 
+    into a ring buffer that was made at startup, and doesn't print, allocate or wait for
+    anything. Every TELEMETRY_PERIOD milliseconds, flush() runs in its own loop and writes
+    everything recorded since the last flush in one go to the SD card. If the loops ever 
+    record more than CAPACITY samples between flushes, the oldest ones are overwritten and 
+    counted in `dropped`.
+
+    With no SD card the samples are just counted in `dropped`, unless TELEMETRY_SERIAL is 
+    on. Then they're printed, but never more than SERIAL_LINES per flush, so a long run 
+    can't tie up the serial link (and every thread waiting behind it). The rest are dropped.
+
+    The file on the SD card starts with TELEMETRY_MAGIC, then two bytes (little-endian) for
+    the length of a line of text naming the fields and the sources, then one record of 
+    float32s per sample. Over serial, every sample is a line starting with "TLM,". Either 
+    way, sim/decode_telemetry.py turns it into a CSV.
+    """
+    CAPACITY = 1024 # Samples, 32KB
+    SERIAL_LINES = 10 # Most samples printed per flush
+
+    def __init__(self):
+        self.width = len(TELEMETRY_FIELDS)
+        self.buffer = array("f", [0.0] * (self.CAPACITY * self.width))
+        self.view = memoryview(self.buffer)
+        self.recorded = 0 # Samples ever recorded
+        self.flushed = 0 # Samples ever written out
+        self.dropped = 0 # Samples overwritten before they were written out
+        self.filename = None # None if there's no SD card
+        self.serial = False # Print the samples, when there's no SD card
+        self.started = False # Nothing gets written out until start()
+
+    def start(self, filename = TELEMETRY_FILE):
+        """
+        Start a new log, replacing the last one, and write its header.
+        """
+        names = ",".join(TELEMETRY_FIELDS) + ";" + ",".join(TELEMETRY_SOURCES)
+        self.started = True
+
+        if brain.sdcard.is_inserted():
+            self.filename = filename
+            self.serial = False
+            brain.sdcard.savefile(filename, bytearray(TELEMETRY_MAGIC + len(names).to_bytes(2, "little") + names.encode()))
+        else:
+            self.filename = None
+            self.serial = TELEMETRY_SERIAL
+
+            if self.serial:
+                print("TLM#" + names)
+
+    def record(self, source: int, setpoint: float, error: float, output: float):
+        """
+        Save one sample. Cheap enough to call every tick of a control loop.
+        """
+        buffer = self.buffer
+        i = self.recorded % self.CAPACITY * self.width
+        buffer[i] = brain.timer.time(MSEC)
+        buffer[i + 1] = source
+        buffer[i + 2] = setpoint
+        buffer[i + 3] = error
+        buffer[i + 4] = output
+        buffer[i + 5] = odometry.left
+        buffer[i + 6] = odometry.right
+        buffer[i + 7] = odometry.pose[2]
+        self.recorded += 1
+
+    def flush(self, delta: float = 0):
+        """
+        Write out everything recorded since the last flush.
+        """
+        if not self.started:
+            return
+
+        recorded = self.recorded
+        behind = recorded - self.flushed
+        limit = self.CAPACITY
+
+        if self.filename is None:
+            # Nowhere to put them, or only room for a few lines over serial
+            limit = self.SERIAL_LINES if self.serial else 0
+
+        if behind > limit:
+            self.dropped += behind - limit
+            self.flushed = recorded - limit
+
+        # At most two writes: up to the end of the buffer, then from the start if it wrapped
+        while self.flushed < recorded:
+            start = self.flushed % self.CAPACITY
+            end = min(self.CAPACITY, start + recorded - self.flushed)
+            self._write(self.view[start * self.width:end * self.width])
+            self.flushed += end - start
+
+    def _write(self, samples):
+        if self.filename is not None:
+            brain.sdcard.appendfile(self.filename, bytearray(samples))
+            return
+
+        for i in range(0, len(samples), self.width):
+            print("TLM," + ",".join([str(value) for value in samples[i:i + self.width]]))
+
+telemetry = Telemetry()
+telemetry.start()
+telemetry_loop = scheduler.every(TELEMETRY_PERIOD, telemetry.flush, "telemetry")
+
+GOAL_DETECT_PERIOD = 10 # Milliseconds. The optical sensor only updates every 10ms or so.
+
+class GoalDetector:
+    """
+    Watches the optical sensor on the back of the robot for a mobile goal and closes the
+    clamp on it, so the autos don't have to check the sensor themselves while they drive.
+
+    Call arm() before backing into a goal. From then on, every GOAL_DETECT_PERIOD the 
+    detector's own loop checks whether something is right behind us and whether it's the 
+    color of a goal (HUE_MIN to HUE_MAX). One reading can be a fluke, so a goal only counts
+    once CONFIRM readings in a row agree. Then the detector disarms itself and works out
+    when to close the clamp.
+
+    The sensor sees the goal before it's all the way in the clamp. It still has to travel
+    CLAMP_TRAVEL inches, and the clamp takes CLAMP_DELAY milliseconds to close once it's told 
+    to. So at the speed odometry says we're going, we tell the clamp to close CLAMP_DELAY
+    before the goal gets there, counting from the first reading that saw it. If that's 
+    already passed, it closes right away, otherwise a timer event closes it at the right
+    moment. Either way, `fired` is set and the callback given to arm() is called.
+
+    When it isn't armed, the loop doesn't touch the sensor.
+    """
+    CONFIRM = 2 # Readings in a row
+    HUE_MIN = 30 # Degrees. Mobile goals are yellow.
+    HUE_MAX = 90
+    CLAMP_TRAVEL = 3.75 # Inches. auto_min used to wait 50ms at 45% (about 1.9in), plus the clamp closing.
+    CLAMP_DELAY = 50 # Milliseconds
+    MIN_SPEED = 5 # Inches per second. Going slower than this still closes the clamp in time.
+
+    def __init__(self):
+        self.armed = False
+        self.fired = False
+        self.callback = None
+        self.seen = 0 # Readings in a row that saw a goal
+        self.first_seen = 0 # Brain time (ms) of the first of them
+
+    def arm(self, callback = None):
+        """
+        Start watching for a goal. `callback` is called once the clamp has been told to close.
+        """
+        optical.set_light(100)
+        # "Object Detect Threshold" isn't defined anywhere to tell us what exactly
+        # that means. I've learned that it only goes up to 255 and the higher the 
+        # number, the closer an object needs to be to be detected. If the value is 
+        # 255, it just never detects anything. We want to get as close as possible
+        # without being detected to be more accurate.
+        optical.object_detect_threshold(254)
+
+        self.callback = callback
+        self.fired = False
+        self.seen = 0
+        self.armed = True
+
+    def disarm(self):
+        """
+        Stop watching, like when we've gone as far as we're allowed to without finding a goal.
+        """
+        self.armed = False
+
+    def update(self, delta: float):
+        """
+        One tick. The scheduler runs this every GOAL_DETECT_PERIOD milliseconds.
+        """
+        if not self.armed:
+            return
+
+        # Only ask for the hue when something's there
+        if not optical.is_near_object() or not self.HUE_MIN <= optical.hue() <= self.HUE_MAX:
+            self.seen = 0
+            return
+
+        now = brain.timer.time(MSEC)
+
+        if self.seen == 0:
+            self.first_seen = now
+
+        self.seen += 1
+
+        if self.seen < self.CONFIRM:
+            return
+
+        self.armed = False
+        speed = max(abs(odometry.speed), self.MIN_SPEED)
+        delay = self.first_seen + self.CLAMP_TRAVEL / speed * 1000 - self.CLAMP_DELAY - now
+
+        if delay > 0:
+            brain.timer.event(self._fire, int(delay))
+        else:
+            self._fire()
+
+    def _fire(self):
+        clamp_mechanism.set(True)
+        self.fired = True
+
+        if self.callback is not None:
+            self.callback()
+
+goal_detector = GoalDetector()
+goal_detector_loop = scheduler.every(GOAL_DETECT_PERIOD, goal_detector.update, "goal detector")
+
+# Where everything starts on the field, in millimeters from the middle of the field, the same
+# way the GPS sensor measures. These come from auto_algo.txt.
+RED_RINGS = (
+    (-1500, 1200), (-1200, 1500), (-1200, 1200), (-600, 1200), (0, 1500), (600, 1200),
+    (-600, 600), (600, 600), (0, 0), (-600, -600), (600, -600),
+    (-1500, -1200), (-1200, -1200), (-600, -1200), (600, -1200), (-1200, -1500), (0, -1500),
+    # Stacks
+    (1200, 1500), (1200, 1200), (1500, 1200), (1200, -1200), (1500, -1200), (1200, -1500),
+)
+BLUE_RINGS = (
+    (1200, 1500), (1200, 1200), (1500, 1200), (1200, -1200), (1500, -1200), (1200, -1500),
+    # Lone
+    (1700, -1700), (1700, 1700),
+)
+MOBILE_GOALS = (
+    (-1200, 600), (-1200, -600), (1200, 0),
+    # Immutable
+    (1500, 600), (1500, -600),
+)
+
+FIELD_SIZE = 3600 # Millimeters, the field goes from -1800 to 1800 both ways
+MM_PER_INCH = 25.4
+
+class FieldMap:
+    """
+    A set of objects on the field (rings or goals) that are still there to be picked up,
+    for RoutePlanner to plan a route through.
+
+    The positions are kept in flat arrays, and objects are referred to by their index in 
+    the table the map was made from, so planning doesn't have to make a new object for 
+    every ring. Once an object is taken (or knocked away), remove() it so it's never 
+    planned for again.
+    """
+    def __init__(self, table):
+        self.xs = array("f", [x for x, y in table])
+        self.ys = array("f", [y for x, y in table])
+        self.alive = bytearray(b"\x01" * len(table))
+
+    def remove(self, index: int):
+        """
+        Forget about object `index`, like after we've picked it up.
+        """
+        self.alive[index] = 0
+
+red_rings = FieldMap(RED_RINGS)
+blue_rings = FieldMap(BLUE_RINGS)
+mobile_goals = FieldMap(MOBILE_GOALS)
+
+class FieldTransform:
+    """
+    Turns where things are and which way they face, written for one side of the field, into
+    the same thing on the other side: mirrored across the middle line of the field (x = 0).
+
+    Routines are written once, for one alliance, and MIRRORED makes the other alliance's copy
+    out of it when the routines are compiled (see MIRROR in ROUTINES). Every position, heading,
+    turn and trajectory in the copy is already flipped before the match starts, so both 
+    alliances run one precomputed path and nothing checks which side we're on while driving.
+
+    Mirroring left to right turns x into -x, a heading of h into -h (0 is +y, clockwise), and 
+    a left turn into a right one. The ring tables aren't mirror images of each other, since 
+    they come straight from where things are on the field, so the mirrored copy uses the 
+    other alliance's table instead of flipping this one.
+    """
+    def __init__(self, mirrored: bool):
+        self.mirrored = mirrored
+        self.sign = -1 if mirrored else 1
+
+    def point(self, x: float, y: float):
+        return x * self.sign, y
+
+    def heading(self, heading: float):
+        return (heading * self.sign) % 360
+
+    def pose(self, x: float, y: float, heading: float):
+        return x * self.sign, y, self.heading(heading)
+
+    def turn(self, direction):
+        if self.mirrored and direction == LEFT:
+            return RIGHT
+
+        if self.mirrored and direction == RIGHT:
+            return LEFT
+
+        return direction
+
+    def rings(self, field_map: FieldMap):
+        """
+        Our alliance's rings on this side are the other alliance's on the other side.
+        """
+        if self.mirrored and field_map is red_rings:
+            return blue_rings
+
+        if self.mirrored and field_map is blue_rings:
+            return red_rings
+
+        return field_map
+
+    def trajectory(self, trajectory):
+        """
+        Mirror every sample of a Trajectory, in place, and return it. Curvature is positive
+        turning right, so it flips too. How fast to go doesn't change.
+        """
+        if self.mirrored:
+            samples = trajectory.samples
+
+            for i in range(0, trajectory.count * TRAJECTORY_FIELDS, TRAJECTORY_FIELDS):
+                samples[i] = -samples[i]
+                samples[i + 2] = -samples[i + 2] % 360
+                samples[i + 4] = -samples[i + 4]
+
+        return trajectory
+
+AS_WRITTEN = FieldTransform(False)
+MIRRORED = FieldTransform(True)
+
+AUTO_TIME = 15 # Seconds in the autonomous period
+PICKUP_TIME = 0.5 # Seconds to stop at each object and grab it
+
+def profile_time(distance: float, speed: float, accel: float):
+    """
+    How many seconds a TRAPEZOID MotionProfile takes to go `distance`: speeding up, 
+    cruising, then slowing down, or just speeding up and slowing down if it's too short
+    to reach full speed.
+    """
+    distance = abs(distance)
+
+    if distance >= speed * speed / accel:
+        return distance / speed + speed / accel
+
+    return 2 * math.sqrt(distance / accel)
+
+def drive_time(distance_in: float, velocity_percent: float = MAX_SPEED):
+    """
+    How many seconds drive_for_auto takes to drive `distance_in` inches.
+    """
+    return profile_time(distance_in, MAX_DRIVE_SPEED * velocity_percent / 100, MAX_DRIVE_SPEED * AUTO_ACCELERATION / 100)
+
+def turn_time(degrees: float, velocity_percent: float = MAX_TURN_SPEED):
+    """
+    How many seconds turn_to_heading takes to turn `degrees`.
+    """
+    return profile_time(degrees, MAX_TURN_RATE * velocity_percent / 100, MAX_TURN_RATE * AUTO_ACCELERATION / 100)
+
+class RoutePlanner:
+    """
+    Works out which objects to go get, and in what order, to get as many as we can before 
+    autonomous runs out. Visiting every object in the fastest order is the travelling 
+    salesman problem, and trying every order takes forever (23 rings is 23! orders), so we 
+    settle for a very good order instead of the best one:
+
+    1. Greedy: from where we are, keep going to whichever object is the quickest to get to.
+    2. 2-opt: the greedy route usually crosses over itself somewhere. Take every pair of 
+       stops and check if going through the stops between them backwards is faster. If it
+       is, flip them. Keep going until nothing gets faster.
+    3. Walk the route adding up how long each turn, drive and pickup takes, and cut it off
+       when we'd run out of time.
+
+    Steps 1 and 2 only look at driving time, which is worked out once for every pair of
+    stops and kept in an array. Turning depends on which way we came from, so it's only 
+    counted in step 3.
+
+    This is quick enough to plan again in the middle of auto, like when a pickup fails.
+    """
+    MAX_PASSES = 8 # 2-opt passes. It's almost always done after 2 or 3.
+
+    def __init__(self, velocity_percent: float = 70):
+        self.velocity = velocity_percent
+
+    def plan(self, x: float, y: float, heading: float, maps, time_left: float = AUTO_TIME):
+        """
+        Plan from (x, y) mm, facing `heading`, visiting the objects left in every FieldMap
+        in `maps`. Returns the stops in order as (x, y, field_map, index), where index is
+        the object's index in field_map so it can be removed once we have it.
+        """
+        # Node 0 is where we are, then every object that's still on the field
+        xs = [x]
+        ys = [y]
+        owners = [None]
+        indexes = [0]
+
+        for field_map in maps:
+            for i in range(len(field_map.xs)):
+                if field_map.alive[i]:
+                    xs.append(field_map.xs[i])
+                    ys.append(field_map.ys[i])
+                    owners.append(field_map)
+                    indexes.append(i)
+
+        n = len(xs)
+
+        if n == 1:
+            return []
+
+        # Seconds to drive between every pair, in one flat array. times[a * n + b] is from a to b.
+        times = array("f", [0.0] * (n * n))
+
+        for a in range(n):
+            for b in range(a + 1, n):
+                dx = xs[b] - xs[a]
+                dy = ys[b] - ys[a]
+                t = drive_time(math.sqrt(dx * dx + dy * dy) / MM_PER_INCH, self.velocity)
+                times[a * n + b] = t
+                times[b * n + a] = t
+
+        order = self._greedy(times, n)
+        self._two_opt(order, times, n)
+
+        # Cut the route off once we'd run out of time
+        stops = []
+        elapsed = 0.0
+
+        for node in order[1:]:
+            dx = xs[node] - x
+            dy = ys[node] - y
+            bearing = math.degrees(math.atan2(dx, dy))
+            turn = (bearing - heading + 180) % 360 - 180
+            elapsed += turn_time(turn) + drive_time(math.sqrt(dx * dx + dy * dy) / MM_PER_INCH, self.velocity) + PICKUP_TIME
+
+            if elapsed > time_left:
+                break
+
+            stops.append((xs[node], ys[node], owners[node], indexes[node]))
+            x, y, heading = xs[node], ys[node], bearing
+
+        return stops
+
+    @staticmethod
+    def _greedy(times, n: int):
+        order = [0]
+        visited = bytearray(n)
+        visited[0] = 1
+        current = 0
+
+        for _ in range(n - 1):
+            best = -1
+            best_time = 0.0
+            row = current * n
+
+            for node in range(n):
+                if not visited[node] and (best < 0 or times[row + node] < best_time):
+                    best = node
+                    best_time = times[row + node]
+
+            visited[best] = 1
+            order.append(best)
+            current = best
+
+        return order
+
+    def _two_opt(self, order, times, n: int):
+        # The route doesn't come back to the start, so flipping the stops from i to j only
+        # changes the drive into i (now into j) and out of j (now out of i), if there is one
+        for _ in range(self.MAX_PASSES):
+            improved = False
+
+            for i in range(1, n - 1):
+                before = order[i - 1] * n
+                first = order[i]
+
+                for j in range(i + 1, n):
+                    last = order[j]
+                    change = times[before + last] - times[before + first]
+
+                    if j + 1 < n:
+                        after = order[j + 1]
+                        change += times[first * n + after] - times[last * n + after]
+
+                    if change < -0.001:
+                        # Flip order[i..j] in place
+                        a, b = i, j
+
+                        while a < b:
+                            order[a], order[b] = order[b], order[a]
+                            a += 1
+                            b -= 1
+
+                        first = order[i]
+                        improved = True
+
+            if not improved:
+                break
+
+planner = RoutePlanner()
+
+class Rate:
+    """
+    Keeps a loop that runs inside a function (like the auto motions) at a fixed rate,
+    the same way PeriodicLoop does for loops that run forever. Call sleep() at the end
+    of every pass instead of wait().
+
+    A loop with no wait at all never gives the other threads a turn, so the driver loop and 
+    screen would freeze while it runs. A plain wait() drifts, like remote_control_loop used to.
+    """
+    def __init__(self, period_ms: int):
+        self.period = period_ms
+        self.start = brain.timer.time(MSEC)
+        self.deadline = self.start
+
+    def sleep(self):
+        self.deadline += self.period
+        now = brain.timer.time(MSEC)
+
+        # If we've fallen a whole period behind, don't try to catch up. Just start
+        # counting from now.
+        if now - self.deadline >= self.period:
+            self.deadline = now
+
+        wait(max(0, self.deadline - now), MSEC)
+
+    def elapsed(self):
+        """
+        Milliseconds from the start of the loop to the start of this pass. This doesn't
+        ask the timer, so it's free to call.
+        """
+        return self.deadline - self.start
+
+class StallDetector:
+    """
+    Notices when the robot is being told to move but isn't getting anywhere, like when
+    it's pushing against a wall or another robot. If `progress` (inches, degrees, whatever
+    the motion measures) changes by less than `min_progress` over `window_ms`, we're stalled.
+    """
+    def __init__(self, min_progress: float, window_ms: int):
+        self.min_progress = min_progress
+        self.window = window_ms
+        self.window_start = 0
+        self.window_progress = None
+
+    def stalled(self, progress: float, now_ms: float):
+        if self.window_progress is None or abs(progress - self.window_progress) >= self.min_progress:
+            # We're still moving, start a new window from here
+            self.window_start = now_ms
+            self.window_progress = progress
+            return False
+
+        return now_ms - self.window_start >= self.window
+
+def motion_timeout(amount: float, speed: float):
+    """
+    How many milliseconds to give a motion before giving up on it: twice as long as it
+    should take at `speed` (amount per second), plus a second to get up to speed.
+    """
+    return 2000 * abs(amount) / max(abs(speed), 0.001) + 1000
+
+# Ways of turning the sticks into drive speeds. See DriveShaper.
+DRIVE_ARCADE = 0 # Left stick goes, right stick turns, like we've always driven
+DRIVE_CURVATURE = 1 # Right stick picks how sharp a curve to drive instead of how fast to spin
+
+DRIVER_LOOP_PERIOD = 20 # Milliseconds between each pass of remote_control_loop
+
+def slew(current: float, target: float, max_step: float):
+    """
+    Go from `current` toward `target`, but speed up by no more than `max_step`. Slowing
+    down happens straight away, since that's what the driver wants when they let go of the
+    stick. Going from forward to backward stops first, then speeds up.
+    """
+    if current * target < 0:
+        current = 0
+
+    if abs(target) <= abs(current):
+        return target
+
+    if target > current:
+        return min(target, current + max_step)
+
+    return max(target, current - max_step)
+
+class DriveShaper:
+    """
+    Turns the controller sticks into a speed for each side of the drivetrain. Every pass of
+    remote_control_loop goes through the same steps:
+
+    1. Curves: a small push on the stick should be a small, precise movement, and only the 
+       last bit of the stick should be full speed. Each stick goes through a curve that's a 
+       mix of a straight line and a cubic (x^3), with the deadband cut out of the middle so 
+       the stick not quite going back to 0 doesn't move the robot. Working out a cube every 
+       pass is slow on the brain, and the sticks only ever report whole numbers from -100 to 
+       100, so every answer is worked out once, when the program starts, and kept in an array.
+       Each pass just looks its answer up.
+    2. Throttle ramp: going forwards or backwards speeds up by at most ACCELERATION percent 
+       per second, so the robot doesn't tip or wheelie. Turning isn't ramped, so the moment
+       the turning stick is let go the robot stops turning.
+    3. Mix: ARCADE adds the turn to one side and takes it off the other. CURVATURE makes the
+       turn stick choose how tight a curve to drive, so turning feels the same at any speed
+       instead of getting twitchy when going slow. With the throttle near 0, CURVATURE
+       turns in place ("quick turn") so we can still spin around.
+    4. Desaturate: asking for 100% forward and a turn would want more than 100% on one side.
+       Instead of cutting that side off at 100 (and losing the turn), both sides are scaled 
+       down together so the robot still turns the way the driver asked.
+    5. Side ramp: each side can speed up by at most SIDE_ACCELERATION per second, a lot faster
+       than the throttle ramp. This is only there so a sudden hard turn from a standstill 
+       doesn't yank the motors.
+    """
+    DEADBAND = 5 # Percent of stick to ignore in the middle
+    THROTTLE_EXPO = 0.2 # 0 is a straight line, 1 is a full cubic
+    TURN_EXPO = 0.4
+    SIDE_ACCELERATION = 600 # Percent per second
+    QUICK_TURN = 10 # Percent of throttle below which CURVATURE turns in place
+    CURVATURE_GAIN = 1.0 # How tight CURVATURE turns with the stick all the way over
+
+    def __init__(self, mode = DRIVE_ARCADE):
+        self.mode = mode
+        self.throttle_curve = self.curve(self.THROTTLE_EXPO)
+        self.turn_curve = self.curve(self.TURN_EXPO)
+        self.throttle = 0.0
+        self.left = 0.0
+        self.right = 0.0
+
+    def curve(self, expo: float):
+        """
+        The shaped value for every stick position from -100 to 100. Index 0 is -100.
+        """
+        table = array("f", [0.0] * 201)
+        span = 100 - self.DEADBAND
+
+        for i in range(201):
+            stick = i - 100
+
+            if abs(stick) > self.DEADBAND:
+                x = (abs(stick) - self.DEADBAND) / span # 0 to 1, starting at the edge of the deadband
+                shaped = 100 * ((1 - expo) * x + expo * x * x * x)
+                table[i] = shaped if stick > 0 else -shaped
+
+        return table
+
+    def reset(self):
+        self.throttle = 0.0
+        self.left = 0.0
+        self.right = 0.0
+
+    def update(self, throttle_stick: int, turn_stick: int, delta: float):
+        """
+        One pass. Takes the sticks (-100 to 100) and the seconds since the last pass, and
+        returns (left, right) in percent.
+        """
+        throttle = self.throttle_curve[max(-100, min(100, int(throttle_stick))) + 100]
+        turn = self.turn_curve[max(-100, min(100, int(turn_stick))) + 100]
+
+        throttle = slew(self.throttle, throttle, ACCELERATION * delta)
+        self.throttle = throttle
+
+        if self.mode == DRIVE_CURVATURE and abs(throttle) >= self.QUICK_TURN:
+            turn = abs(throttle) * turn / 100 * self.CURVATURE_GAIN
+
+        left = throttle + turn
+        right = throttle - turn
+        biggest = max(abs(left), abs(right))
+
+        if biggest > 100:
+            left = left * 100 / biggest
+            right = right * 100 / biggest
+
+        step = self.SIDE_ACCELERATION * delta
+        self.left = slew(self.left, left, step)
+        self.right = slew(self.right, right, step)
+        return self.left, self.right
+
+shaper = DriveShaper(DRIVE_ARCADE)
+
+def remote_control_loop(delta: float):
+    """
+    Monitors inputs from the controller in order to control the robot. 
+    This is mostly for the drivetrain, since other controls are handled by on_pressed
+
+    The scheduler runs this every DRIVER_LOOP_PERIOD milliseconds, and `delta` is the
+    time in seconds since the last pass. 
+    """
+    # Everything is global so they are set outside of the current function instead of just being 
+    # redefined here
+    global drive_must_stop, remote_control_code_enabled
+
+    if remote_control_code_enabled:
+        # Everything this pass needs from the controller is read once, right here
+        # Axis3 is the left up-down joystick, allows the bot to go forward and backward
+        # Axis1 is the right left-right joystick, allows the bot to rotate
+        sensors.read_controller()
+        driver_loop.profile.lap(DRIVER_CONTROLLER)
+        drive_left, drive_right = shaper.update(sensors.axis3, sensors.axis1, delta)
+
+        # The deadband is cut out of the curves, so both sides are exactly 0 when the sticks are 
+        # let go. `drive_must_stop` means the motors are not yet stopped, but they should be the 
+        # next time this variable is checked. We do it this way because constantly telling the 
+        # motors to stop when we're within deadband is taxing to the motor and adds unnecessary 
+        # overhead to the code, making it slower and using more resources. While driving, 
+        # drive_motors only sends the motors anything when the voltage actually changes.
+        if drive_left == 0 and drive_right == 0:
+            if drive_must_stop:
+                drive_motors.stop()
+                drive_must_stop = False
+        else:
+            drive_must_stop = True
+            drive_motors.set(drive_left, drive_right)
+
+        driver_loop.profile.lap(DRIVER_DRIVE)
+
+# define variable for remote controller enable/disable
+remote_control_code_enabled = True
+driver_loop = scheduler.add(DRIVER_LOOP_PERIOD, remote_control_loop)
+DRIVER_CONTROLLER = driver_loop.profile.section("controller")
+DRIVER_DRIVE = driver_loop.profile.section("drive")
+driver_loop.start()
+
+class PID:
+    """
+    The PID math, on its own, so every controller works the same way and gets tuned the 
+    same way.
+
+    Each call to update() takes the current error and the time in seconds since the last 
+    update, and returns the power to apply. kI is per second of error and kD is per 
+    error-per-second, so the gains don't change if the loop runs faster or slower.
+
+    The output is clamped to +/- output_limit, the integral is clamped and only allowed to 
+    grow when the output isn't already maxed out (anti-windup), the integral is thrown away 
+    when the error crosses zero or is bigger than integral_zone, and the derivative goes
+    through a low-pass filter with a time constant of d_filter seconds.
+    """
+    def __init__(self, kP: float, kI: float = 0, kD: float = 0, output_limit: float = 100,
+                 integral_limit = None, integral_zone = None, d_filter: float = 0):
+        self.kP = kP
+        self.kI = kI
+        self.kD = kD
+        self.output_limit = output_limit
+        self.integral_limit = integral_limit
+        self.integral_zone = integral_zone
+        self.d_filter = d_filter
+
+        self.integral = 0.0
+        self.derivative = 0.0
+        self.prev_error = 0.0
+        self.output = 0.0
+        self.first = True
+
+    def reset(self):
+        """
+        Forget everything from the last move. Call this before starting a new one.
+        """
+        self.integral = 0.0
+        self.derivative = 0.0
+        self.prev_error = 0.0
+        self.output = 0.0
+        self.first = True
+
+    def update(self, error: float, dt: float):
+        """
+        Work out the power for this loop. `dt` is in seconds.
+        """
+        if dt <= 0:
+            return self.output
+
+        if self.first:
+            self.first = False
+        else:
+            raw = (error - self.prev_error) / dt
+
+            if self.d_filter > 0:
+                self.derivative += (raw - self.derivative) * dt / (self.d_filter + dt)
+            else:
+                self.derivative = raw
+
+            if error * self.prev_error < 0:
+                self.integral = 0.0
+
+        self.prev_error = error
+        integral = self.integral
+
+        if self.integral_zone is not None and abs(error) > self.integral_zone:
+            integral = 0.0
+        else:
+            integral += error * dt
+            limit = self.integral_limit
+
+            if limit is None and self.kI:
+                limit = self.output_limit / abs(self.kI)
+
+            if limit is not None:
+                integral = max(-limit, min(limit, integral))
+
+        output = error * self.kP + integral * self.kI + self.derivative * self.kD
+        clamped = max(-self.output_limit, min(self.output_limit, output))
+
+        if clamped == output or (output > 0) != (error > 0):
+            self.integral = integral
+
+        self.output = clamped
+        return clamped
+
+# Shapes for MotionProfile
+TRAPEZOID = 0 # Constant acceleration, then constant speed, then constant deceleration
+S_CURVE = 1 # Like TRAPEZOID, but the acceleration eases in and out too
+
+class MotionProfile:
+    """
+    A plan for how to drive a distance: where the robot should be, how fast it should be
+    going, and how hard it should be accelerating, every `dt` seconds from start to finish.
+
+    Driving at one speed and slamming on the brakes at the end means the robot has to start
+    slowing down *after* it reaches the target, so it overshoots, and going faster makes it
+    worse. A profile speeds up as hard as `max_accel` allows, cruises at `max_velocity`, and
+    starts slowing down just early enough to stop right on the target. If the distance is 
+    too short to reach full speed, it speeds up halfway and slows down the other half.
+
+    The S_CURVE shape ramps the acceleration with a half cosine wave instead of switching it
+    on and off, which is easier on the drivetrain and less likely to make the wheels slip. 
+    For the same top acceleration, its ramps take pi/2 times longer.
+
+    Everything is worked out when the profile is made and stored in arrays, so following it
+    is just looking up the values by index. Distances are in inches and times in seconds.
+    """
+    def __init__(self, distance: float, max_velocity: float, max_accel: float, shape = TRAPEZOID, dt: float = 0.01):
+        distance = abs(distance)
+        self.distance = distance
+        self.shape = shape
+        self.dt = dt
+
+        stretch = math.pi / 2 if shape == S_CURVE else 1
+        ramp_time = stretch * max_velocity / max_accel
+        ramp_dist = max_velocity * ramp_time / 2
+        peak = max_velocity
+
+        if 2 * ramp_dist > distance:
+            # We'd run out of room before reaching full speed, so speed up for half the
+            # distance and slow down for the other half.
+            peak = math.sqrt(distance * max_accel / stretch)
+            ramp_time = stretch * peak / max_accel
+            ramp_dist = distance / 2
+
+        self.peak = peak # The fastest we actually get to go
+        self.ramp_time = ramp_time
+        self.ramp_dist = ramp_dist
+        self.duration = 2 * ramp_time + (distance - 2 * ramp_dist) / peak if peak > 0 else 0
+
+        count = int(math.ceil(self.duration / dt)) + 1
+        self.position = array("f", [0.0] * count)
+        self.velocity = array("f", [0.0] * count)
+        self.acceleration = array("f", [0.0] * count)
+
+        for i in range(count):
+            t = min(i * dt, self.duration)
+
+            if t >= self.duration:
+                # Done, and staying put
+                p, v, a = distance, 0, 0
+            elif t < ramp_time:
+                # Speeding up
+                p, v, a = self._ramp(t)
+            elif t > self.duration - ramp_time:
+                # Slowing down is speeding up played backwards
+                p, v, a = self._ramp(self.duration - t)
+                p = distance - p
+                a = -a
+            else:
+                # Cruising
+                p, v, a = ramp_dist + peak * (t - ramp_time), peak, 0
+
+            self.position[i] = p
+            self.velocity[i] = v
+            self.acceleration[i] = a
+
+    def _ramp(self, t: float):
+        """
+        Position, velocity and acceleration `t` seconds into the speeding-up part.
+        """
+        peak = self.peak
+        T = self.ramp_time
+
+        if self.shape == S_CURVE:
+            angle = math.pi * t / T
+            return (peak / 2 * (t - T / math.pi * math.sin(angle)),
+                    peak / 2 * (1 - math.cos(angle)),
+                    peak * math.pi / (2 * T) * math.sin(angle))
+
+        accel = peak / T
+        return accel * t * t / 2, accel * t, accel
+
+# Profiles worked out ahead of time by Auto.plan_drive(), by (distance, velocity, shape)
+drive_profiles = {}
+
+class ProfileFollower:
+    """
+    Drives the robot along a MotionProfile.
+
+    Most of the power comes from feed-forward: we already know how fast the profile wants
+    us to go, so kV turns inches per second straight into percent, and the profile's 
+    acceleration goes along with it so DriveMotors can add the extra it takes to speed up
+    (and take a little off while slowing down). A PID on the position error cleans up 
+    whatever is left.
+
+    At full speed the profile can ask for more than the battery can give, and the robot falls
+    behind it. Once we're more than MAX_LAG behind, the profile's clock slows down (and stops
+    at twice that) so the PID isn't left chasing a spot we can't get to. Otherwise the robot
+    is still going flat out when the profile says to stop, and overshoots.
+
+    Once the profile is finished, the PID keeps going for up to SETTLE_TIME milliseconds until
+    the robot is within TOLERANCE inches of the target and has (almost) stopped moving.
+
+    This follower drives straight. TurnFollower turns in place the same way, by changing what
+    progress() measures and what output() does with the power.
+    """
+    kV = 100 / MAX_DRIVE_SPEED # Percent per inch per second
+
+    kP = 12
+    kI = 0
+    kD = 1
+
+    PERIOD = 10 # Milliseconds
+    TOLERANCE = 0.25 # Inches
+    SETTLE_SPEED = 2 # Inches per second
+    SETTLE_TIME = 300 # Milliseconds
+    STALL_AMOUNT = 0.25 # If we move less than this in Auto.STALL_TIME, we're stuck
+    SAMPLE = DRIVE_SAMPLE # What to record as in telemetry
+    MAX_LAG = 2 # Inches
+
+    def __init__(self):
+        self.pid = PID(self.kP, self.kI, self.kD, d_filter = 0.03)
+
+    def follow(self, profile: MotionProfile, direction = FORWARD, stop_type = BRAKE, timeout_ms = None):
+        """
+        Drive along `profile` in `direction` (FORWARD or REVERSE here, RIGHT or LEFT for
+        TurnFollower). Gives up if the robot gets stuck or runs out of time (by default, 
+        twice the length of the profile plus a second). Returns True if the robot ended up
+        within TOLERANCE of the end.
+        """
+        if timeout_ms is None:
+            timeout_ms = profile.duration * 2000 + 1000
+
+        pid = self.pid
+        pid.reset()
+        start = self.progress()
+
+        sign = 1 if direction == FORWARD or direction == RIGHT else -1
+        positions = profile.position
+        velocities = profile.velocity
+        accelerations = profile.acceleration
+        last = len(positions) - 1
+        step = profile.dt * 1000
+
+        rate = Rate(self.PERIOD)
+        stall = StallDetector(self.STALL_AMOUNT, Auto.STALL_TIME)
+        previous = -self.PERIOD
+        last_position = 0.0
+        arrived = False
+        clock = -self.PERIOD # How far into the profile we are, which can run slower than real time
+        error = 0.0
+        finished_at = None
+
+        while True:
+            elapsed = rate.elapsed()
+            clock += self.PERIOD * max(0, min(1, 2 - error / self.MAX_LAG))
+            i = min(int(clock / step), last) # Where we should be in the profile right now
+            position = (self.progress() - start) * sign
+            error = positions[i] - position
+            dt = (elapsed - previous) / 1000
+            speed = (position - last_position) / dt
+            last_position = position
+
+            if i == last:
+                # The profile's done, we're just settling onto the target
+                if -self.TOLERANCE < error < self.TOLERANCE and -self.SETTLE_SPEED < speed < self.SETTLE_SPEED:
+                    arrived = True
+                    break
+
+                if finished_at is None:
+                    finished_at = elapsed
+                elif elapsed - finished_at > self.SETTLE_TIME:
+                    break
+            elif stall.stalled(position, elapsed):
+                break
+
+            if elapsed > timeout_ms:
+                break
+
+            power = self.kV * velocities[i] + pid.update(error, dt)
+            previous = elapsed
+            telemetry.record(self.SAMPLE, positions[i], error, power)
+            self.output(direction, power, self.kV * accelerations[i])
+            rate.sleep()
+
+        drive_motors.stop(stop_type)
+        return arrived
+
+    def progress(self):
+        """
+        How far we've gone, counting up when going forward.
+        """
+        return odometry.distance
+
+    def output(self, direction, power: float, accel: float):
+        drive_motors.drive(direction, power, accel)
+
+class TurnFollower(ProfileFollower):
+    """
+    Turns in place along a MotionProfile measured in degrees, using the odometry heading.
+    """
+    kV = 100 / MAX_TURN_RATE # Percent per degree per second
+
+    kP = 1
+    kI = 0
+    kD = 0.05
+
+    TOLERANCE = 1 # Degrees
+    SETTLE_SPEED = 10 # Degrees per second
+    STALL_AMOUNT = 1 # Degrees
+    SAMPLE = TURN_SAMPLE
+    MAX_LAG = 5 # Degrees
+
+    def progress(self):
+        return odometry.pose[2] # Clockwise, so turning RIGHT counts up
+
+    def output(self, direction, power: float, accel: float):
+        drive_motors.turn(direction, power, accel)
+
+follower = ProfileFollower()
+turn_follower = TurnFollower()
+
+class Path:
+    """
+    A path for PurePursuit to follow, as points every SPACING inches or so.
+
+    Made from a list of (x, y) waypoints in inches, in the same coordinates as odometry. With
+    `smooth`, the waypoints are joined with a Catmull-Rom spline, which goes through every
+    waypoint but curves smoothly past them instead of making a sharp corner. Otherwise 
+    they're joined with straight lines.
+    """
+    SPACING = 2 # Inches
+
+    def __init__(self, waypoints, smooth: bool = True):
+        xs = array("f")
+        ys = array("f")
+        xs.append(waypoints[0][0])
+        ys.append(waypoints[0][1])
+
+        for i in range(len(waypoints) - 1):
+            p1 = waypoints[i]
+            p2 = waypoints[i + 1]
+            # The spline needs the points on either side too. At the ends, repeat the end.
+            p0 = waypoints[i - 1] if i > 0 else p1
+            p3 = waypoints[i + 2] if i + 2 < len(waypoints) else p2
+            steps = max(1, int(math.sqrt((p2[0] - p1[0]) ** 2 + (p2[1] - p1[1]) ** 2) / self.SPACING))
+
+            for step in range(1, steps + 1):
+                t = step / steps
+
+                if smooth:
+                    xs.append(self._catmull_rom(p0[0], p1[0], p2[0], p3[0], t))
+                    ys.append(self._catmull_rom(p0[1], p1[1], p2[1], p3[1], t))
+                else:
+                    xs.append(p1[0] + (p2[0] - p1[0]) * t)
+                    ys.append(p1[1] + (p2[1] - p1[1]) * t)
+
+        # How far along the path each point is
+        lengths = array("f", [0.0] * len(xs))
+
+        for i in range(1, len(xs)):
+            lengths[i] = lengths[i - 1] + math.sqrt((xs[i] - xs[i - 1]) ** 2 + (ys[i] - ys[i - 1]) ** 2)
+
+        self.xs = xs
+        self.ys = ys
+        self.lengths = lengths
+        self.length = lengths[-1]
+
+    @staticmethod
+    def _catmull_rom(p0: float, p1: float, p2: float, p3: float, t: float):
+        return 0.5 * (2 * p1 + (p2 - p0) * t + (2 * p0 - 5 * p1 + 4 * p2 - p3) * t * t
+                      + (3 * p1 - p0 - 3 * p2 + p3) * t * t * t)
+
+class PurePursuit:
+    """
+    Drives along a Path without stopping at the waypoints, steering the whole way.
+
+    Every tick, we find the point on the path LOOKAHEAD inches ahead of us and drive along 
+    the circle that goes through both us and that point, like a person looking ahead down 
+    the road instead of at their feet. The tighter that circle (its curvature), the 
+    more the outside wheels go faster than the inside wheels, so we set each side's 
+    velocity straight from it.
+
+    Speed goes up by at most AUTO_ACCELERATION, slows down for tight curves so the robot
+    doesn't slide (MAX_LATERAL_ACCEL), and slows down in time to stop at the end of the path.
+    DriveMotors turns those speeds into voltages and corrects them against the wheel speeds
+    odometry measures, so there's no PID on the path here.
+    """
+    LOOKAHEAD = 10 # Inches
+    TOLERANCE = 1 # Inches from the end of the path that counts as there
+    MAX_LATERAL_ACCEL = 120 # Inches per second squared, about 0.3g
+    LAG = 0.3 # Seconds for the motors to catch up to a new velocity
+    PERIOD = 10 # Milliseconds
+
+    def follow(self, path: Path, velocity_percent: int, reverse: bool = False, stop_type = BRAKE, timeout_ms = None):
+        """
+        Follow `path`, going no faster than `velocity_percent`. With `reverse` the robot 
+        backs along it. Returns True if we got to the end.
+        """
+        if timeout_ms is None:
+            timeout_ms = motion_timeout(path.length, MAX_DRIVE_SPEED * velocity_percent / 100)
+
+        xs, ys, lengths = path.xs, path.ys, path.lengths
+        last = len(xs) - 1
+        cruise = MAX_DRIVE_SPEED * velocity_percent / 100
+        accel = MAX_DRIVE_SPEED * AUTO_ACCELERATION / 100
+        lookahead_sq = self.LOOKAHEAD * self.LOOKAHEAD
+
+        # Which way the path is going at the very end
+        end_x = xs[last] - xs[last - 1] if last > 0 else 0
+        end_y = ys[last] - ys[last - 1] if last > 0 else 0
+        end_length = max(math.sqrt(end_x * end_x + end_y * end_y), 0.001)
+        end_x /= end_length
+        end_y /= end_length
+        rate = Rate(self.PERIOD)
+        stall = StallDetector(Auto.STALL_DISTANCE, Auto.STALL_TIME)
+        start = odometry.distance
+        closest = 0
+        speed = 0.0
+        arrived = False
+
+        while True:
+            x, y, heading = odometry.pose
+
+            if reverse:
+                heading += 180 # Steer as if the back of the robot were the front
+
+            # The closest point only moves forward, so we can't skip back to the start of
+            # a path that crosses itself
+            while closest < last:
+                here = (xs[closest] - x) ** 2 + (ys[closest] - y) ** 2
+                ahead = (xs[closest + 1] - x) ** 2 + (ys[closest + 1] - y) ** 2
+
+                if ahead > here:
+                    break
+
+                closest += 1
+
+            dx = xs[last] - x
+            dy = ys[last] - y
+
+            # Close enough, or gone past the end
+            if dx * dx + dy * dy < self.TOLERANCE * self.TOLERANCE or closest == last and dx * end_x + dy * end_y < 0:
+                arrived = True
+                break
+
+            elapsed = rate.elapsed()
+
+            if elapsed > timeout_ms or stall.stalled(odometry.distance - start, elapsed):
+                break
+
+            # The first point at least LOOKAHEAD away, or the end of the path
+            target = closest
+
+            while target < last and (xs[target] - x) ** 2 + (ys[target] - y) ** 2 < lookahead_sq:
+                target += 1
+
+            dx = xs[target] - x
+            dy = ys[target] - y
+
+            if target == last:
+                # Close to the end, aiming right at it would make us spin in circles if we're a
+                # little off to the side. Aim past it, as if the path carried on straight.
+                extra = self.LOOKAHEAD - math.sqrt(dx * dx + dy * dy)
+
+                if extra > 0:
+                    dx += end_x * extra
+                    dy += end_y * extra
+
+            h = math.radians(heading)
+            sideways = dx * math.cos(h) - dy * math.sin(h) # How far right of us the target is
+            curvature = 2 * sideways / max(dx * dx + dy * dy, 1) # 1 / the radius of the circle, positive to the right
+
+            # How far we still have to go, from the closest point on the path
+            remaining = lengths[last] - lengths[closest] + math.sqrt((xs[closest] - x) ** 2 + (ys[closest] - y) ** 2)
+            # The motors take a moment to slow down, so start slowing down a bit early (LAG)
+            target_speed = min(cruise, math.sqrt(2 * accel * max(0, remaining - speed * self.LAG)))
+
+            if curvature != 0:
+                target_speed = min(target_speed, math.sqrt(self.MAX_LATERAL_ACCEL / abs(curvature)))
+
+            speed = min(target_speed, speed + accel * self.PERIOD / 1000)
+            left = speed * (1 + curvature * WHEEL_BASE / 2)
+            right = speed * (1 - curvature * WHEEL_BASE / 2)
+
+            if reverse:
+                # Going backwards, the back's left side is our right side
+                left, right = -right, -left
+
+            telemetry.record(PURSUIT_SAMPLE, target_speed, sideways, curvature)
+            drive_motors.set(left / MAX_DRIVE_SPEED * 100, right / MAX_DRIVE_SPEED * 100)
+            rate.sleep()
+
+        if stop_type is not None:
+            drive_motors.stop(stop_type)
+
+        return arrived
+
+pursuit = PurePursuit()
+
+# Trajectory files, made ahead of time by sim/make_trajectory.py and put on the SD card.
+#
+# A 16 byte header:
+#     4 bytes   b"TRJ1"
+#     4 bytes   number of samples (little-endian)
+#     4 bytes   seconds between samples (float)
+#     4 bytes   flags, nothing yet
+# then one fixed-size record per sample, all little-endian floats, TRAJECTORY_FIELDS of them:
+#     x, y (inches), heading (degrees, clockwise, 0 is +y), velocity (inches per second,
+#     negative when backing up), curvature (1 / inches, positive turns right)
+TRAJECTORY_MAGIC = b"TRJ1"
+TRAJECTORY_HEADER = 16
+TRAJECTORY_FIELDS = 5
+
+class Trajectory:
+    """
+    A trajectory loaded from the SD card: where the robot should be, which way it should 
+    face, how fast it should go and how sharply it should turn, every `dt` seconds.
+
+    Every sample goes into one flat array of floats, copied straight out of the file in one 
+    go, so nothing is worked out or made one sample at a time no matter how long it is. 
+    Sample i starts at samples[i * TRAJECTORY_FIELDS].
+    """
+    def __init__(self, data):
+        if data[0:4] != TRAJECTORY_MAGIC:
+            raise ValueError("not a trajectory file")
+
+        self.count = int.from_bytes(data[4:8], "little")
+        self.dt = self._floats(data[8:12])[0]
+
+        end = TRAJECTORY_HEADER + self.count * TRAJECTORY_FIELDS * 4
+
+        if len(data) < end:
+            raise ValueError("trajectory file is cut short")
+
+        self.samples = self._floats(data[TRAJECTORY_HEADER:end])
+        self.duration = (self.count - 1) * self.dt
+
+    @staticmethod
+    def _floats(raw):
+        # On the brain, array() copies raw bytes straight in. Regular Python (like the 
+        # simulator in sim/) wants frombytes() for that instead.
+        try:
+            return array("f", raw)
+        except TypeError:
+            floats = array("f")
+            floats.frombytes(bytes(raw))
+            return floats
+
+    @staticmethod
+    def load(filename: str):
+        """
+        Load a trajectory from the SD card. Returns None if there's no such file.
+        """
+        if not brain.sdcard.is_inserted() or not brain.sdcard.exists(filename):
+            return None
+
+        return Trajectory(brain.sdcard.loadfile(filename))
+
+class TrajectoryFollower:
+    """
+    Drives a Trajectory with a RAMSETE controller.
+
+    PurePursuit only knows where the path goes, so it works out speeds as it goes. A 
+    trajectory already says exactly how fast to go and how hard to turn at every moment, so
+    every tick we look up the sample for the current time and turn it into wheel speeds, 
+    with the same feed-forward as ProfileFollower. On its own, any error would 
+    just build up, so RAMSETE adds corrections from the difference between the pose we 
+    should have and the one odometry says we have: speed up or slow down if we're behind or
+    ahead, and turn more or less if we're off to the side or facing the wrong way. b is like
+    kP (higher corrects harder) and zeta is like kD (higher damps the correction more).
+
+    RAMSETE's gain shrinks to nothing as the trajectory slows to a stop, so it never 
+    finishes pulling in the last bit of error. MIN_GAIN keeps some correction going, and
+    after the last sample we keep holding it for up to SETTLE_TIME milliseconds until we're
+    within TOLERANCE inches of the end.
+
+    If the trajectory asks for more than the motors can give (full speed, hard acceleration),
+    the robot falls behind the sample it should be at. Chasing a sample that's already around
+    the next bend makes RAMSETE cut the corner, so once we're more than MAX_LAG inches behind
+    the trajectory's clock slows down, and stops at twice that, to let us catch up. If the
+    clock ends up more than MAX_DELAY milliseconds behind, something is holding us back, so
+    we give up.
+    """
+    kV = ProfileFollower.kV
+    b = 0.03 # Per square inch, found in the simulator (the usual 2 per square meter is 0.0013)
+    zeta = 0.7
+    MIN_GAIN = 3 # Per second
+    MAX_LAG = 0.5 # Inches
+    MAX_DELAY = 1000 # Milliseconds
+
+    PERIOD = 10 # Milliseconds
+    TOLERANCE = 0.5 # Inches
+    SETTLE_TIME = 500 # Milliseconds
+
+    def follow(self, trajectory: Trajectory, stop_type = BRAKE):
+        """
+        Drive along `trajectory`, starting from wherever the robot is now. Returns True if
+        the robot ended up within TOLERANCE of the end.
+        """
+        samples = trajectory.samples
+        last = (trajectory.count - 1) * TRAJECTORY_FIELDS
+        step = trajectory.dt * 1000
+        half_width = WHEEL_BASE / 2
+        rate = Rate(self.PERIOD)
+        arrived = False
+        clock = 0 # Milliseconds into the trajectory, which can run slower than real time
+        ahead = 0
+        finished_at = None
+
+        while True:
+            # How far behind we were last time says how fast the clock can go
+            clock += self.PERIOD * max(0, min(1, 2 - ahead / self.MAX_LAG))
+            i = min(int(clock / step), last // TRAJECTORY_FIELDS) * TRAJECTORY_FIELDS
+            x, y, heading = odometry.pose
+            velocity = samples[i + 3]
+            turn_rate = velocity * samples[i + 4] # Radians per second, clockwise
+
+            # The errors, turned so `ahead` is straight ahead of the robot and `right` is to
+            # its right
+            h = math.radians(heading)
+            dx = samples[i] - x
+            dy = samples[i + 1] - y
+            ahead = dx * math.sin(h) + dy * math.cos(h)
+            right = dx * math.cos(h) - dy * math.sin(h)
+            angle = math.radians((samples[i + 2] - heading + 180) % 360 - 180)
+            sinc = math.sin(angle) / angle if angle != 0 else 1
+
+            if i == last:
+                if ahead * ahead + right * right < self.TOLERANCE * self.TOLERANCE:
+                    arrived = True
+                    break
+
+                if finished_at is None:
+                    finished_at = rate.elapsed()
+                elif rate.elapsed() - finished_at > self.SETTLE_TIME:
+                    break
+            elif rate.elapsed() - clock > self.MAX_DELAY:
+                break
+
+            k = max(2 * self.zeta * math.sqrt(turn_rate * turn_rate + self.b * velocity * velocity), self.MIN_GAIN)
+            speed = velocity * math.cos(angle) + k * ahead
+            turn = turn_rate + k * angle + self.b * velocity * sinc * right
+
+            # How fast each wheel should be speeding up, from the next sample
+            if i < last:
+                j = i + TRAJECTORY_FIELDS
+                accel = (samples[j + 3] - velocity) / trajectory.dt
+                turn_accel = (samples[j + 3] * samples[j + 4] - turn_rate) / trajectory.dt * half_width
+            else:
+                accel = turn_accel = 0
+
+            telemetry.record(TRAJECTORY_SAMPLE, velocity, ahead, right)
+            left_power = self.kV * (speed + turn * half_width)
+            right_power = self.kV * (speed - turn * half_width)
+
+            # If a wheel would need more than full power, slow both down together so we at
+            # least keep turning as sharply as we should
+            fastest = max(abs(left_power), abs(right_power))
+
+            if fastest > 100:
+                left_power = left_power * 100 / fastest
+                right_power = right_power * 100 / fastest
+
+            drive_motors.set(left_power, right_power, self.kV * (accel + turn_accel), self.kV * (accel - turn_accel))
+            rate.sleep()
+
+        drive_motors.stop(stop_type)
+        return arrived
+
+trajectory_follower = TrajectoryFollower()
+
+class Command:
+    """
+    One thing for the robot to do in auto, that takes as long as it takes: drive somewhere,
+    run the intake, wait for the clamp. Commands don't block. The command scheduler calls 
+    update() every pass until it returns True, so lots of commands can run at the same time
+    in one thread and we always know which ones are still going.
+
+    `requires` names the parts of the robot the command uses ("drive", "intake", "clamp").
+    Two commands can't use the same part at once: starting a second one cancels the first.
+    If the command takes longer than `timeout_ms`, it's cancelled.
+
+    To make a new kind of command, override start(), update() and end().
+    """
+    def __init__(self, requires = (), timeout_ms = None):
+        self.requires = tuple(requires)
+        self.timeout = timeout_ms
+        self.started_at = 0
+        self.timed_out = False
+        self.cancelled = False
+
+    def start(self):
+        """
+        Called once, right before the first update().
+        """
+
+    def update(self):
+        """
+        Called every pass. Return True when the command is finished.
+        """
+        return True
+
+    def end(self, interrupted: bool):
+        """
+        Called once when the command finishes, or with interrupted=True when it's cancelled
+        or runs out of time. Stop any motors it started here.
+        """
+
+    def prepare(self):
+        """
+        Called once ahead of time, before auto, to get anything slow out of the way (like 
+        working out a motion profile). Commands that don't have anything to prepare do all
+        their work when they start.
+        """
+
+    # Groups and the scheduler use these three instead of calling the methods above
+    # directly, so the timeout is checked in one place.
+    def begin(self):
+        self.started_at = brain.timer.time(MSEC)
+        self.timed_out = False
+        self.cancelled = False
+        self.start()
+
+    def tick(self):
+        """
+        Update the command once. Returns True if it finished or ran out of time.
+        """
+        if self.update():
+            self.end(False)
+            return True
+
+        if self.timeout is not None and brain.timer.time(MSEC) - self.started_at >= self.timeout:
+            self.timed_out = True
+            self.end(True)
+            return True
+
+        return False
+
+    def cancel(self):
+        self.cancelled = True
+        self.end(True)
+
+class Run(Command):
+    """
+    Call a function once and finish straight away, like setting the clamp.
+    """
+    def __init__(self, callback, *args, requires = ()):
+        super().__init__(requires)
+        self.callback = callback
+        self.args = args
+
+    def update(self):
+        self.callback(*self.args)
+        return True
+
+class Wait(Command):
+    """
+    Do nothing for a while. Try to wait for something with WaitUntil instead of guessing how
+    long it takes.
+    """
+    def __init__(self, duration_ms: int):
+        super().__init__()
+        self.duration = duration_ms
+
+    def update(self):
+        return brain.timer.time(MSEC) - self.started_at >= self.duration
+
+class WaitUntil(Command):
+    """
+    Finish as soon as condition() returns True, like `lambda: goal_detector.fired`.
+    """
+    def __init__(self, condition, timeout_ms = None):
+        super().__init__((), timeout_ms)
+        self.condition = condition
+
+    def update(self):
+        return self.condition()
+
+class Hold(Command):
+    """
+    Keep a Mechanism in `state` until the command is cancelled or times out, then put it 
+    back to `idle`, like running the intake with INTAKE_FORWARD. Unlike spin_for() in a 
+    thread of its own, we can stop it early and know when it's done, and the mechanism 
+    always knows what its devices are doing.
+    """
+    def __init__(self, mechanism: Mechanism, state, idle, timeout_ms = None, requires = ("intake",)):
+        super().__init__(requires, timeout_ms)
+        self.mechanism = mechanism
+        self.state = state
+        self.idle = idle
+
+    def start(self):
+        self.mechanism.set(self.state)
+
+    def update(self):
+        return False
+
+    def end(self, interrupted: bool):
+        self.mechanism.set(self.idle)
+
+class Motion(Command):
+    """
+    Run one of the blocking auto motions (like Auto.drive_for_auto) as a command. The motion
+    gets a thread of its own, since it has its own Rate loop inside, and the command finishes 
+    when the motion returns. Cancelling it stops the thread and brakes the drivetrain.
+    """
+    def __init__(self, motion, *args, requires = ("drive",), timeout_ms = None, plan = None):
+        super().__init__(requires, timeout_ms)
+        self.motion = motion
+        self.args = args
+        self.plan = plan # Called by prepare() with the same arguments as the motion
+        self.thread = None
+        self.done = False
+        self.result = None
+
+    def prepare(self):
+        if self.plan is not None:
+            self.plan(*self.args)
+
+    def start(self):
+        self.done = False
+        self.thread = Thread(self._run)
+
+    def _run(self):
+        self.result = self.motion(*self.args)
+        self.done = True
+
+    def update(self):
+        return self.done
+
+    def end(self, interrupted: bool):
+        if interrupted and not self.done:
+            self.thread.stop()
+            drive_motors.stop(BRAKE)
+
+class CommandGroup(Command):
+    """
+    The parts shared by Sequence, Parallel and Race. A group uses every part of the robot its
+    commands use, and finishes when finished() says so.
+    """
+    def __init__(self, *commands, timeout_ms = None):
+        requires = []
+
+        for command in commands:
+            for part in command.requires:
+                if part not in requires:
+                    requires.append(part)
+
+        super().__init__(requires, timeout_ms)
+        self.commands = commands
+        self.running = [False] * len(commands)
+
+    def prepare(self):
+        for command in self.commands:
+            command.prepare()
+
+    def start(self):
+        for i in range(len(self.commands)):
+            self.commands[i].begin()
+            self.running[i] = True
+
+    def update(self):
+        for i in range(len(self.commands)):
+            if self.running[i] and self.commands[i].tick():
+                self.running[i] = False
+
+        return self.finished()
+
+    def finished(self):
+        return True not in self.running
+
+    def end(self, interrupted: bool):
+        # Whatever is still going when the group ends gets cancelled, like the losers of a race
+        for i in range(len(self.commands)):
+            if self.running[i]:
+                self.running[i] = False
+                self.commands[i].cancel()
+
+    @staticmethod
+    def check_parts(commands):
+        """
+        Commands that run at the same time can't use the same part of the robot.
+        """
+        used = []
+
+        for command in commands:
+            for part in command.requires:
+                if part in used:
+                    raise ValueError("Two commands in the same group both use the " + part)
+
+                used.append(part)
+
+class Sequence(CommandGroup):
+    """
+    Run commands one after another.
+    """
+    def start(self):
+        self.index = 0
+
+        if self.commands:
+            self.commands[0].begin()
+
+    def update(self):
+        if not self.commands:
+            return True
+
+        # Keep going in the same pass while commands finish straight away, so a Run() in the
+        # middle of a sequence doesn't cost a whole loop period
+        while self.commands[self.index].tick():
+            self.index += 1
+
+            if self.index == len(self.commands):
+                return True
+
+            self.commands[self.index].begin()
+
+        return False
+
+    def end(self, interrupted: bool):
+        if interrupted and self.index < len(self.commands):
+            self.commands[self.index].cancel()
+
+class Parallel(CommandGroup):
     """
-    clamp.set(not clamp.value())
+    Run commands at the same time, and finish when they've all finished.
+    """
+    def __init__(self, *commands, timeout_ms = None):
+        CommandGroup.check_parts(commands)
+        super().__init__(*commands, timeout_ms = timeout_ms)
 
-def toggle_intake():
+class Race(CommandGroup):
     """
-    An event to be called when the Right button is pressed to 
-    toggle the lift. The lift will be automatically disabled
-    when a manual control is pressed. See remote_control_loop()
+    Run commands at the same time, and finish as soon as any one of them finishes. The rest
+    are cancelled. Racing a motion against a WaitUntil is how we stop driving as soon as 
+    something happens, and racing a Hold against a motion runs the intake for as long as 
+    the motion takes.
     """
-    global intake_toggled
-    intake_toggled = not intake_toggled
+    def __init__(self, *commands, timeout_ms = None):
+        CommandGroup.check_parts(commands)
+        super().__init__(*commands, timeout_ms = timeout_ms)
 
+    def finished(self):
+        return False in self.running
 
-def toggle_hang():
+class CommandScheduler:
     """
-    Extend the arms that allow the robot to hang in the air.
-    I decided to use pneum_lift_1's value for both so in case
-    they have a different value for any reason, they sync back up
-    once hanging is toggled.
+    Runs every scheduled command, one tick each per loop. Everything happens in the one 
+    "commands" loop thread, so the commands never step on each other, and we know which 
+    command owns each part of the robot.
     """
-    pneum_lift_1.set(not pneum_lift_1.value())
-    pneum_lift_2.set(not pneum_lift_1.value())
+    def __init__(self):
+        self.running = []
+        self.owners = {} # Which command is using each part of the robot
 
+    def schedule(self, command: Command):
+        # Whatever was using the parts this command needs has to let go of them
+        for part in command.requires:
+            owner = self.owners.get(part)
 
-# Register the events to be pressed
-controller.buttonDown.pressed(toggle_clamp) 
-controller.buttonRight.pressed(toggle_intake)
-controller.buttonR2.pressed(toggle_hang)
+            if owner is not None:
+                self.cancel(owner)
 
-# Configure the lift
-intake.set_velocity(100, PERCENT)
-intake.set_stopping(COAST) # I'm not sure if this actually changes anything
+        for part in command.requires:
+            self.owners[part] = command
 
-# Constants are a type of variable that don't change, or are always constant
-# It's easier to know what's going on when there are words rather than the same
-# numbre all over the place.
-WHEEL_BASE = 13.5 # Inches
-WHEEL_DIAMETER = 4 # Inches
+        self.running.append(command)
+        command.begin()
 
-MAX_TURN_SPEED = 55 # Percent
-MAX_SPEED = 100 # Percent
-ACCELERATION = 85 # Percent per second 
-GEAR_RATIO = 2 / 3 # Gear Ratio of the drivetrain
-WHEEL_CIRC = WHEEL_DIAMETER * math.pi # Circumference of the omni wheels
+    def cancel(self, command: Command):
+        if command in self.running:
+            self._release(command)
+            command.cancel()
 
-def remote_control_loop():
+    def cancel_all(self):
+        for command in list(self.running):
+            self.cancel(command)
+
+    def update(self, delta: float = 0):
+        for command in list(self.running):
+            # A command can cancel another one when it starts, so make sure it's still here
+            if command in self.running and command.tick():
+                self._release(command)
+
+    def run(self, command: Command):
+        """
+        Schedule a command and wait for it to finish. This is how the autos run their 
+        routines. Returns False if it ran out of time or was cancelled.
+        """
+        self.schedule(command)
+        rate = Rate(COMMAND_PERIOD)
+
+        while command in self.running:
+            rate.sleep()
+
+        return not command.timed_out and not command.cancelled
+
+    def _release(self, command: Command):
+        self.running.remove(command)
+
+        for part in command.requires:
+            if self.owners.get(part) is command:
+                del self.owners[part]
+
+# The commands are checked every time the motors update, same as the auto motions
+COMMAND_PERIOD = 10
+
+commands = CommandScheduler()
+command_loop = scheduler.every(COMMAND_PERIOD, commands.update, "commands")
+
+# The autonomous routines, written as a list of steps instead of Python. They're turned 
+# into commands once, when the program starts (see RoutineCompiler), so a mistake shows 
+# up on the console before the match instead of halfway through auto, and running one 
+# doesn't cost any time working out what the text means.
+#
+# Each routine goes between `ROUTINE <name>` and `END`, one step per line, and shows up in
+# the selector with that name. Indenting is just for us to read, and anything after a # is
+# a comment. The steps are:
+#
+#     MOVE FORWARD 36 IN 50%      Drive straight (REVERSE to back up). The speed is optional.
+#     REVERSE 36 IN 50%           Same as MOVE REVERSE
+#     TURN LEFT 90 DEGREES 55%    Turn in place (or RIGHT). The speed is optional.
+#     TURN TO 180 55%             Turn the short way around to face a heading
+#     INTAKE FORWARD 1500 MS      Run the intake (FORWARD is optional, REVERSE spits out).
+#                                 Without a time it runs until its RACE ends. It always
+#                                 runs at full speed, so it doesn't take a speed.
+#     WAIT 250 MS                 Do nothing for a while
+#     SET_CLAMP / RELEASE_CLAMP   Put the clamp down or lift it
+#     GRAB_GOAL                   Back up until the optical sensor finds a goal and clamp it
+#     TRAJECTORY auto.traj        Drive a trajectory from the SD card (made with 
+#                                 sim/make_trajectory.py) from wherever it starts
+#
+# These ones use field positions, in millimeters from the middle of the field like the 
+# field tables, with headings 0 for +y going clockwise:
+#
+#     START -1500 600 MM 90       Tell odometry where we're starting and which way we face
+#     DRIVE TO -1200 600 MM 50%   Turn to a spot and drive to it (add REVERSE to back up)
+#     ROUTE RED_RINGS MOBILE_GOALS 70%
+#                                 Collect everything in these tables we have time for
+#
+# Steps can be grouped, with an END of their own:
+#
+#     PARALLEL ... END            Do all of these at the same time, until they're all done
+#     RACE ... END                Do all of these at the same time, until any one is done
+#     SEQUENCE ... END            Do these one after another (useful inside the other two)
+#
+# `MIRROR <name> AS <other name>` copies a routine for the other alliance, on the other side
+# of the field. Every turn, heading, position and trajectory in it is mirrored (see 
+# FieldTransform), and RED_RINGS and BLUE_RINGS swap places.
+#
+# More routines can go in ROUTINES_FILE on the SD card. One there with the same name as 
+# one of these replaces it.
+ROUTINES = """
+# Only goes backward until it grabs a goal. Useful to get off of the starting line.
+# - Any side of field
+# - Must have a direct, straight path to a goal
+# - Must be facing backwards (intake towards wall)
+ROUTINE Min
+    GRAB_GOAL
+    MOVE FORWARD 12 IN 30%
+END
+
+# Go backward and score our preload. Same as Min, and needs a preload to be useful.
+ROUTINE Min + Score
+    GRAB_GOAL
+    PARALLEL
+        MOVE FORWARD 12 IN 30%
+        INTAKE 3000 MS # Start scoring as soon as the goal's clamped
+    END
+END
+
+# With a preload, grab another ring (be in possession of two), get a mobile goal, and
+# (attempt) to score both rings on the mobile goal.
+# - Left side of either team
+# - Must be facing a double stack of rings (would theoretically work with a single ring)
+# - Must be facing forward (clamp toward wall)
+ROUTINE Red Minus
+    PARALLEL
+        MOVE FORWARD 36 IN 50% # Go towards the rings
+        INTAKE 1500 MS # Spin the intake while we move toward the field ring
+    END
+    TURN LEFT 94 DEGREES 3% # Turn 90 degrees to have the rear face a goal
+    GRAB_GOAL
+    PARALLEL
+        MOVE FORWARD 12 IN 30%
+        INTAKE 5000 MS # Score the rings while we're moving
+    END
+    # We can also go a little further to make sure we're touching the middle ladder
+    # This would consist of probably facing backwards so our mobile goal doesn't get
+    # In the way, then running forward into a latter post. 
+END
+
+# Red Minus for the other side. The turns were tuned back when a left turn stopped about
+# 8 degrees later than a right one, so they aren't mirror images of each other (yet). Once
+# they've been measured again on the field, this can go back to MIRROR Red Minus AS Blue Minus.
+ROUTINE Blue Minus
+    PARALLEL
+        MOVE FORWARD 36 IN 50%
+        INTAKE 1500 MS
+    END
+    TURN RIGHT 86 DEGREES 3%
+    GRAB_GOAL
+    PARALLEL
+        MOVE FORWARD 12 IN 30%
+        INTAKE 5000 MS
+    END
+END
+
+# Drive the trajectory in auto.traj with the intake running. Only shows up if the file is
+# on the SD card.
+# - Must be placed where the trajectory starts, facing the way it starts
+ROUTINE Trajectory
+    RACE
+        TRAJECTORY auto.traj
+        INTAKE
+    END
+END
+
+ROUTINE Blank
+END
+"""
+
+ROUTINES_FILE = "routines.txt"
+
+DEFAULT_DRIVE_SPEED = 50 # Percent, for a MOVE without a speed
+
+class RoutineCompiler:
     """
-    Monitors inputs from the controller in order to control the robot. 
-    This is mostly for the drivetrain, since other controls are handled by on_pressed
+    Turns routine text (see ROUTINES) into commands. 
+
+    Every step's words get checked here, when the program starts, and turned straight into
+    the Command that does it. A routine with a mistake in it is left out, and the mistake 
+    is printed with its line number, so the rest of the routines still load. A routine 
+    that needs a file that isn't on the SD card is left out too, but without a word, since
+    that's how it's meant to work.
     """
-    # Everything is global so they are set outside of the current function instead of just being 
-    # redefined here
-    global drive_l_must_stop, drive_r_must_stop, intake_stopped, intake_toggled, remote_control_code_enabled
-    global last_time, delta, velocity_left, velocity_right
-
-    # Define variables to be used only in this method
-    last_time = brain.timer.time(SECONDS) # The last time of the loop to calculate delta
-    delta = 0 # Time since the last loop
-    # Velocities, in percent, for each side of the drivetrain
-    velocity_left = 0
-    velocity_right = 0
-
-    # Usually, a `while True` loop would block anything else from happening. Fortunately, this
-    # method is supposed to run in a thread, which means it runs in `parallel` aside the main process
-    while True:
-        delta = brain.timer.time(SECONDS) - last_time # Delta is current_time - last_time
-        last_time = brain.timer.time(SECONDS) # Set last time again
-
-        if remote_control_code_enabled:
-            # Calculate the drivetrain motor velocities from the controller joystick axes
-            # left = axis3 + axis1
-            # right = axis3 - axis1
-            # Axis3 is the left up-down joystick, allows the bot to go forward and backward
-            # Axis1 is the right left-right joystick, allows the bot to rotate
-            drivetrain_left_axis_value = controller.axis3.position() + controller.axis1.position()
-            drivetrain_right_axis_value = controller.axis3.position() - controller.axis1.position()
-
-            # The calculated velocity is the acceleration (%/s) times delta
-            # This means, since %/s is percent per second, a delta of one second
-            # would accelerate the drivetrain %. This makes sure acceleration is
-            # constant, so if delta is less than a second it still accelerates 
-            # at the same rate. 
-            velocity_left += ACCELERATION * delta
-            velocity_right += ACCELERATION * delta
-
-            # This uses a lot of inline methods and conditions. Let's break it down.
-            # min() is a method that takes the smaller of x values. min(1, 2) = 1
-            # abs() is the absolute value of a number. abs(-1) = 1
-            # `x if z else y` is an inline condition, which is equivalent to a function containing the following:
-            # if z:
-            #     return x
-            # else:
-            #     return y
-            # We use abs() on the controller axis value because we don't care about the direction of the force,
-            # just the set velocity. We then take what's smaller, the velocity the robot wants to go, or the velocity
-            # calculated by the script (using our acceleration). We take what's smaller since, if the driver has the stick lower,
-            # it means they don't want the robot to go as fast. If the acceleration is lower, it means the robot is still accelerating
-            # and has not reached max speed, so we should not let the driver tell it to go faster. 
-            # We then multiply this minimum value by -1 if the original axis value was negative, to get the force in the proper direction
-            # again. 
-            #
-            # TL:DR; Make sure the robot does not go faster than the calculated velocity and desired velocity
-            drive_right = min(abs(drivetrain_right_axis_value), velocity_right) * (-1 if drivetrain_right_axis_value < 0 else 1)
-            drive_left = min(abs(drivetrain_left_axis_value), velocity_left) * (-1 if drivetrain_left_axis_value < 0 else 1)
-
-            # Check if left stick is in deadband range.
-            # Being in deadband range happens when the stick is let go of. We ignore values
-            # between 5 and -5 because, when the stick is let go of, it's not always going to return 0.
-            if drive_left < 5 and drive_left > -5:
-                # Check to see if the left motor is stopped already. The variable name 
-                # `drive_l_must_stop` means the motor is not yet stopped, but it should be the next time
-                # this variable is checked. We do it this way because constantly telling the motor to stop
-                # when we're within deadband is taxing to the motor and adds unnecessary overhead to the code,
-                # making it slower and using more resources. 
-                if drive_l_must_stop:
-                    velocity_left = 0
-                    # stop the left drive motor
-                    mgL.stop()
-                    # tell the code that the left motor has been stopped
-                    drive_l_must_stop = False
-            else:
-                # Since the robot is moving, we reset the variable so it can be changed next time the
-                # stick is let go of. Even though this variable is True, it is never used to stop the 
-                # motor until the stick is in the deadband range again. 
-                drive_l_must_stop = True
-                
-            # check if the value is inside of the deadband range
-            if drive_right < 5 and drive_right > -5:
-                # check if the right motor has already been stopped
-                if drive_r_must_stop:
-                    velocity_right = 0
-                    # stop the right drive motor
-                    mgR.stop()
-                    # tell the code that the right motor has been stopped
-                    drive_r_must_stop = False
-            else:
-                # reset the toggle so that the deadband code knows to stop the right motor next
-                # time the input is in the deadband range
-                drive_r_must_stop = True
-
-            # TODO: Make sure this works as intended and isn't just nonsense.
-            # We had an issue with turning the robot that made handling more difficult. When the robot is trying to move with both axes
-            # (going forward/backward and turning), once the right stick was released (so the robot stops turning), the bot would still 
-            # continue turning for a while before stopping. I believe the cause of this issue relates to the acceleration, when
-            # one side is at full throttle when the right stick is released, so one side is at 100% velocity while the other side is still
-            # accelerating back up to 100%, leaving a second or so where one side still has more power than the other, causing the bot to 
-            # continue turning for a short time. We can solve this issue by setting the velocity of both sides equal to each other 
-            # Unless the robot is turning.
-            if (drive_left > 0 and drive_right > 0) or (drive_left < 0 and drive_right < 0) and not (drive_left == drive_right):
-                if drive_left < drive_right:
-                    drive_left = drive_right
+    # The words that don't mean anything on their own, just there to make steps read nicely
+    UNITS = ("IN", "INCHES", "DEG", "DEGREES", "MS", "MM")
+
+    def __init__(self):
+        self.routines = [] # (name, command)
+        self.steps = {} # A routine's name to its lines and which side it's for, for MIRROR
+        self.side = AS_WRITTEN # Every position, heading and turn goes through this
+        self.missing = False # Set while compiling a routine that needs a file we don't have
+
+    def compile(self, text: str, source: str = "ROUTINES"):
+        """
+        Compile every routine in `text`, adding them to self.routines.
+        """
+        name = None
+        lines = []
+        depth = 0
+        start = 0
+        number = 0
+
+        for line in text.split("\n"):
+            number += 1
+            words = line.split("#")[0].split()
+
+            if not words:
+                continue
+
+            keyword = words[0].upper()
+
+            if name is None:
+                if keyword == "ROUTINE" and len(words) > 1:
+                    name = " ".join(words[1:])
+                    lines = []
+                    depth = 0
+                    start = number
+                elif keyword == "MIRROR":
+                    self._mirror(words, source, number)
                 else:
-                    drive_right = drive_left
-
-            # If the motors *must* stop, it means they haven't yet stopped. Therefore, we
-            # apply a new velocity to the motor and make them go forward.
-            if drive_l_must_stop:
-                mgL.set_velocity(drive_left, PERCENT)
-                mgL.spin(FORWARD)
-                
-            if drive_r_must_stop:
-                mgR.set_velocity(drive_right, PERCENT)
-                mgR.spin(FORWARD)
-
-            # When the lift is toggled via the right button with toggle_lift,
-            # the lift will constantly go. If the lift is manually triggered to 
-            # go forward or backward, it will untoggle the lift and switch back
-            # to manual mode. 
-            if controller.buttonY.pressing():
-                intake.spin(FORWARD)
-                intake_stopped = False # Since the lift is spinning, it is not stopped
-                intake_toggled = False # The lift should no longer be toggled since we switched to manual mode
-                
-            elif controller.buttonB.pressing():
-                intake.spin(REVERSE)
-                intake_stopped = False
-                intake_toggled = False
-                
-            elif intake_toggled:
-                intake.spin(FORWARD)
-                intake_stopped = False
-                
-            elif not intake_stopped: # If none of the before conditions are true, and the lift is not stopped, stop it. 
-                intake.stop()
-                # set the toggle so that we don't constantly tell the motor to stop when
-                # the buttons are released
-                intake_stopped = True
-
-        # wait before repeating the process
-        wait(20, MSEC)
+                    print("{} line {}: expected ROUTINE or MIRROR, got {}".format(source, number, line.strip()))
 
-# define variable for remote controller enable/disable
-remote_control_code_enabled = True
-remote_control_thread = Thread(remote_control_loop)
+                continue
+
+            if keyword == "END":
+                if depth == 0:
+                    self._add(name, lines, source, AS_WRITTEN)
+                    name = None
+                    continue
+
+                depth -= 1
+            elif keyword in ROUTINE_GROUPS:
+                depth += 1
+
+            lines.append((number, words))
+
+        if name is not None:
+            print("{} line {}: ROUTINE {} has no END".format(source, start, name))
+
+    def _mirror(self, words, source: str, number: int):
+        text = " ".join(words[1:])
+        parts = text.split(" AS ")
+
+        if len(parts) != 2 or parts[0] not in self.steps:
+            print("{} line {}: expected MIRROR <routine> AS <name>".format(source, number))
+            return
+
+        lines, side = self.steps[parts[0]]
+        self._add(parts[1], lines, source, AS_WRITTEN if side is MIRRORED else MIRRORED)
+
+    def _add(self, name: str, lines, source: str, side: FieldTransform):
+        self.side = side
+        self.missing = False
+
+        try:
+            steps = self._block(lines, 0, "ROUTINE")[0]
+        except ValueError as error:
+            print("{}: ROUTINE {} left out, {}".format(source, name, error))
+            return
+
+        self.steps[name] = (lines, side)
+
+        if self.missing:
+            return # Nothing wrong with it, it just can't run without that file
+
+        # A routine with the same name as one we already have replaces it
+        for i in range(len(self.routines)):
+            if self.routines[i][0] == name:
+                self.routines[i] = (name, Sequence(*steps))
+                return
+
+        self.routines.append((name, Sequence(*steps)))
+
+    def _block(self, lines, i: int, group: str):
+        """
+        Compile lines from lines[i] up to the END of this group. Returns the commands and
+        where to carry on from.
+        """
+        steps = []
 
-def motor_rot_avg():
+        while i < len(lines):
+            number, words = lines[i]
+            keyword = words[0].upper()
+            i += 1
+
+            if keyword == "END":
+                return steps, i
+
+            if keyword in ROUTINE_GROUPS:
+                inner, i = self._block(lines, i, keyword)
+
+            try:
+                if keyword in ROUTINE_GROUPS:
+                    if not inner:
+                        raise ValueError(keyword + " has nothing in it")
+
+                    steps.append(ROUTINE_GROUPS[keyword](*inner))
+                elif keyword in ROUTINE_STEPS:
+                    steps.append(ROUTINE_STEPS[keyword](self, words[1:], group))
+                else:
+                    raise ValueError("don't know how to " + words[0])
+            except ValueError as error:
+                raise ValueError("line {}: {}".format(number, error))
+
+        return steps, i
+
+    def split(self, words):
+        """
+        Sort a step's words into names (like FORWARD), numbers, and a speed (like 50%).
+        """
+        names = []
+        numbers = []
+        speed = None
+
+        for word in words:
+            word = word.upper()
+
+            if word in self.UNITS:
+                continue
+
+            if word.endswith("%"):
+                speed = self.number(word[:-1])
+                continue
+
+            try:
+                numbers.append(float(word))
+            except ValueError:
+                names.append(word)
+
+        return names, numbers, speed
+
+    @staticmethod
+    def number(word: str):
+        try:
+            return float(word)
+        except ValueError:
+            raise ValueError("expected a number, got " + word)
+
+    def direction(self, name: str, allowed):
+        if name not in allowed:
+            raise ValueError("expected " + " or ".join(allowed) + ", got " + name)
+
+        return self.side.turn(ROUTINE_DIRECTIONS[name])
+
+    @staticmethod
+    def expect(names, numbers, count: int, step: str):
+        if len(names) != 1 or len(numbers) != count:
+            raise ValueError("expected " + step)
+
+    def _move(self, words, group: str):
+        names, numbers, speed = self.split(words)
+        self.expect(names, numbers, 1, "MOVE FORWARD|REVERSE <inches> [speed%]")
+        return Motion(Auto.drive_for_auto, self.direction(names[0], ("FORWARD", "REVERSE")), numbers[0], 
+                      speed or DEFAULT_DRIVE_SPEED, plan = Auto.plan_drive)
+
+    def _reverse(self, words, group: str):
+        return self._move(["REVERSE"] + words, group)
+
+    def _turn(self, words, group: str):
+        names, numbers, speed = self.split(words)
+
+        if names == ["TO"]:
+            self.expect(names, numbers, 1, "TURN TO <heading> [speed%]")
+            return Motion(Auto.turn_to_heading, self.side.heading(numbers[0]), speed or MAX_TURN_SPEED)
+
+        self.expect(names, numbers, 1, "TURN LEFT|RIGHT <degrees> [speed%]")
+        return Motion(Auto.turn_for_auto, self.direction(names[0], ("LEFT", "RIGHT")), numbers[0], 
+                      speed or MAX_TURN_SPEED)
+
+    def _intake(self, words, group: str):
+        names, numbers, speed = self.split(words)
+        direction = self.direction(names[0], ("FORWARD", "REVERSE")) if names else FORWARD
+
+        if len(names) > 1 or len(numbers) > 1:
+            raise ValueError("expected INTAKE [FORWARD|REVERSE] [milliseconds MS]")
+
+        # The intake only has one speed, so don't let a speed look like it did something
+        if speed is not None:
+            raise ValueError("INTAKE doesn't take a speed, it always runs at full speed")
+
+        # An intake with no time would hold everything up forever anywhere but a race
+        if not numbers and group != "RACE":
+            raise ValueError("INTAKE needs a time unless it's in a RACE")
+
+        state = INTAKE_FORWARD if direction == FORWARD else INTAKE_REVERSE
+        return Hold(intake_mechanism, state, INTAKE_STOPPED, numbers[0] if numbers else None)
+
+    def _wait(self, words, group: str):
+        names, numbers, speed = self.split(words)
+
+        if names or len(numbers) != 1:
+            raise ValueError("expected WAIT <milliseconds> MS")
+
+        return Wait(numbers[0])
+
+    def _set_clamp(self, words, group: str):
+        return Run(clamp_mechanism.set, True, requires = ("clamp",))
+
+    def _release_clamp(self, words, group: str):
+        return Run(clamp_mechanism.set, False, requires = ("clamp",))
+
+    def _grab_goal(self, words, group: str):
+        return Auto.grab_goal()
+
+    def _start(self, words, group: str):
+        names, numbers, speed = self.split(words)
+
+        if names or len(numbers) != 3:
+            raise ValueError("expected START <x> <y> MM <heading>")
+
+        x, y, heading = self.side.pose(numbers[0], numbers[1], numbers[2])
+        return Sequence(
+            Run(odometry.set_pose, x / MM_PER_INCH, y / MM_PER_INCH, heading),
+            Wait(ODOMETRY_PERIOD * 2), # Give odometry a tick to pick up the new pose
+        )
+
+    def _drive(self, words, group: str):
+        names, numbers, speed = self.split(words)
+
+        if names not in (["TO"], ["TO", "REVERSE"]) or len(numbers) != 2:
+            raise ValueError("expected DRIVE TO <x> <y> MM [REVERSE] [speed%]")
+
+        x, y = self.side.point(numbers[0], numbers[1])
+        return Motion(Auto.drive_to_point, x, y, speed or DEFAULT_DRIVE_SPEED, len(names) == 2)
+
+    def _route(self, words, group: str):
+        names, numbers, speed = self.split(words)
+        maps = []
+
+        for name in names:
+            if name not in ROUTINE_TABLES:
+                raise ValueError("expected ROUTE and some of " + ", ".join(ROUTINE_TABLES) + ", got " + name)
+
+            maps.append(self.side.rings(ROUTINE_TABLES[name]))
+
+        if not maps or numbers:
+            raise ValueError("expected ROUTE <tables> [speed%]")
+
+        # run_route runs the intake and clamp itself
+        return Motion(Auto.run_route, maps, speed or DEFAULT_DRIVE_SPEED, requires = ("drive", "intake", "clamp"))
+
+    def _trajectory(self, words, group: str):
+        if len(words) != 1:
+            raise ValueError("expected TRAJECTORY <file>")
+
+        # Loaded (and mirrored) now so there's nothing to read from the SD card or work out
+        # during the match
+        trajectory = Trajectory.load(words[0])
+
+        if trajectory is None:
+            # No SD card, or the file isn't on it. That's normal (the routine only shows up
+            # when it is), so it's left out without printing anything.
+            self.missing = True
+            return Sequence()
+
+        self.side.trajectory(trajectory)
+
+        samples = trajectory.samples
+        return Sequence(
+            Run(odometry.set_pose, samples[0], samples[1], samples[2]),
+            Wait(ODOMETRY_PERIOD * 2), # Give odometry a tick to pick up the new pose
+            Motion(trajectory_follower.follow, trajectory),
+        )
+
+ROUTINE_DIRECTIONS = {"FORWARD": FORWARD, "REVERSE": REVERSE, "LEFT": LEFT, "RIGHT": RIGHT}
+
+ROUTINE_GROUPS = {"PARALLEL": Parallel, "RACE": Race, "SEQUENCE": Sequence}
+
+ROUTINE_STEPS = {
+    "MOVE": RoutineCompiler._move,
+    "REVERSE": RoutineCompiler._reverse,
+    "TURN": RoutineCompiler._turn,
+    "INTAKE": RoutineCompiler._intake,
+    "WAIT": RoutineCompiler._wait,
+    "SET_CLAMP": RoutineCompiler._set_clamp,
+    "RELEASE_CLAMP": RoutineCompiler._release_clamp,
+    "GRAB_GOAL": RoutineCompiler._grab_goal,
+    "TRAJECTORY": RoutineCompiler._trajectory,
+    "START": RoutineCompiler._start,
+    "DRIVE": RoutineCompiler._drive,
+    "ROUTE": RoutineCompiler._route,
+}
+
+ROUTINE_TABLES = {"RED_RINGS": red_rings, "BLUE_RINGS": blue_rings, "MOBILE_GOALS": mobile_goals}
+
+def load_routines():
     """
-    Take the rotation of each motor to return an average, to get a more accurate representation
-    of how far the robot has driven. 
+    Compile the built-in routines, then any from ROUTINES_FILE on the SD card. Returns a 
+    list of (name, command).
     """
-    num = 0
+    compiler = RoutineCompiler()
+    compiler.compile(ROUTINES)
+
+    if brain.sdcard.is_inserted() and brain.sdcard.exists(ROUTINES_FILE):
+        compiler.compile(bytes(brain.sdcard.loadfile(ROUTINES_FILE)).decode(), ROUTINES_FILE)
+
+    return compiler.routines
+
+# The brain screen is 480 x 272, but the top 32 lines are the VEX status bar, so there's
+# 480 x 240 for us. (0, 0) is the top-left of that.
+SCREEN_WIDTH = 480
+SCREEN_HEIGHT = 240
+TEXT_BASELINE = 5 # Pixels from the bottom of a widget to where print_at() puts the text
 
-    for motor in motors:
-        num += abs(motor.position()) # Get the absolute value to tell us how far it's driven, doesn't matter what direction
+class Widget:
+    """
+    One thing on the brain screen, like a line of text or a button, that knows where it is
+    and how to draw itself.
 
-    return num / len(motors)
+    Widgets never draw themselves straight away. When what a widget shows changes, it 
+    calls invalidate(), and the UI redraws it (and only it) the next time it renders. 
+    Override draw() to make a new kind of widget.
+    """
+    def __init__(self, x: int, y: int, width: int, height: int, on_press = None):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.on_press = on_press # Called when the widget is touched, if it's given
+        self.ui = None # The UI it's on, once it's shown
+
+    def contains(self, x: int, y: int) -> bool:
+        return self.x <= x < self.x + self.width and self.y <= y < self.y + self.height
+
+    def invalidate(self):
+        if self.ui is not None:
+            self.ui.invalidate(self)
+
+    def draw(self, scr):
+        """
+        Draw the widget. Nothing outside its own rectangle gets drawn anyway.
+        """
 
-def reset_pos():
+class Label(Widget):
     """
-    Reset the position of each motor to prepare them to measure another distance
+    A line of text on a background, which blanks out whatever text was there before.
     """
-    for motor in motors:
-        motor.reset_position()
+    def __init__(self, x: int, y: int, width: int, text = "", color = Color.WHITE, background = Color.BLACK, 
+                 font = FontType.MONO20):
+        super().__init__(x, y, width, 25)
+        self.text = text
+        self.color = color
+        self.background = background
+        self.font = font
+
+    def set_text(self, text: str):
+        if text != self.text:
+            self.text = text
+            self.invalidate()
+
+    def draw(self, scr):
+        scr.set_pen_color(self.background)
+        scr.draw_rectangle(self.x, self.y, self.width, self.height, self.background)
+        scr.set_pen_color(self.color)
+        scr.set_font(self.font)
+        scr.print_at(self.text, x = self.x + 5, y = self.y + self.height - TEXT_BASELINE, opaque = False)
+
+class Button(Widget):
+    """
+    A colored rectangle with a name on it that calls on_press when it's touched.
+    """
+    def __init__(self, x: int, y: int, width: int, height: int, text: str, color, on_press):
+        super().__init__(x, y, width, height, on_press)
+        self.text = text
+        self.color = color
+
+    def draw(self, scr):
+        scr.set_pen_color(self.color)
+        scr.draw_rectangle(self.x, self.y, self.width, self.height, self.color)
+        scr.set_pen_color(Color.BLACK)
+        scr.print_at(self.text, x = self.x + 10, y = self.y + self.height // 2 + TEXT_BASELINE, opaque = False)
+
+class UI:
+    """
+    Keeps what's on the brain screen as a list of widgets, so it only has to draw what 
+    changed.
+
+    The old selector cleared the whole 480 x 240 screen and drew everything again whenever 
+    anything changed, which flashes, and checked four times a second whether it had to. 
+    Here, when a widget changes it's added to the dirty list, and render() redraws only 
+    the dirty widgets, each clipped to its own rectangle, then forgets them. Touches come 
+    in through the screen's pressed event and go to whichever widget was touched (by its
+    real rectangle, so the gaps between buttons do nothing), and whatever that changed is 
+    rendered right away, so nothing has to poll.
+
+    show() puts up a whole new page of widgets. That's the only time the screen is cleared.
+    show_over() puts up a page for a moment, like the loop stats, and back() puts the page
+    that was under it back up, drawn the way it is now.
+    """
+    def __init__(self):
+        self.widgets = []
+        self.dirty = []
+        self.under = None # The page show_over() covered up
+        brain.screen.pressed(self.pressed)
+
+    def show(self, widgets):
+        """
+        Replace everything on the screen with `widgets`.
+        """
+        for widget in self.widgets:
+            widget.ui = None
+
+        self.widgets = list(widgets)
+        self.dirty = list(self.widgets)
+
+        for widget in self.widgets:
+            widget.ui = self
+
+        brain.screen.clear_screen()
+        self.render()
+
+    def show_over(self, widgets):
+        """
+        Put `widgets` on the screen until back() is called.
+        """
+        # Showing another one over the top still goes back to the real page
+        if self.under is None:
+            self.under = self.widgets
+
+        self.show(widgets)
+
+    def back(self):
+        if self.under is not None:
+            widgets = self.under
+            self.under = None
+            self.show(widgets)
 
-def driven_dist():
+    def invalidate(self, widget: Widget):
+        if widget not in self.dirty:
+            self.dirty.append(widget)
+
+    def render(self):
+        """
+        Draw every widget that changed since the last render.
+        """
+        scr = brain.screen
+
+        for widget in self.dirty:
+            scr.set_clip_region(widget.x, widget.y, widget.width, widget.height)
+            widget.draw(scr)
+
+        if self.dirty:
+            self.dirty = []
+            scr.set_clip_region(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+
+    def pressed(self):
+        x = brain.screen.x_position()
+        y = brain.screen.y_position()
+
+        # The last widget is the one on top
+        for widget in reversed(self.widgets):
+            if widget.on_press is not None and widget.contains(x, y):
+                widget.on_press()
+                break
+
+        self.render()
+
+ui = UI()
+
+class Startup:
     """
-    Calculate the distance the robot has driven using the rotation of the wheels along with the 
-    gear ratio and wheel circumeference. 
+    Everything that has to happen once before auto, done in the background as soon as the
+    program starts, while the selector is up.
+
+    Auto used to calibrate the inertial sensor when the field enabled it, then sit still 
+    for two of its fifteen seconds waiting for it. Now the steps given to add() run one 
+    after another in their own thread, with `status` (which the selector shows) saying 
+    which one is going and how long each took printed to the console. `ready` goes True 
+    when they're all done, so auto can start moving the moment it's enabled. If it's
+    enabled before that, wait() holds it up for whatever's left.
     """
-    dist = (motor_rot_avg() / 360) * GEAR_RATIO * WHEEL_CIRC
-    return dist
+    def __init__(self):
+        self.steps = []
+        self.ready = False
+        self.status = Label(0, 85, SCREEN_WIDTH, "Starting up...", Color.YELLOW)
+
+    def add(self, name: str, step):
+        self.steps.append((name, step))
+
+    def start(self):
+        Thread(self.run)
+
+    def run(self):
+        started = brain.timer.time(MSEC)
 
-def threaded_spin(motor: "Motor | MotorGroup", *args):
+        for name, step in self.steps:
+            self.status.set_text(name + "...")
+            ui.render()
+            began = brain.timer.time(MSEC)
+            step()
+            print("Startup: {} took {}ms".format(name, brain.timer.time(MSEC) - began))
+
+        self.ready = True
+        self.status.set_text("Ready ({:.1f}s)".format((brain.timer.time(MSEC) - started) / 1000))
+        ui.render()
+
+    def wait(self):
+        while not self.ready:
+            wait(5, MSEC)
+
+startup = Startup()
+
+def calibrate_inertial():
     """
-    Make a motor spin in a thread so it's not blocking.
-    Useful for auto when we need to spin a motor like the intake but also do other stuff
-    at the same time. 
+    Calibrate the inertial sensor. The robot has to sit still until it's done. Odometry 
+    works out the heading from the wheels in the meantime.
     """
-    Thread(motor.spin_for, args)
+    inertial.calibrate()
+
+    while inertial.is_calibrating():
+        wait(20, MSEC)
 
 class Auto:
     """
@@ -275,362 +3377,339 @@ class Auto:
     the drive_for and turn_for auto functions unless they know what they're doing.
     """
     def __init__(self):
-        # You'll take a look at the available autos and see all of these lambdas. What's a lambda?
-        # `lambda` is a keyword that's used to define an inline function. A lambda that's defined as 
-        # `lambda a: a + 1` is equivalent to the following code:
-        # def f(a):
-        #     return a + 1
-        # Lambda is useful so we can make an anonymous function that we only use once for a small amount of code
-        # Since the Competition() class doesn't accept arguments for the methods, if we *do* need to pass an 
-        # argument for the autos, like in auto_minus, we use lambda to make a single-use function that calls
-        # the method with the required arguments. So, when you see the line `lambda: self.auto_minus(Color.Red)`,
-        # that's the same as a function:
-        # def f():
-        #     return self.auto_minus(Color.Red)
+        # The autos are the routines in ROUTINES (and on the SD card), compiled into commands 
+        # right here, so picking one in the selector and running it costs nothing.
         #
-        # You'll also notice the odd syntax of (x, y). This is a `tuple`. Similar to a list, a tuple is an 
+        # You'll notice the odd syntax of (x, y). This is a `tuple`. Similar to a list, a tuple is an 
         # immutable collection of objects. In this case, for each auto, we create a tuple where index 0 is
-        # the name of the auto, and index 1 is the function that calls the auto. This makes it easier to manage
+        # the name of the auto, and index 1 is the function that runs the auto. This makes it easier to manage
         # in the selector. These tuples are then stored in a list, so if we wanted to retrieve an item from a 
         # tuple, it would be list[index_of_list][index_of_tuple], since list[index] returns the item of the list,
         # in this case a tuple, which we can then immediately use by indexing the tuple. Confusing, I know. 
+        #
+        # What's a lambda? `lambda` is a keyword that's used to define an inline function. A lambda that's 
+        # defined as `lambda a: a + 1` is equivalent to the following code:
+        # def f(a):
+        #     return a + 1
+        # Lambda is useful so we can make an anonymous function that we only use once for a small amount of code.
+        # The `command = command` makes each lambda keep its own routine's command, instead of all of them 
+        # using whichever command the loop ended on.
+        self.routines = load_routines()
         self.available_autos = [
-            ("Min", lambda: self.auto_min()),
-            ("Min + Score", lambda: self.auto_direct_score()),
-            ("Red Minus", lambda: self.auto_minus(Color.RED)),
-            ("Blue Minus", lambda: self.auto_minus(Color.BLUE)),
-            ("Blank", lambda: ...) # ... is the same as `pass`. This is an empty function
-        ] # A list of tuples that contain a name for the auto and the method itself
+            (name, lambda command = command: commands.run(command)) for name, command in self.routines
+        ] # A list of tuples that contain a name for the auto and the function that runs it
         self.selected_auto = 0 # Index of available_autos
         self.roller_should_be_moving = False
         self.lift_should_be_moving = True
 
+    # How often the auto motions check on the robot, in milliseconds. The motors and 
+    # sensors only report new values every 10ms, so checking faster than that is wasted work.
+    LOOP_PERIOD = 10
+
+    # If the robot moves less than this in STALL_TIME milliseconds, it's stuck
+    STALL_DISTANCE = 0.25 # Inches
+    STALL_DEGREES = 1 # Degrees
+    STALL_TIME = 250
+
+    # When the autonomous period ends, in brain.timer milliseconds. run() sets it when auto
+    # starts, so anything planning against the clock knows how long it really has left.
+    deadline = None
+
     @staticmethod
-    def drive_for_auto(direction, distance_in: float, velocity_percent: int, stop_type = BRAKE):
+    def drive_for_auto(direction, distance_in: float, velocity_percent: int, stop_type = BRAKE, timeout_ms = None, shape = TRAPEZOID):
         """
         Drive a certain distance. This algorithm uses the amount of rotations the motors
         to check if the bot has driven a certain distance.
+
+        Instead of going `velocity_percent` the whole way, the robot follows a MotionProfile
+        with `velocity_percent` as its top speed, so it speeds up and slows down smoothly and
+        stops on the target instead of sliding past it.
+
+        The robot gives up and stops if it gets stuck or if it takes longer than `timeout_ms`
+        (by default, twice as long as it should). Returns True if it made it the whole way.
         """
-        reset_pos() # Reset position so we don't count previously driven distance in our new calculation
-        wait(25, MSEC) # Wait a small time for the positions to update
-        
-        while driven_dist() < distance_in: # Drive until we reach our destination
-            drivetrain.drive(direction, velocity_percent, PERCENT)
-        
-        drivetrain.stop(stop_type)
+        profile = drive_profiles.get((distance_in, velocity_percent, shape))
+
+        if profile is None:
+            profile = MotionProfile(distance_in, MAX_DRIVE_SPEED * min(velocity_percent, MAX_SPEED) / 100,
+                                    MAX_DRIVE_SPEED * AUTO_ACCELERATION / 100, shape)
+
+        return follower.follow(profile, direction, stop_type, timeout_ms)
 
     @staticmethod
-    def turn_for_auto(direction, distance_deg: int, velocity_percent: int):
-        """
-        Autonomously turn a certain amount. This algorithm uses the rotations of the
-        motor to dictate how far the robot has rotated. Seems to be decently innacurate.
-        """
-        def _imuturn():
-            inertial.reset_heading()
-            
-            while True:
-                heading = inertial.heading()
-                print(heading)
-
-                if direction == LEFT:
-                    heading -= 180
-                
-                if -5 < heading - distance_deg < 5:
-                    break
+    def plan_drive(direction, distance_in: float, velocity_percent: int, stop_type = BRAKE, timeout_ms = None, shape = TRAPEZOID):
+        """
+        Work out the profile drive_for_auto would follow and keep it in drive_profiles, so 
+        it doesn't have to be worked out during auto. Takes the same arguments as 
+        drive_for_auto, so a Motion can call it from prepare().
+        """
+        key = (distance_in, velocity_percent, shape)
 
-                drivetrain.turn(direction, velocity_percent, PERCENT)
-            
-            drivetrain.stop(BRAKE)
+        if key not in drive_profiles:
+            drive_profiles[key] = MotionProfile(distance_in, MAX_DRIVE_SPEED * min(velocity_percent, MAX_SPEED) / 100,
+                                                MAX_DRIVE_SPEED * AUTO_ACCELERATION / 100, shape)
 
-        def _motorturn():
-            reset_pos() # Make sure the position readings are fresh
+    @staticmethod
+    def drive_to_point(x_mm: float, y_mm: float, velocity_percent: int, reverse: bool = False):
+        """
+        Turn to face (x_mm, y_mm) on the field, using where odometry says we are, and drive 
+        there. With `reverse`, back up to it instead. Returns True if we made it.
 
-            turn_radius = WHEEL_BASE / 2 
-            turning_circumference = 2 * math.pi * turn_radius
-            turn_dist = (distance_deg / 360) * turning_circumference # The amount of inches the wheels need to travel to rotate that amount of degrees
+        """
+        x, y, heading = odometry.pose
+        dx = x_mm / MM_PER_INCH - x
+        dy = y_mm / MM_PER_INCH - y
+        bearing = math.degrees(math.atan2(dx, dy))
 
-            while driven_dist() < turn_dist:
-                drivetrain.turn(direction, velocity_percent, PERCENT)
+        if reverse:
+            bearing += 180
 
-            drivetrain.stop(BRAKE)
-        
-        _imuturn()
+        if not Auto.turn_to_heading(bearing):
+            return False
 
+        distance = math.sqrt(dx * dx + dy * dy)
+        return Auto.drive_for_auto(REVERSE if reverse else FORWARD, distance, velocity_percent)
 
-    def auto_min(self):
+    @staticmethod
+    def turn_to_heading(heading: float, velocity_percent: int = MAX_TURN_SPEED, timeout_ms = None):
+        """
+        Turn the short way around to face `heading` (degrees, 0-360 or any other way of
+        writing the same direction) following a MotionProfile, like drive_for_auto does 
+        for driving. Returns True if we got there.
         """
-        Description:
-        min_auto only goes forward until it grabs a goal.
-        Useful to get off of the starting line
-        This is also useful in regular auto processes so we don't have to 
-        repeat the same code. Reusability!
+        turn = (heading - odometry.pose[2] + 180) % 360 - 180
+
+        if -TurnFollower.TOLERANCE < turn < TurnFollower.TOLERANCE:
+            return True
+
+        profile = MotionProfile(turn, MAX_TURN_RATE * velocity_percent / 100, MAX_TURN_RATE * AUTO_ACCELERATION / 100)
+        return turn_follower.follow(profile, RIGHT if turn > 0 else LEFT, BRAKE, timeout_ms)
 
-        Criteria:
-        - Any side of field
-        - Must have a direct, straight path to a goal
-        - Must be facing backwards (intake towards wall)
+    @staticmethod
+    def run_route(maps, velocity_percent: int = 70, deadline_ms = None):
+        """
+        Plan a route through the objects in `maps` (see RoutePlanner) from where we are and
+        drive it, with the intake running. Rings in a row are driven through in one smooth
+        path with PurePursuit instead of stopping at each one. Mobile goals are backed into
+        one at a time and clamped. Every object on the way is removed from its map. If a 
+        move fails, we give up on what's left of it and plan again with the time that's left.
+
+        The time left is counted down to `deadline_ms` (brain.timer milliseconds). By default
+        that's the end of auto (Auto.deadline), since whatever ran before the route has 
+        already used some of it. Outside of auto it's AUTO_TIME from now.
+
+        Odometry has to be set to our real spot on the field first (odometry.set_pose, in 
+        inches), since the field tables are in field coordinates.
         """
-        reset_pos()
+        if deadline_ms is None:
+            deadline_ms = Auto.deadline
 
-        # Prepare the optical sensor
-        optical.set_light(100)
-        # "Object Detect Threshold" isn't defined anywhere to tell us what exactly
-        # that means. I've learned that it only goes up to 255 and the higher the 
-        # number, the closer an object needs to be to be detected. If the value is 
-        # 255, it just never detects anything. We want to get as close as possible
-        # without being detected to be more accurate.
-        optical.object_detect_threshold(254)
-        
-        # Drive until the optical sensor on the back of the robot detects
-        # a goal or until we have driven 48 inches.
-        # This is a failsafe in case the sensor or process malfunctions
-        # to make sure we don't go over the line and get DQ'd
-        timer = False
+        if deadline_ms is None:
+            deadline_ms = brain.timer.time(MSEC) + AUTO_TIME * 1000
 
-        while driven_dist() < 48:
-            drivetrain.drive(REVERSE, 45, PERCENT)
+        planner.velocity = velocity_percent
+        intake_mechanism.set(INTAKE_FORWARD)
 
-            if timer and timer.time() >= 50:
-                clamp.set(True)
+        while True:
+            x, y, heading = odometry.pose
+            time_left = (deadline_ms - brain.timer.time(MSEC)) / 1000
+            route = planner.plan(x * MM_PER_INCH, y * MM_PER_INCH, heading, maps, time_left)
+
+            if not route:
                 break
 
-            if optical.is_near_object() and not timer:
-                timer = Timer()
-            
-            wait(5, MSEC)
+            first = 0
 
-        # Set the clamp down to make sure we grab the goal. We set it to True manually instead
-        # of using the toggle method to ensure the clamp is down instead of putting it back
-        # up if it was already down (which shouldn't normally happen).
-        clamp.set(True)
-        wait(250, MSEC)
+            while first < len(route):
+                # Take every ring up to the next goal, or just the goal
+                goal = route[first][2] is mobile_goals
+                end = first + 1
 
-        self.drive_for_auto(FORWARD, 12, 30)
-        drivetrain.stop(BRAKE)
+                while not goal and end < len(route) and route[end][2] is not mobile_goals:
+                    end += 1
 
-    def auto_minus(self, color):
-        """
-        An auto that works on the minus side of the field. This 
-        auto will, with a preload, grab another ring (be in possession of two), get a 
-        mobile goal, and (attempt) to score both rings on the mobile goal.
+                x, y, heading = odometry.pose
+                points = [(x, y)]
 
-        Criteria:
-        - Left side of either team
-        - Must be facing a double stack of rings
-            - would theoretically work with a single ring as well
-        - Must be facing forward (clamp toward wall)
-        """
+                for stop_x, stop_y, field_map, index in route[first:end]:
+                    points.append((stop_x / MM_PER_INCH, stop_y / MM_PER_INCH))
 
-        threaded_spin(intake, 1500, MSEC) # Spin the intake while we move toward the field ring
-        self.drive_for_auto(FORWARD, 36, 50) # Go 40 inches towards the rings
-        wait(250, MSEC) # Wait a small amount of time to make sure the bot is settled
+                # PurePursuit steers while it drives, but starting off facing the wrong way 
+                # would make it swing wide, so face the first stop first
+                bearing = math.degrees(math.atan2(points[1][0] - x, points[1][1] - y)) + (180 if goal else 0)
 
-        # Since this auto will hardly change if we're on separate sides of the field, we take the 
-        # color argument and use it in this single condition instead of creating an entirely new
-        # function with the same code. 
-        if color == Color.RED:
-            self.turn_for_auto(LEFT, 86, 3) # Turn 90 degrees to have the rear face a goal
-        else:
-            self.turn_for_auto(RIGHT, 86, 3) 
-             
-        wait(250, MSEC) # Let the bot rest
+                if abs((bearing - heading + 180) % 360 - 180) > 30:
+                    Auto.turn_to_heading(bearing)
+
+                if goal:
+                    goal_detector.arm() # Clamp the moment it's in, instead of waiting to stop
 
-        self.auto_min() # Go backward until we get the mobile goal
+                arrived = pursuit.follow(Path(points), velocity_percent, reverse = goal)
+                goal_detector.disarm()
 
-        intake.spin_for(FORWARD, 5, SECONDS) # Score the rings while we're moving
+                # Either way, they're not there for us anymore
+                for stop_x, stop_y, field_map, index in route[first:end]:
+                    field_map.remove(index)
 
-        # We can also go a little further to make sure we're touching the middle ladder
-        # This would consist of probably facing backwards so our mobile goal doesn't get
-        # In the way, then running forward into a latter post. 
+                if not arrived:
+                    break # Plan again from wherever we ended up
 
-    def auto_direct_score(self):
+                if goal:
+                    clamp_mechanism.set(True)
+
+                first = end
+            else:
+                break # Finished the whole route
+
+        intake_mechanism.set(INTAKE_STOPPED)
+
+    @staticmethod
+    def turn_for_auto(direction, distance_deg: int, velocity_percent: int, timeout_ms = None):
         """
-        Do nothing but go backward and score our preload. 
+        Autonomously turn a certain amount, using the inertial sensor (through odometry) to 
+        tell how far we've turned.
 
-        Criteria:
-            - Same as auto_min()
-            - Requires a preload to be useful
+        Like drive_for_auto, this gives up if the robot gets stuck or runs out of time, and
+        returns True if it made it the whole way.
         """
-        self.auto_min()
+        if timeout_ms is None:
+            timeout_ms = motion_timeout(distance_deg, MAX_TURN_RATE * velocity_percent / 100)
+
+        # The odometry heading doesn't wrap around at 360 like heading() does, so a left
+        # turn just counts down instead of jumping from 0 to 359.
+        start = odometry.pose[2]
+        rate = Rate(Auto.LOOP_PERIOD)
+        stall = StallDetector(Auto.STALL_DEGREES, Auto.STALL_TIME)
+        arrived = False
+
+        while True:
+            turned = abs(odometry.pose[2] - start)
+
+            # Stop once we're within 5 degrees, the same as we always have
+            if turned > distance_deg - 5:
+                arrived = True
+                break
+
+            if rate.elapsed() > timeout_ms or stall.stalled(turned, rate.elapsed()):
+                break
 
-        intake.spin_for(FORWARD, 3, SECONDS)
+            drive_motors.turn(direction, velocity_percent)
+            rate.sleep()
+
+        drive_motors.stop(BRAKE)
+        return arrived
+
+
+    @staticmethod
+    def grab_goal():
+        """
+        A command that backs up until goal_detector finds a goal behind us and clamps it, or
+        until we have driven 48 inches. The 48 inches is a failsafe in case the sensor or 
+        process malfunctions to make sure we don't go over the line and get DQ'd.
+        """
+        return Sequence(
+            Run(goal_detector.arm),
+            Race(
+                Motion(Auto.drive_for_auto, REVERSE, 48, 45, plan = Auto.plan_drive),
+                # goal_detector times the clamp for a robot that's still moving, so keep 
+                # driving until the clamp has had time to close
+                Sequence(WaitUntil(lambda: goal_detector.fired), Wait(GoalDetector.CLAMP_DELAY)),
+            ),
+            Run(goal_detector.disarm),
+            # Set the clamp down to make sure we grab the goal. We set it to True manually instead
+            # of using the toggle method to ensure the clamp is down instead of putting it back
+            # up if it was already down (which shouldn't normally happen).
+            Run(clamp_mechanism.set, True, requires = ("clamp",)),
+        )
 
     def selector(self, competition: Competition):
         """
         Autonomous selector allows the controller user to select which auto they are
         going to use
         """
-        # Global to make sure these variables can be used inside of the child functions
-        global screen_should_be_refreshed, confirmed
-
-        scr = brain.screen # A shortcut so we don't have to type it out each time
-        screen_should_be_refreshed = True # To avoid unnecessary screen refreshes
         confirmed = False # If the auto is confirmed. 
-
-        scr.set_font(FontType.MONO20) # Make our text bigger
-
-        # Python allows functions to be defined inside of other functions, but why do this?
-        # After all, we can simply define functions alongside of each other and call them through
-        # the class. Nesting functions can also cause some janky behavior with variables.
-        #
-        # I wrote this code with nested functions, or functions defined inside of functions, for the 
-        # sake of organization. These child functions (print_selected and screen_press) need to use 
-        # variables from its parent function (selector), since its parent function starts changing variables
-        # that are defined inside of its scope but still relative to what the child functions are doing.
-        # The Auto class wasn't meant to manage the state of any single autonomous period, rather to organize
-        # them all and give each method access to information they need. Since the state of the selector,
-        # like variables such as `screen_should_be_refreshed` and `confirmed`, are only relevant to itself,
-        # and the children functions are only relevant to the parent function, we group this all together in 
-        # its own little ecosystem. It can be thought of as a poor man's class, just an easier way to organize
-        # these functions rather than making an entire selector class. 
-        
-        def print_selected():
-            """
-            Print which auto is selected on the brain screen.
-
-            The brain screen has a resolution of 480 x 272, but since the top 32 lines
-            of the screen are used for the VEX status bar, there's a usable area of 
-            480 x 240 to mess with. There is 480 usable pixels in the x range, and
-            240 usable in the y range. The system starts from (0,0) being the bottom
-            left of the screen. 
-            """
-            scr.clear_screen()
-            scr.set_cursor(1, 0)
-            scr.print("> " + self.available_autos[self.selected_auto][0])
-            scr.new_line()
-            scr.print("(GREEN) to confirm")
-            scr.new_line()
-            scr.print("(RED) to switch")
-
-            # Draw_rectangle() has the parameters start_x, start_y, 
-            # width, and height, where start_x and start_y are a point at the top-left
-            # of the rectangle and width and height are how far down or right the rectangle
-            # should expand. In this case, we make two equal squares each with a padding of
-            # 10px from the sides of the screen, and a 10px gap between them. 
-            scr.draw_rectangle(10, 120, 225, 110, color=Color.RED)
-            scr.draw_rectangle(250, 120, 225, 110, color=Color.GREEN)
-
-        def screen_press():
-            """
-            Handle when the screen is pressed, or our colored buttons are touched. 
-            """
-            touch_coords = (scr.x_position(), scr.y_position())
-
-            if touch_coords[1] < 110: # If the screen is touched above where the buttons are defined, we don't care
-                return
-            
-            # If x is less than 225, or the bottom-left of the screen is touched, we handle the red button actions
-            if touch_coords[0] < 225: 
-                self.selected_auto += 1
-
-                if self.selected_auto >= len(self.available_autos):
-                    self.selected_auto = 0
-                
-                global screen_should_be_refreshed
-                screen_should_be_refreshed = True
-
-            # If x is greater than 250, or the bottom-right of the screen is touched, we handle the green buttons
-            elif touch_coords[0] > 250:
-                scr.clear_screen()
-
-                scr.set_cursor(3, 0)
-                scr.print("Selected auto: " + self.available_autos[self.selected_auto][0])
-                scr.new_line()
-                scr.print("Ready to go! GHLF :)")
-
-                global confirmed
-                confirmed = True
-
-            # Technically, we aren't handling entirely within the bounds of the buttons here. In these conditions,
-            # We're checking if x < 225 and x > 250 and y < 110, which includes the padded area between the 
-            # button and the screen. This isn't too important, and we can argue that if the padding was touched, the 
-            # user wanted to perform the nearest action anyway. 
-        
-        brain.screen.pressed(screen_press) # Register the brain screen press event
-
-        # While the autonomous is not confirmed, we refresh the screen if it needs refreshing. 
+        brain.screen.set_font(FontType.MONO20) # Make our text bigger
+
+        # Python allows functions to be defined inside of other functions, and the inner 
+        # functions can use the outer function's variables. switch() and confirm() only make 
+        # sense while the selector is up, so they live in here. `nonlocal` lets confirm() 
+        # change `confirmed` itself instead of making a new variable of its own.
+        selected = Label(0, 0, SCREEN_WIDTH, "> " + self.available_autos[self.selected_auto][0])
+
+        def switch():
+            self.selected_auto += 1
+
+            if self.selected_auto >= len(self.available_autos):
+                self.selected_auto = 0
+
+            # Only the name changes, so it's the only thing that gets redrawn
+            selected.set_text("> " + self.available_autos[self.selected_auto][0])
+
+        def confirm():
+            nonlocal confirmed
+            confirmed = True
+            ui.show([
+                Label(0, 25, SCREEN_WIDTH, "Selected auto: " + self.available_autos[self.selected_auto][0]),
+                Label(0, 50, SCREEN_WIDTH, "Ready to go! GHLF :)"),
+                startup.status,
+            ])
+
+        # Two equal buttons each with a padding of 10px from the sides of the screen, and a 
+        # gap between them. Touching the gap, or anywhere above them, does nothing.
+        ui.show([
+            selected,
+            Label(0, 25, SCREEN_WIDTH, "(GREEN) to confirm"),
+            Label(0, 50, SCREEN_WIDTH, "(RED) to switch"),
+            startup.status,
+            Button(10, 120, 225, 110, "Switch", Color.RED, switch),
+            Button(250, 120, 225, 110, "Confirm", Color.GREEN, confirm),
+        ])
+
+        # Touches are handled and drawn by the screen's event as soon as they happen, so 
+        # all this does is wait until we're done choosing
         while not confirmed and (not competition.is_competition_switch() or competition.is_driver_control()):
-            # Only refresh the screen if the selected auto has changed, since it causes an annoying 
-            # flashing effect if the screen is constantly refreshed. 
-            if screen_should_be_refreshed:
-                print_selected()
-                global screen_should_be_refreshed
-                screen_should_be_refreshed = False
-
             wait(250, MSEC)
         
         print("All done!")
 
-    def run(self):
+    def prepare(self):
         """
-        Used to run our selected auto 
+        Get every routine ready ahead of time, see Command.prepare().
         """
-        inertial.calibrate()
+        for name, command in self.routines:
+            command.prepare()
 
+    def run(self):
+        """
+        Used to run our selected auto. startup has normally finished calibrating long before
+        this, so the robot starts moving straight away.
+        """
+        Auto.deadline = brain.timer.time(MSEC) + AUTO_TIME * 1000
         controller.screen.clear_screen()
         controller.screen.set_cursor(1, 1)
         controller.screen.print("Running Auto:")
         controller.screen.next_row()
         controller.screen.print(self.available_autos[self.selected_auto][0])
 
-        while inertial.is_calibrating():
-            wait(5, MSEC)
-
+        startup.wait() # Only waits if auto was enabled before startup was done
         self.available_autos[self.selected_auto][1]()
 
-def controller_screen():
-    """
-    Write the temperatures of the motors to the screen of the controller. This is hardly
-    useful during the competition, and could be more useful if managing a dynamic status
-    screen that can simply say "OVERHEATING" if the temperature gets too high. 
-    Having too much information available to the driver can be overwhelming, which
-    is why a second or third teammate is necessary on the field. The driver focuses on
-    driving the robot and listens to instructions from a teammate, who will gather information
-    about the field in order to filter and decode it for use by the driver.
-
-    A user from the VEX forum states motor current is cut in half at 55C, or about 131F. 
-    We could use this temperature to warn the driver that the robot is overheating. 
-    https://www.vexforum.com/t/v5-motor-temp-in-percent/52433/4
-    """
-    # Have the controller show the temperatures of the drivetrain motors, for some reason.
-    scr = controller.screen
-    overheating = False
-
-    while True:
-        # Gather all of the temperatures
-
-        for motor in motors:
-            if motor.temperature() >= 55:
-                overheating = True
-                break
-            else:
-                overheating = False
-        
-        if overheating:
-            scr.clear_screen()
-            scr.set_cursor(1, 1)
-            scr.print("!!! Warning !!!")
-            scr.next_row()
-            scr.print("Drivetrain Overheating")
-        else:
-            scr.clear_screen()
-            scr.set_cursor(2, 1)
-            scr.print("All good :)")
-
-
-        wait(5, SECONDS) # Update the motor temperatures on the screen only every five seconds
-
 def driver_control():
     """
     When it's driver control time, this function will run. This can be used to set up
     the robot and get it ready to be driven. In our case, everything is already set up
     so there's not much to do here.
     """
+    commands.cancel_all() # Anything auto left running, like the intake, stops here
     optical.set_light(0) # Don't burn out the optical LED from autonomous
-    Thread(controller_screen)
+    health.start_display()
 
 auto = Auto()
 
+startup.add("Calibrating IMU", calibrate_inertial)
+startup.add("Planning moves", auto.prepare)
+startup.start()
+
 # Finally, define and run the Competition class which communicates with the field controller. It'll run the 
 # driver_control() method when it's time for driver control, and the auto.run() method when it's time for auto
 competition = Competition(driver_control, auto.run)
@@ -1,5 +1,15 @@
 from vex import *
+from array import array
+import math
 
+# This is a program of its own on the brain, so it can't import anything from main.py.
+# These classes are copied from main.py and have to stay exactly the same as they are 
+# there: fix them in main.py, then copy the whole class over. sim/check_copies.py 
+# checks that they still match.
+#
+#     PID, LoopProfile
+
+brain = Brain()
 mgR_motor_a = Motor(Ports.PORT1, GearSetting.RATIO_6_1, True)
 mgR_motor_b = Motor(Ports.PORT2, GearSetting.RATIO_6_1, False)
 mgR = MotorGroup(mgR_motor_a, mgR_motor_b)
@@ -8,6 +18,9 @@ mgL_motor_b = Motor(Ports.PORT12, GearSetting.RATIO_6_1, True)
 mgL = MotorGroup(mgL_motor_a, mgL_motor_b)
 drivetrain = DriveTrain(mgL, mgR, 319.19, 330, 320, MM, 1)
 inertial = Inertial(Ports.PORT18)
+# origin_x and origin_y are how far (mm) the GPS is from the middle of the robot. The heading
+# offset is 180 since the GPS is mounted backwards. See auto2.txt.
+gps = Gps(Ports.PORT19, 10, -10, MM, 180)
 
 motors = [mgR_motor_a, mgR_motor_b, mgL_motor_a, mgL_motor_b]
 
@@ -34,53 +47,389 @@ class Vector:
     def __str__(self) -> str:
         return "({}, {})".format(self.x, self.y)
 
-# def gps_pos():
-#     return Vector(gps.x_position(), gps.y_position())
-
-
-# class PIDwithGPS:
-#     kP = 0.1
-#     kI = 0
-#     kD = 0
-
-#     def drive(self, end_vec: Vector, turn: bool = False):
-#         integral = 0
-#         error = 0
-#         prev_error = 0
-#         derivative = 0
-#         power = 0
-
-#         lowest_dist = Vector.distance(gps_pos(), end_vec) + 100 # Continue this
-
-#         while True:
-#             error = Vector.distance(gps_pos(), end_vec)
-#             integral += error
-#             print(error)
-
-#             if error == 0 or error < 20:
-#                 integral = 0
-            
-#             if error > 1000:
-#                 integral = 0
+class PID:
+    """
+    The PID math, on its own, so every controller works the same way and gets tuned the 
+    same way.
+
+    Each call to update() takes the current error and the time in seconds since the last 
+    update, and returns the power to apply. kI is per second of error and kD is per 
+    error-per-second, so the gains don't change if the loop runs faster or slower.
+
+    The output is clamped to +/- output_limit, the integral is clamped and only allowed to 
+    grow when the output isn't already maxed out (anti-windup), the integral is thrown away 
+    when the error crosses zero or is bigger than integral_zone, and the derivative goes
+    through a low-pass filter with a time constant of d_filter seconds.
+    """
+    def __init__(self, kP: float, kI: float = 0, kD: float = 0, output_limit: float = 100,
+                 integral_limit = None, integral_zone = None, d_filter: float = 0):
+        self.kP = kP
+        self.kI = kI
+        self.kD = kD
+        self.output_limit = output_limit
+        self.integral_limit = integral_limit
+        self.integral_zone = integral_zone
+        self.d_filter = d_filter
+
+        self.integral = 0.0
+        self.derivative = 0.0
+        self.prev_error = 0.0
+        self.output = 0.0
+        self.first = True
+
+    def reset(self):
+        """
+        Forget everything from the last move. Call this before starting a new one.
+        """
+        self.integral = 0.0
+        self.derivative = 0.0
+        self.prev_error = 0.0
+        self.output = 0.0
+        self.first = True
+
+    def update(self, error: float, dt: float):
+        """
+        Work out the power for this loop. `dt` is in seconds.
+        """
+        if dt <= 0:
+            return self.output
+
+        if self.first:
+            self.first = False
+        else:
+            raw = (error - self.prev_error) / dt
+
+            if self.d_filter > 0:
+                self.derivative += (raw - self.derivative) * dt / (self.d_filter + dt)
+            else:
+                self.derivative = raw
+
+            if error * self.prev_error < 0:
+                self.integral = 0.0
+
+        self.prev_error = error
+        integral = self.integral
+
+        if self.integral_zone is not None and abs(error) > self.integral_zone:
+            integral = 0.0
+        else:
+            integral += error * dt
+            limit = self.integral_limit
+
+            if limit is None and self.kI:
+                limit = self.output_limit / abs(self.kI)
+
+            if limit is not None:
+                integral = max(-limit, min(limit, integral))
+
+        output = error * self.kP + integral * self.kI + self.derivative * self.kD
+        clamped = max(-self.output_limit, min(self.output_limit, output))
+
+        if clamped == output or (output > 0) != (error > 0):
+            self.integral = integral
+
+        self.output = clamped
+        return clamped
+
+class LoopProfile:
+    """
+    How long a loop's ticks take and how evenly they come, so we can see where the time goes
+    before tuning gains or making a loop run faster.
+
+    There are two histograms, each with BUCKETS fixed-size buckets, where the last bucket
+    also counts everything longer:
+    - run_times: how long the work in each tick took, from 0 to one period
+    - periods: from the start of one tick to the start of the next, from 0 to two periods
+    On top of those we keep the longest tick, the worst jitter (how far a period was from
+    what it should have been), and long_ticks, the ticks whose work took longer than a whole
+    period.
+
+    A tick can be split into sections, like reading the motors and doing the math. Add
+    them with section() when setting up, then call lap() after each part and the time since
+    the last lap is added to that section's total. Whatever comes after the last lap counts
+    as "rest".
+
+    Everything is counted into arrays made up front, so timing a tick only costs a few reads
+    of the microsecond timer and some adding.
+    """
+    BUCKETS = 20
+
+    def __init__(self, name: str, period_ms: int):
+        self.name = name
+        self.period = period_ms * 1000 # Microseconds
+        self.run_bucket = max(1, self.period // self.BUCKETS) # Microseconds per bucket
+        self.period_bucket = max(1, 2 * self.period // self.BUCKETS)
+        self.sections = ["rest"]
+        self.section_times = array("L", [0]) # Microseconds, in the same order as sections
+        self.run_times = array("L", [0] * self.BUCKETS)
+        self.periods = array("L", [0] * self.BUCKETS)
+        self.reset()
+
+    def reset(self):
+        """
+        Forget everything counted so far.
+        """
+        for i in range(self.BUCKETS):
+            self.run_times[i] = 0
+            self.periods[i] = 0
+
+        for i in range(len(self.sections)):
+            self.section_times[i] = 0
+
+        self.ticks = 0
+        self.total = 0 # Microseconds of work in every tick added up
+        self.max_run = 0
+        self.max_jitter = 0
+        self.long_ticks = 0
+        self.started = None
+        self.lap_at = 0
+
+    def section(self, name: str):
+        """
+        Add a section and return the number to lap() it with.
+        """
+        self.sections.append(name)
+        self.section_times.append(0)
+        return len(self.sections) - 1
+
+    def begin(self):
+        """
+        Call at the start of every tick.
+        """
+        now = brain.timer.system_high_res()
+
+        if self.started is not None:
+            period = now - self.started
+            self.periods[min(period // self.period_bucket, self.BUCKETS - 1)] += 1
+            self.max_jitter = max(self.max_jitter, abs(period - self.period))
+
+        self.started = now
+        self.lap_at = now
+
+    def lap(self, section: int):
+        """
+        The part of the tick since the last lap (or the start) was `section`.
+        """
+        now = brain.timer.system_high_res()
+        self.section_times[section] += now - self.lap_at
+        self.lap_at = now
+
+    def end(self):
+        """
+        Call at the end of every tick's work, before waiting for the next one.
+        """
+        now = brain.timer.system_high_res()
+        self.section_times[0] += now - self.lap_at
+        run = now - self.started
+        self.run_times[min(run // self.run_bucket, self.BUCKETS - 1)] += 1
+        self.ticks += 1
+        self.total += run
+        self.max_run = max(self.max_run, run)
+
+        if run > self.period:
+            self.long_ticks += 1
+
+    def summary(self):
+        """
+        One short line, small enough for the brain screen.
+        """
+        average = self.total / self.ticks / 1000 if self.ticks else 0
+
+        return "{} avg {:.2f} max {:.2f} jit {:.1f}ms long {}".format(
+            self.name, average, self.max_run / 1000, self.max_jitter / 1000, self.long_ticks)
+
+    def report(self):
+        """
+        Everything, as a list of lines to print.
+        """
+        lines = [self.summary() + " ({} ticks)".format(self.ticks)]
+
+        for label, histogram, width in (("  run", self.run_times, self.run_bucket),
+                                        ("  period", self.periods, self.period_bucket)):
+            buckets = []
+
+            for i in range(self.BUCKETS):
+                if histogram[i]:
+                    low = i * width / 1000
+                    high = "+" if i == self.BUCKETS - 1 else "-{:g}".format(low + width / 1000)
+                    buckets.append("{:g}{}ms:{}".format(low, high, histogram[i]))
+
+            lines.append(label + " " + " ".join(buckets))
+
+        if len(self.sections) > 1 and self.total:
+            # Where the time went, with "rest" last
+            order = list(range(1, len(self.sections))) + [0]
+            lines.append("  " + " ".join(["{} {:.0f}%".format(self.sections[i], 100 * self.section_times[i] / self.total)
+                                          for i in order]))
+
+        return lines
+
+# Tuned gains, found by RelayTuner on the robot or sim/tune.py in the simulator. One line
+# per controller: its class name, then kP, kI and kD, separated by spaces. Anything after a
+# # is a comment. A controller that isn't in the file keeps the gains written in its class.
+GAINS_FILE = "gains.txt"
+
+def load_gains(filename = GAINS_FILE):
+    """
+    Read the gains file from the SD card into {class name: (kP, kI, kD)}. Empty if there's
+    no SD card or no file.
+    """
+    gains = {}
+
+    if not brain.sdcard.is_inserted() or not brain.sdcard.exists(filename):
+        return gains
+
+    for line in bytes(brain.sdcard.loadfile(filename)).decode().split("\n"):
+        parts = line.split("#")[0].split()
+
+        if len(parts) == 4:
+            gains[parts[0]] = (float(parts[1]), float(parts[2]), float(parts[3]))
+
+    return gains
+
+def save_gains(name: str, kP: float, kI: float, kD: float, filename = GAINS_FILE):
+    """
+    Set one controller's gains in the gains file, keeping everyone else's.
+    """
+    gains = load_gains(filename)
+    gains[name] = (kP, kI, kD)
+    lines = ["{} {:.6g} {:.6g} {:.6g}".format(key, *gains[key]) for key in sorted(gains)]
+    brain.sdcard.savefile(filename, bytearray(("\n".join(lines) + "\n").encode()))
+
+calibrated = [] # Sensors that have been calibrated since the program started
+
+def calibrate(*sensors):
+    """
+    Calibrate any of `sensors` that haven't been yet, and wait until they're all done. 
+    Every controller needs the inertial sensor, but it only has to be calibrated once, not
+    every time one is made.
+    """
+    for sensor in sensors:
+        if sensor not in calibrated:
+            sensor.calibrate()
+            calibrated.append(sensor)
+
+    for sensor in sensors:
+        while sensor.is_calibrating():
+            wait(5, MSEC)
 
-#             derivative = error - prev_error
-#             prev_error = error
+class PIDLoop:
+    """
+    The loop shared by the drive, heading and accelerometer controllers below. Each one only 
+    has to say how to measure where we are, how to apply power, and how close is close enough.
 
-#             power = (error * self.kP) + (integral * self.kI) + (derivative * self.kD)
-            
-#             if not turn:
-#                 drivetrain.drive(FORWARD, power, PERCENT)
-#             else:
-#                 drivetrain.turn(RIGHT, power, PERCENT)
+    Like every motion in main.py, the loop gives up if the measurement stops changing by 
+    STALL_AMOUNT for STALL_TIME milliseconds (we're pushing against something) or if it 
+    runs longer than TIMEOUT milliseconds, so a target we can't reach never leaves it 
+    running forever.
 
-#             wait(15, MSEC)
+    The kP, kI and kD written in each class are the defaults. If the gains file has a line
+    for the class, those gains are used instead.
+    """
+    kP = 0
+    kI = 0
+    kD = 0
+    D_FILTER = 0.05 # Seconds
+    TOLERANCE = 1 # How close to the setpoint is close enough to stop
+    PERIOD = 10 # Milliseconds between updates. The sensors only update every 10ms.
+    TIMEOUT = 5000 # Milliseconds
+    STALL_AMOUNT = 0.25 # Less change than this in STALL_TIME and we're stuck
+    STALL_TIME = 500 # Milliseconds
 
-class PIDwithRot:
     def __init__(self):
-        inertial.calibrate()
+        gains = load_gains().get(type(self).__name__)
+
+        if gains is not None:
+            self.kP, self.kI, self.kD = gains
+
+        self.pid = PID(self.kP, self.kI, self.kD, d_filter = self.D_FILTER)
+        self.timer = Timer()
+        self.profile = LoopProfile(type(self).__name__, self.PERIOD)
+        self.measure_section = self.profile.section("measure")
+        self.apply_section = self.profile.section("apply")
+
+    def run(self, setpoint: float, timeout_ms = None):
+        """
+        Drive the measurement to `setpoint`, then stop. Returns True if we got there, False
+        if we got stuck or ran out of time (TIMEOUT, unless `timeout_ms` is given).
+        """
+        if timeout_ms is None:
+            timeout_ms = self.TIMEOUT
+
+        pid = self.pid
+        timer = self.timer
+        profile = self.profile
+        profile.started = None # The time between moves isn't a period
+        pid.reset()
+        self.start()
+        started = timer.time(MSEC)
+        last = started / 1000
+        moved_at = 0 # When the measurement last changed by STALL_AMOUNT
+        moved_from = None
 
-        while inertial.is_calibrating():
-            wait(5, MSEC)
+        while True:
+            profile.begin()
+            now = timer.time(SECONDS)
+            dt = now - last
+            last = now
+            measurement = self.measure(dt)
+            error = setpoint - measurement
+            profile.lap(self.measure_section)
+            elapsed = timer.time(MSEC) - started
+
+            if self.arrived(error, setpoint):
+                arrived = True
+                break
+
+            if moved_from is None or abs(measurement - moved_from) >= self.STALL_AMOUNT:
+                moved_at = elapsed
+                moved_from = measurement
+
+            if elapsed > timeout_ms or elapsed - moved_at >= self.STALL_TIME:
+                arrived = False
+                break
+
+            power = pid.update(error, dt)
+            self.apply(power)
+            profile.lap(self.apply_section)
+            profile.end()
+            wait(self.PERIOD, MSEC)
+
+        profile.end()
+        self.stop()
+        return arrived
+
+    def arrived(self, error: float, setpoint: float):
+        """
+        Whether we're close enough to stop.
+        """
+        # The error is exactly the setpoint before anything has happened, so don't 
+        # count that as being there
+        return -self.TOLERANCE < error < self.TOLERANCE and error != setpoint
+
+    def start(self):
+        """
+        Get ready for a new move. Nothing to do unless a controller needs it.
+        """
+
+    def measure(self, dt: float):
+        """
+        Where we are now, in the same units as the setpoint. `dt` is the seconds since the
+        last measure(). Every controller overrides this.
+        """
+
+    def apply(self, power: float):
+        """
+        Send `power` (percent) to the motors. Every controller overrides this.
+        """
+
+    def stop(self):
+        drivetrain.stop(BRAKE)
+
+class PIDwithRot(PIDLoop):
+    def __init__(self):
+        calibrate(inertial)
+        super().__init__()
 
     GEAR_RATIO = 0.67
     WHEEL_CIRC = 12.57
@@ -88,31 +437,16 @@ class PIDwithRot:
     kP = 4
     kI = 0
     kD = 0
+    TOLERANCE = 0.125 # Inches
 
-    def drive_for(self, distance_in: int):
-        integral = 0
-        error = 0
-        prev_error = 0
-        derivative = 0 
-        power = 0
-
-        while True:
-            error = distance_in - self.driven_dist()
+    def drive_for(self, distance_in: int, timeout_ms = None):
+        return self.run(distance_in, timeout_ms)
 
-            integral += error
-            
-            if -0.125 < error < 0.125 and error != distance_in:
-                drivetrain.stop(BRAKE)
-                return True
+    def measure(self, dt: float):
+        return self.driven_dist()
 
-            derivative = error - prev_error
-            prev_error = error
-
-            power = (error * self.kP) + (integral * self.kI) + (derivative * self.kD)
-
-            drivetrain.drive(FORWARD, power, PERCENT)
-
-            wait(15, MSEC)
+    def apply(self, power: float):
+        drivetrain.drive(FORWARD, power, PERCENT)
 
     def driven_dist(self):
         return (self.motor_rot_avg() / 360) * self.GEAR_RATIO * self.WHEEL_CIRC
@@ -128,12 +462,12 @@ class PIDwithRot:
 
     def not_moving(self):
         # Check to see if the robot is stuck and not moving
-        print("PITCH: " + str(inertial.gyro_rate(AxisType.XAXIS)))
         return -1 < inertial.gyro_rate(AxisType.XAXIS) < 1 
 
-class PIDwithAccel:
+class PIDwithAccel(PIDLoop):
     GEAR_RATIO = 0.67
     WHEEL_CIRC = 12.57
+    # These were per 15ms loop, see PID for converting them
     # kP = 4
     # kI = 0.0015
     # kD = 4
@@ -141,33 +475,28 @@ class PIDwithAccel:
     kP = 5
     kI = 0
     kD = 0
+    TOLERANCE = 0.025 # Inches
 
-    def drive_for(self, distance_in: int):
-        integral = 0
-        error = 0
-        prev_error = 0
-        derivative = 0 
-        power = 0
-
-        while True:
-            error = distance_in
-            integral += error
-            print(error)
-
-            if error == 0 or error < 0.025:
-                integral = 0
-            
-            # if error > 1000:
-            #     integral = 0
+    def __init__(self):
+        super().__init__()
+        self.velocity = 0.0 # Inches per second
+        self.distance = 0.0 # Inches
 
-            derivative = error - prev_error
-            prev_error = error
+    def drive_for(self, distance_in: int, timeout_ms = None):
+        return self.run(distance_in, timeout_ms)
 
-            power = (error * self.kP) + (integral * self.kI) + (derivative * self.kD)
+    def start(self):
+        self.velocity = 0.0
+        self.distance = 0.0
 
-            drivetrain.drive(FORWARD, power, PERCENT)
+    def measure(self, dt: float):
+        # Integrate the acceleration twice to get how far we've gone
+        self.velocity += self.distance_driven(dt) * dt
+        self.distance += self.velocity * dt
+        return self.distance
 
-            wait(15, MSEC)
+    def apply(self, power: float):
+        drivetrain.drive(FORWARD, power, PERCENT)
 
     def distance_driven(self, delta: float):
         accel = inertial.acceleration(AxisType.YAXIS) # Acceleration in Gs
@@ -175,50 +504,312 @@ class PIDwithAccel:
 
         return accel_ms * 39.3701 # Convert meters to inches
 
-
-class PIDwithHeading:
+class PIDwithHeading(PIDLoop):
     def __init__(self):
-        inertial.calibrate()
-
-        while inertial.is_calibrating():
-            wait(5, MSEC)
-
+        calibrate(inertial)
         inertial.set_heading(0)
+        super().__init__()
 
     kP = 0.2
     kI = 0
     kD = 0
+    TOLERANCE = 1 # Degrees
 
-    def turn_for(self, heading: float):
-        integral = 0
-        error = 0
-        prev_error = 0
-        derivative = 0 
-        power = 0
+    def turn_for(self, heading: float, timeout_ms = None):
+        return self.run(heading, timeout_ms)
 
-        while True:
-            error = heading - inertial.heading()
+    def measure(self, dt: float):
+        return inertial.heading()
+
+    def apply(self, power: float):
+        drivetrain.turn(RIGHT, power, PERCENT)
 
-            print(inertial.heading())
-            print(error)
-            print("---")
+class PositionFilter:
+    """
+    Where the robot is on the field, in mm, using both the GPS and the wheels.
 
-            integral += error
+    The GPS knows where we are on the field, but it only gets a new fix every so often and
+    each one is off by a bit. The wheels update every 10ms and barely jitter at all, but every
+    little slip adds up, so they slowly drift away from where we really are. So every tick we
+    move our position by however far the wheels went (in the direction the inertial sensor 
+    says we're facing), and every time a new GPS fix comes in we nudge the position towards it.
 
-            if -1 < error < 1 and error != heading:
-                drivetrain.stop(BRAKE)
-                return True
+    How far to nudge is a Kalman filter. `variance` is how unsure we are of our position. It 
+    grows as we drive, and each fix pulls us towards it by variance / (variance + GPS_VARIANCE),
+    then makes us surer. Right after a fix we trust the fix less, since we were already close, 
+    and after driving a long way on the wheels we trust the next fix more.
 
-            derivative = error - prev_error
-            prev_error = error
-            
-            power = (error * self.kP) + (integral * self.kI) + (derivative * self.kD)
+    The heading is the inertial sensor's rotation plus an offset to line it up with the field.
+    Each GPS fix moves that offset a little (HEADING_GAIN) towards the GPS heading, which 
+    keeps the inertial sensor from drifting without picking up the GPS's noise. 
+    """
+    GPS_VARIANCE = 15 ** 2 # How far off (mm, squared) one GPS fix usually is
+    DRIFT = 0.5 # How much variance (mm squared) every mm the wheels go adds
+    HEADING_GAIN = 0.02 # How much of the heading difference each GPS fix corrects
 
-            drivetrain.turn(RIGHT, power, PERCENT)
+    GEAR_RATIO = 0.67
+    WHEEL_CIRC = 12.57 * 25.4 # mm
 
-            wait(15, MSEC)
+    def __init__(self):
+        self.x = 0.0
+        self.y = 0.0
+        self.heading = 0.0
+        self.variance = self.GPS_VARIANCE
+        self.heading_offset = 0.0
+        self.last_fix = None
+        self.last_wheels = 0.0
+
+    def reset(self):
+        """
+        Start over from the GPS's position and heading. The GPS has to be done calibrating.
+        """
+        self.x = gps.x_position(MM)
+        self.y = gps.y_position(MM)
+        self.heading = gps.heading()
+        self.variance = self.GPS_VARIANCE
+        self.heading_offset = self.heading - inertial.rotation()
+        self.last_fix = (self.x, self.y)
+        self.last_wheels = self.wheels()
+
+    def wheels(self):
+        """
+        How far (mm) the middle of the robot has driven since the motors were last reset.
+        Driving backwards counts down.
+        """
+        num = 0
 
+        for motor in motors:
+            num += motor.position()
 
-pid = PIDwithRot()
-pid.drive_for(48)
+        return num / len(motors) / 360 * self.GEAR_RATIO * self.WHEEL_CIRC
+
+    def update(self):
+        """
+        Move by however far the wheels went, then take the new GPS fix into account if 
+        there is one. Call this once every tick.
+        """
+        wheels = self.wheels()
+        moved = wheels - self.last_wheels
+        self.last_wheels = wheels
+
+        heading = inertial.rotation() + self.heading_offset
+        middle = math.radians((self.heading + heading) / 2)
+        self.heading = heading
+        self.x += moved * math.sin(middle)
+        self.y += moved * math.cos(middle)
+        self.variance += self.DRIFT * abs(moved)
+
+        # The GPS holds on to its last fix until it has a new one, so a fix that's exactly 
+        # the same as the last one is the same fix.
+        fix_x = gps.x_position(MM)
+        fix_y = gps.y_position(MM)
+
+        if self.last_fix is not None and fix_x == self.last_fix[0] and fix_y == self.last_fix[1]:
+            return
+
+        self.last_fix = (fix_x, fix_y)
+        gain = self.variance / (self.variance + self.GPS_VARIANCE)
+        self.x += gain * (fix_x - self.x)
+        self.y += gain * (fix_y - self.y)
+        self.variance *= 1 - gain
+
+        # Turn the difference into -180 to 180 so we go the short way around
+        difference = (gps.heading() - heading + 180) % 360 - 180
+        self.heading_offset += self.HEADING_GAIN * difference
+
+class PIDwithGPS(PIDLoop):
+    """
+    Drive to a spot on the field. The PID works on how far away the target is, and a second,
+    proportional-only controller (kH) steers towards the target while we drive.
+
+    Whether the target is in front of us or behind us only picks which way to drive: if 
+    we go past the target, the distance goes negative and the PID backs us up. Power is 
+    scaled by how squarely we face the target, so the robot mostly turns while it's 
+    pointed away and speeds up as it lines up. Close to the target the direction to it 
+    swings around a lot, so steering fades out inside STEER_RADIUS. We've arrived once 
+    the real distance to the target is under TOLERANCE.
+    """
+    kP = 0.15 # Percent per mm
+    kI = 0
+    kD = 0.01
+    kH = 1.0 # Percent per degree of heading error
+    TOLERANCE = 20 # mm
+    STEER_RADIUS = 100 # mm
+    STALL_AMOUNT = 5 # mm
+
+    def __init__(self):
+        calibrate(inertial, gps)
+
+        super().__init__()
+        self.position = PositionFilter()
+        self.position.reset()
+        self.target = Vector(0, 0)
+        self.reverse = False
+        self.heading_error = 0.0
+        self.distance = 0.0
+        self.facing = 1.0
+
+    def drive_to(self, target: Vector, reverse: bool = False, timeout_ms = None):
+        """
+        Drive to `target` (mm, field coordinates). If `reverse` is True the robot backs up to
+        it instead, like when it's picking up a mobile goal with the clamp on the back.
+        """
+        self.target = target
+        self.reverse = reverse
+        return self.run(0, timeout_ms)
+
+    def arrived(self, error: float, setpoint: float):
+        return self.distance < self.TOLERANCE
+
+    def measure(self, dt: float):
+        position = self.position
+        position.update()
+
+        dx = self.target.x - position.x
+        dy = self.target.y - position.y
+        self.distance = (dx * dx + dy * dy) ** 0.5
+        bearing = math.degrees(math.atan2(dx, dy)) # Heading that points at the target
+
+        if self.reverse:
+            bearing += 180
+
+        self.heading_error = (bearing - position.heading + 180) % 360 - 180
+        self.facing = math.cos(math.radians(self.heading_error))
+
+        # The PID drives the error (0 - this) to 0, so give back how far *behind* we are.
+        # If the target is behind us we're past it, so that's negative.
+        return -self.distance if self.facing >= 0 else self.distance
+
+    def apply(self, power: float):
+        heading_error = self.heading_error
+
+        # Past the target we back up to it, so steer the back of the robot at it
+        if heading_error > 90:
+            heading_error -= 180
+        elif heading_error < -90:
+            heading_error += 180
+
+        # Up close the direction to the target swings around, so steer less and less
+        turn = self.kH * heading_error * min(1, self.distance / self.STEER_RADIUS)
+
+        # Don't drive much until we're pointed at the target
+        power *= abs(self.facing)
+
+        if self.reverse:
+            power = -power
+
+        mgL.spin(FORWARD, power + turn, PERCENT)
+        mgR.spin(FORWARD, power - turn, PERCENT)
+
+class RelayTuner:
+    """
+    Finds gains for one of the controllers above on the robot itself, with a relay test.
+
+    Instead of a PID, the tuner gives full `power` one way whenever we're short of the 
+    setpoint and full power the other way whenever we're past it. The robot ends up rocking
+    back and forth around the setpoint, and how far it swings (the amplitude) and how long
+    each swing takes (the period, Tu) say how the robot responds: they're the same swing 
+    a P controller would settle into with kP = Ku = 4 * power / (pi * amplitude). 
+    Ziegler-Nichols' rules turn Ku and Tu into gains. We use the "no overshoot" rule, since 
+    overshooting the target is what makes the robot slow to settle.
+
+    The first swing starts from rest, so it's thrown away. Then CYCLES swings are averaged.
+    The gains are only a good starting point; sim/tune.py can search around them.
+    """
+    CYCLES = 4
+    HYSTERESIS = 0 # Switch this far past the setpoint, so sensor noise can't flip the relay
+    TIMEOUT = 15000 # Milliseconds
+
+    def measure(self, loop: PIDLoop, setpoint: float, power: float):
+        """
+        Run the relay test on `loop` around `setpoint` (in whatever its measure() returns).
+        Returns (Ku, Tu), or None if it didn't swing back and forth enough in time.
+        """
+        timer = loop.timer
+        loop.start()
+        start = timer.time(MSEC)
+        last = start
+        direction = 1
+        crossings = [] # Times (ms) the relay switched to pushing forward
+        low = high = None
+        swings = [] # (high - low) of each full swing
+
+        while len(crossings) <= self.CYCLES + 1 and last - start < self.TIMEOUT:
+            now = timer.time(MSEC)
+            value = loop.measure((now - last) / 1000)
+            last = now
+
+            low = value if low is None else min(low, value)
+            high = value if high is None else max(high, value)
+
+            if direction > 0 and value > setpoint + self.HYSTERESIS:
+                direction = -1
+            elif direction < 0 and value < setpoint - self.HYSTERESIS:
+                direction = 1
+                crossings.append(now)
+
+                if len(crossings) > 1:
+                    swings.append(high - low)
+
+                low = high = value
+
+            loop.apply(power * direction)
+            wait(loop.PERIOD, MSEC)
+
+        loop.stop()
+
+        if len(crossings) <= self.CYCLES + 1:
+            return None
+
+        # Skip the first swing, it started from rest
+        amplitude = sum(swings[1:]) / len(swings[1:]) / 2
+        period = (crossings[-1] - crossings[1]) / (len(crossings) - 2) / 1000
+        return 4 * power / (math.pi * amplitude), period
 
+    @staticmethod
+    def gains(Ku: float, Tu: float):
+        """
+        Ziegler-Nichols "no overshoot" gains from a relay test, as (kP, kI, kD). kI is per 
+        second and kD per error-per-second, like PID wants.
+        """
+        return 0.2 * Ku, 0.4 * Ku / Tu, 0.066 * Ku * Tu
+
+    def tune(self, loop: PIDLoop, setpoint: float, power: float, integral: bool = True):
+        """
+        Run the relay test, then save the gains for `loop`'s class to the gains file. With
+        integral=False kI is saved as 0. Returns the gains, or None if the test failed.
+        """
+        result = self.measure(loop, setpoint, power)
+
+        if result is None:
+            print("Relay test failed, the robot didn't swing back and forth")
+            return None
+
+        kP, kI, kD = self.gains(*result)
+
+        if not integral:
+            kI = 0
+
+        print("{}: Ku={:.3f} Tu={:.3f}s -> kP={:.4g} kI={:.4g} kD={:.4g}".format(type(loop).__name__, result[0], result[1], kP, kI, kD))
+        save_gains(type(loop).__name__, kP, kI, kD)
+        return kP, kI, kD
+
+# Set to True to find new gains with a relay test instead of running the test drive
+AUTOTUNE = False
+
+# Only run the test drive when this file is the program being run, so the simulator
+# in sim/ can load these classes without the robot driving off.
+if __name__ == "__main__":
+    pid = PIDwithRot()
+
+    if AUTOTUNE:
+        # Rock back and forth around where the robot is now, then turn around in place
+        tuner = RelayTuner()
+        tuner.tune(pid, pid.measure(0), 30, integral = False)
+        heading = PIDwithHeading()
+        tuner.tune(heading, 90, 30, integral = False)
+    else:
+        pid.drive_for(48)
+
+        for line in pid.profile.report():
+            print(line)